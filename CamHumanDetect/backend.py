@@ -0,0 +1,176 @@
+"""
+Inference backends for the YOLO detector scripts.
+
+The backend is chosen with DETECTOR_BACKEND (default: auto):
+
+    cuda      PyTorch on the GPU (what the scripts always used)
+    cpu       PyTorch on the CPU
+    onnx      ONNX Runtime on the CPU
+    openvino  OpenVINO on the CPU
+    auto      cuda when a GPU is available, otherwise openvino, onnx or cpu,
+              whichever runtime is installed first
+
+onnx and openvino export the weights once per input size into DETECTOR_EXPORTS
+(default: exports/) and load the cached export afterwards. DETECTOR_IMGSZ sets
+the input size of the export (default 640), DETECTOR_THREADS the intra-op
+threads of the CPU backends (default: all cores).
+
+Every backend is an Ultralytics model, so model(), predict(), track() and
+names give the same Results as before:
+
+    model = load_model()
+    results = model.track(source=frame, persist=True, classes=TARGET_IDS, verbose=False)[0]
+"""
+import importlib.util
+import os
+import shutil
+
+import numpy as np
+from ultralytics import YOLO
+
+BACKENDS = ["cuda", "cpu", "onnx", "openvino"]
+
+WEIGHTS = "yolov8n.pt"
+BACKEND = os.environ.get("DETECTOR_BACKEND", "auto").lower()
+EXPORT_DIR = os.environ.get("DETECTOR_EXPORTS", "exports")
+IMGSZ = int(os.environ.get("DETECTOR_IMGSZ", 640))
+THREADS = int(os.environ.get("DETECTOR_THREADS", os.cpu_count() or 1))
+
+
+def available(name):
+    if name == "cuda":
+        import torch
+        return torch.cuda.is_available()
+    if name == "onnx":
+        return importlib.util.find_spec("onnxruntime") is not None
+    if name == "openvino":
+        return importlib.util.find_spec("openvino") is not None
+    return name == "cpu"
+
+
+def resolve(backend=None):
+    backend = (backend or BACKEND).lower()
+    if backend == "auto":
+        return next(name for name in ["cuda", "openvino", "onnx", "cpu"] if available(name))
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend!r}, use one of {', '.join(BACKENDS + ['auto'])}")
+    return backend
+
+
+def export_path(weights, backend, imgsz, export_dir=EXPORT_DIR, dynamic=False):
+    stem = os.path.splitext(os.path.basename(weights))[0] + ("_dynamic" if dynamic else "")
+    if backend == "onnx":
+        return os.path.join(export_dir, f"{stem}_{imgsz}.onnx")
+    # Ultralytics recognises OpenVINO exports by the _openvino_model suffix
+    return os.path.join(export_dir, f"{stem}_{imgsz}_openvino_model")
+
+
+def export(weights, backend, imgsz, export_dir=EXPORT_DIR, dynamic=False):
+    """Path of the cached export, exporting the weights first when there is none. dynamic: any batch size."""
+    path = export_path(weights, backend, imgsz, export_dir, dynamic)
+    if os.path.exists(path):
+        return path
+    os.makedirs(export_dir, exist_ok=True)
+    print(f"[Backend] Exporting {weights} to {backend} at {imgsz}px (once)...")
+    exported = YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=dynamic, half=False)
+    shutil.move(str(exported), path)
+    return path
+
+
+def _holder(model, name):
+    """The Ultralytics backend object owning attribute `name` (AutoBackend, or its backend in newer releases)."""
+    backend = getattr(getattr(model, "predictor", None), "model", None)
+    for obj in (backend, getattr(backend, "__dict__", {}).get("backend")):
+        if obj is not None and name in obj.__dict__:
+            return obj
+    return None
+
+
+def _tune_threads(model, backend, path, threads):
+    """Recreate the runtime session of an exported model with `threads` intra-op threads."""
+    if backend == "onnx":
+        holder = _holder(model, "session")
+        if holder is None:
+            return
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        holder.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    elif backend == "openvino":
+        holder = _holder(model, "ov_compiled_model")
+        if holder is None:
+            return
+        import openvino as ov
+        core = ov.Core()
+        xml = next(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".xml"))
+        holder.ov_compiled_model = core.compile_model(
+            core.read_model(xml), "CPU", {"PERFORMANCE_HINT": "LATENCY", "INFERENCE_NUM_THREADS": threads})
+
+
+class Detector:
+    """
+    Ultralytics model bound to one backend. Calls get the backend's device, its
+    FP16 setting and, for exported models, their fixed input size unless the
+    caller passes its own.
+    """
+
+    def __init__(self, model, backend, imgsz=None, half=False):
+        self.model = model
+        self.backend = backend
+        self.imgsz = imgsz
+        self.half = half
+        self.device = "cuda" if backend == "cuda" else "cpu"
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def _args(self, kwargs):
+        kwargs.setdefault("device", self.device)
+        if self.half:
+            # the predictor casts the weights and the input tensors together
+            kwargs.setdefault("half", True)
+        if self.imgsz:
+            kwargs.setdefault("imgsz", self.imgsz)
+        return kwargs
+
+    def __call__(self, source, **kwargs):
+        return self.model(source, **self._args(kwargs))
+
+    def predict(self, source, **kwargs):
+        return self.model.predict(source, **self._args(kwargs))
+
+    def track(self, source, **kwargs):
+        return self.model.track(source, **self._args(kwargs))
+
+
+def load_model(weights=WEIGHTS, backend=None, imgsz=None, threads=THREADS, half=False, export_dir=EXPORT_DIR,
+               batch=1):
+    """
+    Detector for `backend` (default DETECTOR_BACKEND), warmed up with one blank frame.
+    imgsz: input size of an export (default DETECTOR_IMGSZ), PyTorch backends keep
+    Ultralytics' default unless given. half: FP16, only used on cuda.
+    batch: largest number of frames per call, exports get a dynamic batch axis above 1.
+    """
+    backend = resolve(backend)
+    if backend == "cuda":
+        detector = Detector(YOLO(weights).to("cuda"), backend, imgsz, half=half)
+    elif backend == "cpu":
+        import torch
+        torch.set_num_threads(threads)
+        detector = Detector(YOLO(weights).to("cpu"), backend, imgsz)
+    else:
+        imgsz = imgsz or IMGSZ
+        path = export(weights, backend, imgsz, export_dir, dynamic=batch > 1)
+        detector = Detector(YOLO(path, task="detect"), backend, imgsz)
+
+    # the first call creates the predictor (and the runtime session the threads are set on)
+    detector.predict(np.zeros((480, 640, 3), dtype=np.uint8), verbose=False)
+    if backend in ("onnx", "openvino"):
+        _tune_threads(detector.model, backend, path, threads)
+    details = [weights] + ([f"{detector.imgsz}px"] if detector.imgsz else []) + (["FP16"] if detector.half else [])
+    details += [f"{threads} threads"] if backend != "cuda" else []
+    print(f"[Backend] {backend} ({', '.join(details)})")
+    return detector
@@ -0,0 +1,84 @@
+"""
+Compare the inference backends of backend.py on this machine.
+
+Every backend runs the same frames at each input size and reports frames/s
+and per-frame latency (mean, p50, p95). Frames come from --source (camera
+index or video file) or are random noise when none is given. Exports are
+created on the first run and reused afterwards.
+
+    python backend_benchmark.py --backends cpu onnx openvino --sizes 320 640 --frames 200
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from backend import BACKENDS, THREADS, available, load_model
+
+
+def read_frames(source, count):
+    if source is None:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(min(count, 16))]
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (640, 480)))
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames read from {source}")
+    return frames
+
+
+def run(model, frames, count, warmup):
+    for i in range(warmup):
+        model.predict(frames[i % len(frames)], verbose=False)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        begin = time.perf_counter()
+        model.predict(frames[i % len(frames)], verbose=False)
+        latencies.append(time.perf_counter() - begin)
+    total = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        "fps": count / total,
+        "mean": latencies.mean(),
+        "p50": np.percentile(latencies, 50),
+        "p95": np.percentile(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO inference backends")
+    parser.add_argument("--backends", nargs="+", default=["cpu", "onnx", "openvino"], choices=BACKENDS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[320, 640])
+    parser.add_argument("--frames", type=int, default=200, help="timed frames per run")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=THREADS, help="intra-op threads of the CPU backends")
+    parser.add_argument("--source", help="camera index or video file, default random frames")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.frames)
+    rows = []
+    for backend in args.backends:
+        if not available(backend):
+            print(f"{backend}: not available, skipped")
+            continue
+        for size in args.sizes:
+            model = load_model(args.weights, backend=backend, imgsz=size, threads=args.threads)
+            rows.append((backend, size, run(model, frames, args.frames, args.warmup)))
+
+    print()
+    print(f"{'backend':<10} {'imgsz':>5} {'frames/s':>9} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for backend, size, result in rows:
+        print(f"{backend:<10} {size:>5} {result['fps']:>9.1f} {result['mean']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
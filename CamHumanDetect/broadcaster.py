@@ -0,0 +1,81 @@
+import threading
+
+import cv2
+
+BOUNDARY = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+class FrameBroadcaster:
+    """
+    Shares the latest frame with every MJPEG client.
+
+    publish() only stores the frame and bumps its sequence number. The first
+    client asking for a sequence JPEG-encodes it, every other client gets the
+    same bytes. Clients block until a newer frame than the one they sent last
+    exists, so a slow client skips frames instead of queueing them.
+    """
+
+    def __init__(self, quality=None):
+        self.quality = quality
+        self.seq = 0
+        self.published = 0
+        self.encoded = 0
+        self.sent = 0
+        self.clients = 0
+        self._frame = None
+        self._jpeg = (0, None)
+        self._cond = threading.Condition()
+        self._encode_lock = threading.Lock()
+
+    def publish(self, frame):
+        """Hand over a new frame, it must not be modified afterwards."""
+        with self._cond:
+            self._frame = frame
+            self.seq += 1
+            self.published += 1
+            self._cond.notify_all()
+
+    def latest(self, after=0, timeout=None):
+        """(seq, jpeg bytes) of the newest frame once its seq is above `after`, (after, None) on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after, timeout):
+                return after, None
+        with self._encode_lock:
+            # a newer frame may have arrived while waiting for the lock, always serve the newest
+            with self._cond:
+                seq, frame = self.seq, self._frame
+            if self._jpeg[0] != seq:
+                params = [cv2.IMWRITE_JPEG_QUALITY, self.quality] if self.quality else []
+                ret, buffer = cv2.imencode('.jpg', frame, params)
+                if not ret:
+                    return seq, None
+                self._jpeg = (seq, buffer.tobytes())
+                self.encoded += 1
+            return self._jpeg
+
+    def stream(self, timeout=5.0):
+        """multipart/x-mixed-replace generator for one client."""
+        seq = 0
+        with self._cond:
+            self.clients += 1
+        try:
+            while True:
+                seq, jpeg = self.latest(seq, timeout)
+                if jpeg is None:
+                    continue
+                with self._cond:
+                    self.sent += 1
+                yield BOUNDARY + jpeg + b'\r\n'
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    @property
+    def stats(self):
+        return {
+            "seq": self.seq,
+            "published": self.published,
+            "encoded": self.encoded,
+            "sent": self.sent,
+            "clients": self.clients,
+        }
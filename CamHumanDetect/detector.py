@@ -4,7 +4,7 @@ import time
 import threading
 import requests
 from datetime import datetime
-from ultralytics import YOLO
+from backend import load_model
 import numpy as np
 import simpleaudio as sa
 
@@ -51,7 +51,7 @@ def play_beep():
         print("Beep error:", e)
 
 # === SETUP ===
-model = YOLO("yolov8n.pt").to('cuda')
+model = load_model()
 TARGET_CLASSES = ["person", "car", "dog", "cat"]
 CLASS_NAMES = model.names
 TARGET_IDS = [i for i, name in CLASS_NAMES.items() if name in TARGET_CLASSES]
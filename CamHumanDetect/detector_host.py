@@ -6,11 +6,12 @@ import requests
 import numpy as np
 from datetime import datetime
 from flask import Flask, Response
-from ultralytics import YOLO
+from backend import load_model
 import simpleaudio as sa
 from flask import jsonify
 from flask import render_template
 from flask import send_from_directory
+from broadcaster import FrameBroadcaster
 
 # === TELEGRAM SETTINGS ===
 BOT_TOKEN = ""
@@ -24,8 +25,7 @@ beep_toggle_time = 0
 
 # === APP SERVER ===
 app = Flask(__name__)
-output_frame = None
-lock = threading.Lock()
+broadcaster = FrameBroadcaster()
 
 @app.route('/')
 def index():
@@ -33,17 +33,12 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    def generate():
-        while True:
-            with lock:
-                if output_frame is None:
-                    continue
-                ret, buffer = cv2.imencode('.jpg', output_frame)
-                if not ret:
-                    continue
-                frame = buffer.tobytes()
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # each frame is encoded once and shared by all viewers
+    return Response(broadcaster.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/video_stats')
+def video_stats():
+    return jsonify(broadcaster.stats)
 
 def start_flask():
     app.run(host='0.0.0.0', port=5000, threaded=True)
@@ -97,7 +92,7 @@ def snapshot_file(filename):
 threading.Thread(target=start_flask, daemon=True).start()
 
 # === SETUP ===
-model = YOLO("yolov8n.pt").to('cuda')
+model = load_model()
 TARGET_CLASSES = ["person", "car", "dog", "cat"]
 CLASS_NAMES = model.names
 TARGET_IDS = [i for i, name in CLASS_NAMES.items() if name in TARGET_CLASSES]
@@ -230,8 +225,7 @@ while True:
         cv2.putText(adjusted, beep_toggle_msg, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
                     (0, 255, 0) if ENABLE_BEEP else (0, 0, 255), 2)
 
-    with lock:
-        output_frame = adjusted.copy()
+    broadcaster.publish(adjusted)
 
     cv2.imshow("Tracking Detection", adjusted)
     key = cv2.waitKey(1) & 0xFF
@@ -6,11 +6,13 @@ import requests
 import numpy as np
 from datetime import datetime
 from flask import Flask, Response
-from ultralytics import YOLO
+from backend import load_model
 import simpleaudio as sa
 from flask import jsonify
 from flask import render_template
 from flask import send_from_directory
+from broadcaster import FrameBroadcaster
+from pipeline import DropQueue, Frame, ResultBuffer, Stage
 
 # === TELEGRAM SETTINGS ===
 BOT_TOKEN = ""
@@ -24,8 +26,7 @@ beep_toggle_time = 0
 
 # === APP SERVER ===
 app = Flask(__name__)
-output_frame = None
-lock = threading.Lock()
+broadcaster = FrameBroadcaster()
 
 @app.route('/')
 def index():
@@ -33,17 +34,12 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    def generate():
-        while True:
-            with lock:
-                if output_frame is None:
-                    continue
-                ret, buffer = cv2.imencode('.jpg', output_frame)
-                if not ret:
-                    continue
-                frame = buffer.tobytes()
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # each frame is encoded once and shared by all viewers
+    return Response(broadcaster.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/video_stats')
+def video_stats():
+    return jsonify(broadcaster.stats)
 
 def start_flask():
     app.run(host='0.0.0.0', port=5000, threaded=True)
@@ -107,6 +103,13 @@ def delete_snapshots():
             print(f"Failed to delete {file_path}: {e}")
     return jsonify({"status": "deleted"})
 
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    return jsonify({
+        "stages": {stage.name: stage.stats for stage in stages},
+        "end_to_end_ms": round(end_to_end * 1000, 2)
+    })
+
 @app.route('/toggle/night_vision')
 def toggle_night_vision():
     global night_vision
@@ -119,8 +122,7 @@ def toggle_night_vision():
 threading.Thread(target=start_flask, daemon=True).start()
 
 # === SETUP ===
-model = YOLO("yolov8n.pt").to('cuda')
-model.predict(source=np.zeros((640, 480, 3), dtype=np.uint8), verbose=False)  # Warm up GPU
+model = load_model()  # warmed up by load_model
 TARGET_CLASSES = ["person", "car", "dog", "cat"]
 CLASS_NAMES = model.names
 TARGET_IDS = [i for i, name in CLASS_NAMES.items() if name in TARGET_CLASSES]
@@ -148,8 +150,17 @@ active_types = set()
 snapshot_queue = []
 
 DETECT_EVERY = 3
-frame_count = 0
-last_results = None
+capture_seq = 0
+end_to_end = 0.0
+
+# capture -> preprocess -> inference / render -> display, each stage on its own thread
+stop = threading.Event()
+preprocess_queue = DropQueue(1)
+inference_queue = DropQueue(1)
+render_queue = DropQueue(2)
+display_queue = DropQueue(1)
+results = ResultBuffer()
+stages = []
 
 
 def night_vision_effect(frame):
@@ -196,26 +207,40 @@ def adjust_gamma(image, gamma=1.0):
 
 threading.Thread(target=save_and_send_thread, daemon=True).start()
 
-# === MAIN LOOP ===
-while True:
+# === PIPELINE STAGES ===
+def capture():
+    global capture_seq
     ret, frame = cap.read()
     if not ret:
-        break
-
-    frame_count += 1
-    now = time.time()
-    fps = 1 / (now - prev_time)
-    prev_time = now
+        stop.set()
+        return None
+    capture_seq += 1
+    return Frame(capture_seq, frame)
 
+def preprocess(item):
     if night_vision:
-        adjusted = night_vision_effect(frame)
+        item.image = night_vision_effect(item.image)
     else:
-        adjusted = cv2.convertScaleAbs(frame, alpha=contrast, beta=(brightness - 1.0) * 255)
-        adjusted = adjust_gamma(adjusted, gamma)
+        adjusted = cv2.convertScaleAbs(item.image, alpha=contrast, beta=(brightness - 1.0) * 255)
+        item.image = adjust_gamma(adjusted, gamma)
+
+    if item.seq % DETECT_EVERY == 0:
+        inference_queue.put((item.seq, cv2.resize(item.image, (320, 240))))
+    return item
 
-    if frame_count % DETECT_EVERY == 0:
-        small_frame = cv2.resize(adjusted, (320, 240))
-        last_results = model.track(source=small_frame, persist=True, classes=TARGET_IDS, conf=0.8, verbose=False)[0]
+def infer(item):
+    seq, small_frame = item
+    results.add(seq, model.track(source=small_frame, persist=True, classes=TARGET_IDS, conf=0.8, verbose=False)[0])
+
+def render(item):
+    global prev_time, fps, end_to_end, last_detection_time, last_beep_time, active_types
+    now = time.time()
+    fps = 1 / max(now - prev_time, 1e-6)
+    prev_time = now
+    adjusted = item.image
+
+    # newest detection made on this frame or an earlier one
+    _, last_results = results.at(item.seq)
 
     detection_made = False
     if last_results:
@@ -263,10 +288,26 @@ while True:
     if time.time() - beep_toggle_time < 2:
         cv2.putText(adjusted, beep_toggle_msg, (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0) if ENABLE_BEEP else (0, 0, 255), 2)
 
-    with lock:
-        output_frame = adjusted.copy()
-
-    cv2.imshow("Tracking Detection", adjusted)
+    broadcaster.publish(adjusted)
+    end_to_end = end_to_end * 0.97 + (time.time() - item.captured) * 0.03
+    return item
+
+stages = [
+    Stage("capture", capture, outputs=[preprocess_queue], stop=stop),
+    Stage("preprocess", preprocess, preprocess_queue, [render_queue], stop=stop),
+    Stage("inference", infer, inference_queue, stop=stop),
+    Stage("render", render, render_queue, [display_queue], stop=stop),
+]
+for stage in stages:
+    stage.start()
+
+# === MAIN LOOP (display and keys, OpenCV windows belong to the main thread) ===
+while not stop.is_set():
+    item = display_queue.get(timeout=0.5)
+    if item is None:
+        continue
+
+    cv2.imshow("Tracking Detection", item.image)
     key = cv2.waitKey(1) & 0xFF
 
     if key == ord('q'):
@@ -300,5 +341,6 @@ while True:
         last_adjust_msg = f"Night Vision: {'ON' if night_vision else 'OFF'}"
         last_adjust_time = time.time()
 
+stop.set()
 cap.release()
 cv2.destroyAllWindows()
\ No newline at end of file
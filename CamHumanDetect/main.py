@@ -1,7 +1,8 @@
 import cv2
 import time
 import os
-from ultralytics import YOLO
+from backend import load_model
+from motion import MotionGate
 import threading
 from datetime import datetime
 import logging
@@ -38,8 +39,8 @@ class VideoStream:
         self.stopped = True
         self.cap.release()
 
-# Load YOLOv8 model on CUDA with half precision for speed
-model = YOLO("yolov8n.pt").to('cuda').half()
+# Load YOLOv8 model on the configured backend (DETECTOR_BACKEND), half precision on CUDA for speed
+model = load_model(half=True, batch=3)  # batch: up to 3 motion regions per call
 
 # Initialize threaded video capture
 stream = VideoStream(0)
@@ -89,14 +90,17 @@ brightness_msg_time = 0
 
 # Function to update the background subtractor with new sensitivity threshold
 def update_bg_subtractor(thresh):
-    global bg_subtractor, sensitivity, sensitivity_msg, sensitivity_msg_time
+    global sensitivity, sensitivity_msg, sensitivity_msg_time
     sensitivity = thresh
-    bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=sensitivity)
+    motion_gate.set_sensitivity(sensitivity)
     sensitivity_msg = f"MaskSensitivity: {sensitivity}"
     sensitivity_msg_time = time.time()
 
-# Initialize background subtractor
-bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=sensitivity)
+# Motion gate: background subtraction on a downscaled frame decides whether YOLO runs,
+# on the full frame or only on the regions that move
+motion_gate = MotionGate(var_threshold=sensitivity, max_rois=3)
+gate_msg = ""
+gate_msg_time = 0
 
 # Play beep sound in a separate thread to avoid blocking
 def play_beep():
@@ -139,13 +143,15 @@ def adjust_brightness(frame, factor):
     final_hsv = cv2.merge((h, s, v))
     return cv2.cvtColor(final_hsv, cv2.COLOR_HSV2BGR)
 
-# Detect objects in the frame using YOLO model
-def detect_objects(frame):
-    results = model(frame, classes=list(class_names.keys()))  # Run detection on specified classes
+# Detect objects in the frame using YOLO model, only inside rois (x1, y1, x2, y2) when given
+def detect_objects(frame, rois=None):
+    regions = rois or [(0, 0, frame.shape[1], frame.shape[0])]
+    crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+    results = model(crops, classes=list(class_names.keys()))  # Run detection on specified classes, one batch
     counts = {"Person":0,"Car":0,"Cat":0,"Dog":0}
     detected = False
 
-    for r in results:
+    for (ox, oy, _, _), r in zip(regions, results):
         for box in r.boxes:
             cls = int(box.cls[0])  # Class id
             conf = float(box.conf[0]) * 100  # Confidence %
@@ -157,6 +163,7 @@ def detect_objects(frame):
             color = (0, green, red)  # BGR format
 
             x1,y1,x2,y2 = map(int, box.xyxy[0])
+            x1, y1, x2, y2 = x1 + ox, y1 + oy, x2 + ox, y2 + oy  # crop to frame coordinates
             # Draw bounding box
             cv2.rectangle(frame, (x1,y1), (x2,y2), color, 2)
             # Draw label above box
@@ -197,17 +204,20 @@ def save_snapshot(frame):
 detect_queue = queue.Queue(maxsize=1)
 results_lock = threading.Lock()
 latest_result = (None, {"Person":0,"Car":0,"Cat":0,"Dog":0}, False)
+detect_generation = 0  # Bumped when the scene goes static, results of older frames are discarded
 
 # Background thread running detection on frames from queue
 def detection_worker():
     global latest_result
     while True:
-        frame = detect_queue.get()
-        if frame is None:  # Exit signal
+        item = detect_queue.get()
+        if item is None:  # Exit signal
             break
-        detected_frame, counts, detected = detect_objects(frame)
+        frame, rois, generation = item
+        detected_frame, counts, detected = detect_objects(frame, rois)
         with results_lock:
-            latest_result = (detected_frame, counts, detected)
+            if generation == detect_generation:
+                latest_result = (detected_frame, counts, detected)
         detect_queue.task_done()
 
 # Start detection thread
@@ -222,11 +232,8 @@ while True:
     # Adjust brightness
     adjusted_frame = adjust_brightness(frame, brightness_factor)
 
-    # Apply background subtraction to extract moving objects
-    fg_mask = bg_subtractor.apply(adjusted_frame)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5,5))
-    fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)  # Clean mask
-    fg = cv2.bitwise_and(adjusted_frame, adjusted_frame, mask=fg_mask)  # Mask applied frame
+    # Motion gate: None = static scene (skip YOLO), [] = full frame, else regions to crop to
+    rois = motion_gate.check(adjusted_frame)
 
     # Apply vision mode filters
     if mode == 1:
@@ -239,8 +246,19 @@ while True:
         display_frame = adjusted_frame.copy()
 
     frame_counter += 1
+    if rois is None:
+        # Nothing moves: no inference, and no stale detections keeping the alarm going,
+        # including the result of a frame the worker is still running
+        with results_lock:
+            detect_generation += 1
+            latest_result = (None, {"Person":0,"Car":0,"Cat":0,"Dog":0}, False)
+        try:
+            detect_queue.get_nowait()
+            detect_queue.task_done()
+        except queue.Empty:
+            pass
     # Submit frame to detection queue if fastmode allows
-    if not frame_skip_enabled or (frame_counter % frame_skip == 0):
+    elif not frame_skip_enabled or (frame_counter % frame_skip == 0):
         # If queue full, drop oldest to avoid lag
         if detect_queue.full():
             try:
@@ -248,7 +266,8 @@ while True:
                 detect_queue.task_done()
             except queue.Empty:
                 pass
-        detect_queue.put(fg)
+        # A copy of the unmasked frame (masking hurts accuracy), the worker draws its boxes on it
+        detect_queue.put((adjusted_frame.copy(), rois, detect_generation))
 
     # Get latest detection results thread-safely
     with results_lock:
@@ -274,6 +293,13 @@ while True:
                 (display_frame.shape[1] - text_w - 10, 20),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
 
+    # Share of frames the motion gate kept away from YOLO
+    skip_text = f"Skipped: {motion_gate.skip_ratio:.0%}" if motion_gate.enabled else "Gate: OFF"
+    (text_w, _), _ = cv2.getTextSize(skip_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+    cv2.putText(display_frame, skip_text,
+                (display_frame.shape[1] - text_w - 10, 45),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
     # Show current date/time bottom left
     now = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
     cv2.putText(display_frame, now,
@@ -290,6 +316,9 @@ while True:
     if fastmode_msg and (time.time() - fastmode_msg_time) < 2:
         cv2.putText(display_frame, fastmode_msg, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
 
+    if gate_msg and (time.time() - gate_msg_time) < 2:
+        cv2.putText(display_frame, gate_msg, (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+
     # Show help overlay if enabled
     if show_help:
         help_text = """
@@ -300,9 +329,10 @@ while True:
         [+] / [-] Adjust Mask Sensitivity
         [I] / [K] Adjust Brightness
         [F] Toggle FastMode
+        [G] Toggle Motion Gate
         """
         for idx, line in enumerate(help_text.strip().splitlines()):
-            cv2.putText(display_frame, line.strip(), (10, 150 + idx * 20),
+            cv2.putText(display_frame, line.strip(), (10, 180 + idx * 20),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
 
     # Show main window with detections
@@ -310,7 +340,11 @@ while True:
 
     # Show or hide foreground mask window
     if show_mask:
-        cv2.imshow("Foreground Mask", fg_mask)
+        mask_view = cv2.cvtColor(cv2.resize(motion_gate.mask, (frame.shape[1], frame.shape[0]),
+                                            interpolation=cv2.INTER_NEAREST), cv2.COLOR_GRAY2BGR)
+        for x1, y1, x2, y2 in rois or []:
+            cv2.rectangle(mask_view, (x1, y1), (x2, y2), (0, 255, 0), 2)  # regions sent to YOLO
+        cv2.imshow("Foreground Mask", mask_view)
     else:
         try:
             cv2.destroyWindow("Foreground Mask")
@@ -345,8 +379,13 @@ while True:
         fastmode_msg_time = time.time()
     elif key == ord('h'):  # Toggle help overlay
         show_help = not show_help
+    elif key == ord('g'):  # Toggle motion gate (off: YOLO on every frame)
+        motion_gate.enabled = not motion_gate.enabled
+        gate_msg = f"MotionGate: {'ON' if motion_gate.enabled else 'OFF'}"
+        gate_msg_time = time.time()
 
 # Cleanup on exit
+print("Motion gate:", motion_gate.stats)
 stream.release()
 cv2.destroyAllWindows()
 log_file.close()
\ No newline at end of file
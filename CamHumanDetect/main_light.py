@@ -1,7 +1,7 @@
 import cv2
 import time
 import os
-from ultralytics import YOLO
+from backend import load_model
 import threading
 from datetime import datetime
 import logging
@@ -10,7 +10,7 @@ import simpleaudio as sa  # Assuming you already switched to simpleaudio
 # Silence ultralytics logs
 logging.getLogger("ultralytics").setLevel(logging.ERROR)
 
-model = YOLO("yolov8n.pt").to('cuda')
+model = load_model()
 cap = cv2.VideoCapture(0)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
 cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
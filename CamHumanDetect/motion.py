@@ -0,0 +1,126 @@
+import time
+
+import cv2
+
+
+class MotionGate:
+    """
+    Decides per frame whether object detection is worth running, and where.
+
+    A MOG2 background subtractor runs on a small grayscale copy of the frame.
+    When less than `min_ratio` of it is moving the scene is static and
+    inference is skipped (after `hold` frames, so objects that just stopped
+    still get counted). When the motion is confined to a few regions the
+    frame is cropped to them, padded by `padding` of their size. Larger or
+    scattered motion runs on the full frame.
+    """
+
+    def __init__(self, scale=0.25, min_ratio=0.002, max_roi_ratio=0.4, max_rois=3, padding=0.25,
+                 min_region=0.0005, hold=15, var_threshold=50, history=500):
+        self.scale = scale
+        self.min_ratio = min_ratio
+        self.max_roi_ratio = max_roi_ratio
+        self.max_rois = max_rois
+        self.padding = padding
+        self.min_region = min_region
+        self.hold = hold
+        self.history = history
+        self.enabled = True
+        self.mask = None
+        self.ratio = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.cropped = 0
+        self.gate_time = 0.0
+        self._still = hold
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.set_sensitivity(var_threshold)
+
+    def set_sensitivity(self, var_threshold):
+        self.var_threshold = var_threshold
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(history=self.history, varThreshold=var_threshold)
+
+    def check(self, frame):
+        """
+        Returns None to skip inference, [] for the full frame or a list of
+        (x1, y1, x2, y2) regions in frame coordinates to crop to.
+        """
+        begin = time.perf_counter()
+        self.frames += 1
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        mask = self._subtractor.apply(small)
+        # MOG2 marks shadows as 127, only count real foreground
+        _, mask = cv2.threshold(mask, 200, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+        self.mask = mask
+        self.ratio = cv2.countNonZero(mask) / float(mask.size)
+        try:
+            if not self.enabled:
+                return []
+            if self.ratio < self.min_ratio:
+                self._still += 1
+                if self._still > self.hold:
+                    self.skipped += 1
+                    return None
+                return []
+            self._still = 0
+            rois = self._regions(mask, frame.shape)
+            if rois:
+                self.cropped += 1
+            return rois
+        finally:
+            self.gate_time += time.perf_counter() - begin
+
+    def _regions(self, mask, shape):
+        height, width = shape[:2]
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = self.min_region * mask.size
+        boxes = []
+        for contour in contours:
+            if cv2.contourArea(contour) < min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            pad_x, pad_y = int(w * self.padding) + 2, int(h * self.padding) + 2
+            boxes.append([max(0, x - pad_x), max(0, y - pad_y),
+                          min(mask.shape[1], x + w + pad_x), min(mask.shape[0], y + h + pad_y)])
+        boxes = self._merge(boxes)
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in boxes)
+        if not boxes or len(boxes) > self.max_rois or area > self.max_roi_ratio * mask.size:
+            return []
+        return [(int(x1 / self.scale), int(y1 / self.scale),
+                 min(width, int(x2 / self.scale)), min(height, int(y2 / self.scale))) for x1, y1, x2, y2 in boxes]
+
+    @staticmethod
+    def _merge(boxes):
+        """Union overlapping boxes until none overlap."""
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for box in boxes:
+                for other in result:
+                    if box[0] <= other[2] and other[0] <= box[2] and box[1] <= other[3] and other[1] <= box[3]:
+                        other[:] = [min(box[0], other[0]), min(box[1], other[1]),
+                                    max(box[2], other[2]), max(box[3], other[3])]
+                        merged = True
+                        break
+                else:
+                    result.append(box)
+            boxes = result
+        return boxes
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "cropped": self.cropped,
+            "skip_ratio": round(self.skip_ratio, 3),
+            "motion_ratio": round(self.ratio, 4),
+            "gate_ms": round(self.gate_time * 1000 / self.frames, 2) if self.frames else 0,
+        }
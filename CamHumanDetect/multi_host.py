@@ -0,0 +1,315 @@
+"""
+One detector host for many cameras.
+
+Every source (camera index, video file or RTSP/HTTP URL) is read on its own
+thread that only keeps the newest frame. The detection loop takes the newest
+unprocessed frame of every camera, runs them through the model in one batched
+call and hands each result back to its camera, which draws it, serves it on
+/video_feed/<name> and saves snapshots to snapshots/<name>/.
+
+    python multi_host.py 0 front=rtsp://192.168.1.20:554/stream yard=yard.mp4 --port 5000
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+from flask import Flask, Response, abort, jsonify, render_template, send_from_directory
+
+from backend import load_model
+from broadcaster import FrameBroadcaster
+
+TARGET_CLASSES = ["person", "car", "dog", "cat"]
+RECONNECT_DELAY = 2.0
+DETECTION_COOLDOWN = 0.333
+SNAPSHOT_DIR = "snapshots"
+
+
+class Camera:
+    """One video source read on its own thread, only the newest frame is kept."""
+
+    def __init__(self, name, source, width=640, height=480):
+        self.name = name
+        self.source = int(source) if source.isdigit() else source
+        self.width = width
+        self.height = height
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.broadcaster = FrameBroadcaster()
+        self.snapshot_dir = os.path.join(SNAPSHOT_DIR, name)
+        self.connected = False
+        self.captured = 0
+        self.processed = 0
+        self.fps = 0.0
+        self.active_types = set()
+        self.last_detection_time = 0
+        self._seq = 0
+        self._frame = None
+        self._lock = threading.Lock()
+        self._ready = None
+        self._stopped = threading.Event()
+        self._last_render = time.time()
+
+    def start(self, ready):
+        """ready: Event set whenever a new frame is captured"""
+        self._ready = ready
+        threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def tick(self):
+        """Count one processed frame for the fps shown on the stream."""
+        now = time.time()
+        self.fps = self.fps * 0.9 + 0.1 / max(now - self._last_render, 1e-6)
+        self._last_render = now
+        self.processed += 1
+        return now
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            # live sources: don't let the driver queue stale frames
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _run(self):
+        while not self._stopped.is_set():
+            cap = self._open()
+            if not cap.isOpened():
+                print(f"[{self.name}] Cannot open {self.source}, retrying in {RECONNECT_DELAY}s")
+                self._stopped.wait(RECONNECT_DELAY)
+                continue
+            self.connected = True
+            # video files are played at their own frame rate and looped
+            interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 25) if self.is_file else 0
+            next_frame = time.time()
+            while not self._stopped.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    if self.is_file:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+                with self._lock:
+                    self._frame = frame
+                    self._seq += 1
+                    self.captured += 1
+                self._ready.set()
+                if interval:
+                    next_frame += interval
+                    time.sleep(max(0, next_frame - time.time()))
+            self.connected = False
+            cap.release()
+            if not self._stopped.is_set():
+                print(f"[{self.name}] Stream lost, reconnecting in {RECONNECT_DELAY}s")
+                self._stopped.wait(RECONNECT_DELAY)
+
+    def latest(self, after):
+        """(seq, frame) of the newest frame once its seq is above `after`, (after, None) otherwise."""
+        with self._lock:
+            if self._seq > after:
+                return self._seq, self._frame
+        return after, None
+
+    @property
+    def stats(self):
+        return {
+            "source": str(self.source),
+            "connected": self.connected,
+            "captured": self.captured,
+            "processed": self.processed,
+            "fps": round(self.fps, 1),
+            "viewers": self.broadcaster.clients,
+        }
+
+
+class MultiDetector:
+    """Batched detection over the newest frame of every camera."""
+
+    def __init__(self, cameras, model, conf=0.6, min_area=1000):
+        self.cameras = cameras
+        self.model = model
+        self.conf = conf
+        self.min_area = min_area
+        self.names = model.names
+        self.target_ids = [i for i, name in self.names.items() if name in TARGET_CLASSES]
+        self.batches = 0
+        self.frames = 0
+        self.inference_time = 0.0
+        self.started = time.time()
+        self.snapshots = queue.Queue(maxsize=100)
+        self._ready = threading.Event()
+
+    def start(self):
+        for camera in self.cameras:
+            camera.start(self._ready)
+        threading.Thread(target=self._save_snapshots, daemon=True).start()
+        threading.Thread(target=self._run, name="detector", daemon=True).start()
+        return self
+
+    def _run(self):
+        last = {camera.name: 0 for camera in self.cameras}
+        while True:
+            self._ready.wait(0.5)
+            self._ready.clear()
+            batch = []
+            for camera in self.cameras:
+                seq, frame = camera.latest(last[camera.name])
+                if frame is not None:
+                    last[camera.name] = seq
+                    batch.append((camera, frame))
+            if not batch:
+                continue
+
+            begin = time.perf_counter()
+            results = self.model.predict([frame for _, frame in batch], classes=self.target_ids,
+                                         conf=self.conf, verbose=False)
+            self.inference_time += time.perf_counter() - begin
+            self.batches += 1
+            self.frames += len(batch)
+
+            for (camera, frame), result in zip(batch, results):
+                self.render(camera, frame.copy(), result)
+
+    def render(self, camera, frame, result):
+        now = camera.tick()
+
+        types_detected = set()
+        for box in result.boxes:
+            cls_id = int(box.cls[0])
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            if (x2 - x1) * (y2 - y1) < self.min_area or cls_id not in self.target_ids:
+                continue
+            label = self.names[cls_id]
+            types_detected.add(label)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 255), 2)
+            cv2.putText(frame, f"{label} {float(box.conf[0]):.2f}", (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 2)
+
+        cv2.putText(frame, camera.name, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.putText(frame, f"FPS: {camera.fps:.1f}", (frame.shape[1] - 100, 25),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        cv2.putText(frame, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), (10, frame.shape[0] - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+        if types_detected:
+            if now - camera.last_detection_time > DETECTION_COOLDOWN or types_detected != camera.active_types:
+                camera.last_detection_time = now
+                camera.active_types = types_detected
+                filename = os.path.join(camera.snapshot_dir, datetime.now().strftime("snapshot_%Y%m%d_%H%M%S_%f.jpg"))
+                try:
+                    self.snapshots.put_nowait((filename, frame))
+                except queue.Full:
+                    pass
+        else:
+            camera.active_types = set()
+
+        camera.broadcaster.publish(frame)
+
+    def _save_snapshots(self):
+        while True:
+            filename, frame = self.snapshots.get()
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            cv2.imwrite(filename, frame)
+
+    @property
+    def stats(self):
+        running = time.time() - self.started
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "mean_batch": round(self.frames / self.batches, 2) if self.batches else 0,
+            "inference_ms_per_batch": round(self.inference_time * 1000 / self.batches, 1) if self.batches else 0,
+            "frames_per_second": round(self.frames / running, 1) if running else 0,
+            "snapshot_queue": self.snapshots.qsize(),
+            "cameras": {camera.name: camera.stats for camera in self.cameras},
+        }
+
+
+def parse_sources(sources):
+    """['0', 'front=rtsp://...'] -> [('cam0', '0'), ('front', 'rtsp://...')]"""
+    cameras = []
+    for i, source in enumerate(sources):
+        name, sep, value = source.partition("=")
+        if sep and "://" not in name and name:
+            cameras.append((name, value))
+        else:
+            cameras.append((f"cam{i}", source))
+    seen = set()
+    for name, _ in cameras:
+        # names key the routes and snapshot folders, a second camera would shadow the first
+        if name in seen:
+            raise ValueError(f"Duplicate camera name {name!r}")
+        seen.add(name)
+    return cameras
+
+
+app = Flask(__name__)
+detector = None
+
+
+def camera_or_404(name):
+    camera = next((c for c in detector.cameras if c.name == name), None)
+    if camera is None:
+        abort(404)
+    return camera
+
+
+@app.route('/')
+def index():
+    return render_template('multi.html', cameras=[c.name for c in detector.cameras])
+
+
+@app.route('/video_feed/<name>')
+def video_feed(name):
+    camera = camera_or_404(name)
+    return Response(camera.broadcaster.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.route('/gallery/<name>')
+def gallery(name):
+    camera = camera_or_404(name)
+    folder = camera.snapshot_dir
+    files = sorted(os.listdir(folder), reverse=True) if os.path.isdir(folder) else []
+    files = [f"{name}/{f}" for f in files if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    return render_template('snapshots.html', files=files)
+
+
+@app.route('/snapshots/<path:filename>')
+def snapshot_file(filename):
+    return send_from_directory(SNAPSHOT_DIR, filename)
+
+
+@app.route('/stats')
+def stats():
+    return jsonify(detector.stats)
+
+
+def main():
+    global detector
+    parser = argparse.ArgumentParser(description="Multi-camera YOLO detection server")
+    parser.add_argument("sources", nargs="+", help="camera index, video file or URL, optionally name=source")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--conf", type=float, default=0.6)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    try:
+        sources = parse_sources(args.sources)
+    except ValueError as e:
+        parser.error(str(e))
+    cameras = [Camera(name, source, args.width, args.height) for name, source in sources]
+    model = load_model(batch=len(cameras))
+    detector = MultiDetector(cameras, model, conf=args.conf).start()
+    app.run(host='0.0.0.0', port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import collections
+import threading
+import time
+
+
+class Frame:
+    """One captured frame travelling through the pipeline."""
+    __slots__ = ("seq", "captured", "image")
+
+    def __init__(self, seq, image):
+        self.seq = seq
+        self.captured = time.time()
+        self.image = image
+
+
+class DropQueue:
+    """Bounded queue between two stages, put() drops the oldest item instead of blocking the producer."""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest item, None on timeout or once closed."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ResultBuffer:
+    """Recent detection results by frame sequence number."""
+
+    def __init__(self, size=16):
+        self._results = collections.OrderedDict()
+        self._size = size
+        self._lock = threading.Lock()
+
+    def add(self, seq, result):
+        with self._lock:
+            self._results[seq] = result
+            while len(self._results) > self._size:
+                self._results.popitem(last=False)
+
+    def at(self, seq):
+        """(result seq, result) of the newest result not newer than frame `seq`, (None, None) if there is none."""
+        with self._lock:
+            for result_seq in reversed(self._results):
+                if result_seq <= seq:
+                    return result_seq, self._results[result_seq]
+        return None, None
+
+
+class Stage:
+    """
+    One pipeline stage on its own thread. Takes items from `source` (or calls
+    work() in a loop when it has none, for the capture stage), and puts what
+    work returns in every queue of `outputs`. Returning None drops the item.
+    """
+
+    def __init__(self, name, work, source=None, outputs=(), stop=None):
+        self.name = name
+        self.work = work
+        self.source = source
+        self.outputs = list(outputs)
+        self.stop = stop or threading.Event()
+        self.processed = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self._started = None
+        self._thread = None
+
+    def start(self):
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while not self.stop.is_set():
+                if self.source is None:
+                    item = None
+                else:
+                    item = self.source.get(timeout=0.5)
+                    if item is None:
+                        continue
+                begin = time.perf_counter()
+                result = self.work() if self.source is None else self.work(item)
+                elapsed = time.perf_counter() - begin
+                # moving average over roughly the last 30 items
+                self.latency = elapsed if not self.processed else self.latency * 0.97 + elapsed * 0.03
+                self.max_latency = max(self.max_latency, elapsed)
+                self.processed += 1
+                if result is not None:
+                    for queue in self.outputs:
+                        queue.put(result)
+        finally:
+            # the stage feeding nothing any more stops the whole pipeline
+            self.stop.set()
+            for queue in self.outputs:
+                queue.close()
+
+    @property
+    def stats(self):
+        running = time.time() - self._started if self._started else 0
+        return {
+            "processed": self.processed,
+            "latency_ms": round(self.latency * 1000, 2),
+            "max_latency_ms": round(self.max_latency * 1000, 2),
+            "fps": round(self.processed / running, 1) if running else 0,
+            "queue_depth": len(self.source) if self.source is not None else None,
+            "dropped": self.source.dropped if self.source is not None else 0,
+        }
@@ -0,0 +1,3 @@
+@echo off
+echo Running YOLOv8 multi-camera detection server...
+python multi_host.py 0 1
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+Aggregate signal analytics over the 1 s history (history.py) with NumPy.
+
+The samples of each router are mirrored from SQLite into append-only column
+files (one float64 file per column) and opened with np.memmap, so months of
+1 Hz data are sliced by time without reading them into memory. Only rows
+older than `settle` seconds are mirrored, newer ones can still be merged with
+a later partial sample. Once the history has pruned a day's worth of rows
+(history.RETENTION) the files are mirrored again, so they stay the same size.
+
+    analytics = Analytics(history, 'analytics')
+    analytics.band_percentiles(hours=24 * 30)
+    analytics.strength_time(hours=24)
+    analytics.correlation(hours=24 * 7)
+"""
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from history import COLUMNS, LOCAL
+from huawei_lte.records import RSRP_RANGE
+
+# Column files, band is stored as its number
+FILES = ['ts'] + COLUMNS + ['band']
+
+# A sample stands for the time until the next one, up to this many seconds
+MAX_GAP = 5
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Seconds of rows past the 1 s history retention kept before the column files are rebuilt
+PRUNE_SLACK = 86400
+
+def get_ranges(vals, values):
+    """
+    Vectorized huawei_lte.utils.getRange: the position of every value in a
+    descending range of values. E.g [10,5,2] gives 0:x>=10, 1:x>5, 2:x>2, 3:x<=2,
+    NaN gives 0 like getRange.
+    """
+    vals = np.asarray(vals, dtype=float)
+    values = np.asarray(values, dtype=float)
+    # vals[1:] ascending, count the thresholds a value is not above
+    rest = vals[1:][::-1]
+    result = 1 + len(rest) - np.searchsorted(rest, values, side='left')
+    result[values >= vals[0]] = 0
+    result[np.isnan(values)] = 0
+    return result
+
+def signal_strength(rsrp):
+    """ Vectorized records.Signal.strength: 0 - 5 from rsrp, 0 without a value """
+    strength = 5 - get_ranges(RSRP_RANGE, rsrp)
+    strength[np.isnan(rsrp)] = 0
+    return strength
+
+def to_band(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class Analytics:
+    """
+    history: history.History the samples are read from
+    directory: where the column files are kept, one folder per router
+    """
+    def __init__(self, history, directory, settle=120):
+        self.history = history
+        self.directory = directory
+        self.settle = settle
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _folder(self, router):
+        name = re.sub(r'[^\w.-]', '_', router)
+        if name in ('', '.', '..'):
+            raise ValueError(f'Invalid router name {router!r}')
+        return os.path.join(self.directory, name)
+
+    def _router_lock(self, router):
+        with self._lock:
+            return self._locks.setdefault(router, threading.Lock())
+
+    def _open(self, folder, name):
+        path = os.path.join(folder, name + '.f8')
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0)
+        return np.memmap(path, dtype=np.float64, mode='r')
+
+    def sync(self, router=LOCAL):
+        """ Append the settled history rows newer than the column files, returns the rows added """
+        folder = self._folder(router)
+        with self._router_lock(router):
+            os.makedirs(folder, exist_ok=True)
+            sizes = [os.path.getsize(os.path.join(folder, name + '.f8'))
+                     if os.path.exists(os.path.join(folder, name + '.f8')) else 0 for name in FILES]
+            length = min(sizes) // 8
+            if any(size != length * 8 for size in sizes):
+                # interrupted append, drop the partial row
+                for name in FILES:
+                    with open(os.path.join(folder, name + '.f8'), 'ab') as f:
+                        f.truncate(length * 8)
+            ts = self._open(folder, 'ts')
+            last = ts[length - 1] if length else None
+            keep = self.history.retention.get(1)
+            if length and keep is not None and ts[0] < time.time() - keep - PRUNE_SLACK:
+                # the history no longer has these rows, mirror what it still holds
+                del ts
+                for name in FILES:
+                    os.remove(os.path.join(folder, name + '.f8'))
+                last = time.time() - keep
+
+            cursor = self.history.samples(router, after=last, before=time.time() - self.settle)
+            added = 0
+            files = [open(os.path.join(folder, name + '.f8'), 'ab') for name in FILES]
+            try:
+                while True:
+                    rows = cursor.fetchmany(65536)
+                    if not rows:
+                        break
+                    band = np.array([to_band(row[-1]) for row in rows])
+                    values = np.array([row[:-1] for row in rows], dtype=np.float64)
+                    columns = np.column_stack([values, band])
+                    for i, f in enumerate(files):
+                        f.write(np.ascontiguousarray(columns[:, i]).tobytes())
+                    added += len(rows)
+            finally:
+                for f in files:
+                    f.close()
+            return added
+
+    def load(self, router=LOCAL, start=None, end=None):
+        """ {column: array} of the samples with start <= ts < end, sliced from the memory-mapped files """
+        self.sync(router)
+        folder = self._folder(router)
+        with self._router_lock(router):
+            columns = dict((name, self._open(folder, name)) for name in FILES)
+        length = min(len(column) for column in columns.values())
+        ts = columns['ts'][:length]
+        low = 0 if start is None else np.searchsorted(ts, start, side='left')
+        high = length if end is None else np.searchsorted(ts, end, side='left')
+        return dict((name, column[low:high]) for name, column in columns.items())
+
+    def _range(self, router, hours, end):
+        end = time.time() if end is None else end
+        return self.load(router, None if hours is None else end - hours * 3600, end)
+
+    @staticmethod
+    def durations(ts):
+        """ Seconds each sample stands for: the gap to the next one, capped at MAX_GAP """
+        if len(ts) == 0:
+            return np.empty(0)
+        return np.minimum(np.diff(ts, append=ts[-1] + 1), MAX_GAP)
+
+    def band_percentiles(self, router=LOCAL, hours=24, end=None, columns=('rsrp', 'rsrq', 'sinr'),
+                         percentiles=PERCENTILES):
+        """ {band: {'samples': n, 'seconds': s, column: {percentile: value}}} """
+        data = self._range(router, hours, end)
+        band = data['band']
+        known = ~np.isnan(band)
+        bands, inverse = np.unique(band[known], return_inverse=True)
+        seconds = np.bincount(inverse, weights=self.durations(data['ts'])[known], minlength=len(bands))
+        result = {}
+        for i, value in enumerate(bands):
+            selected = inverse == i
+            entry = {'samples': int(selected.sum()), 'seconds': float(seconds[i])}
+            for col in columns:
+                values = data[col][known][selected]
+                values = values[~np.isnan(values)]
+                if len(values):
+                    entry[col] = dict(zip([str(p) for p in percentiles], np.percentile(values, percentiles).tolist()))
+                else:
+                    entry[col] = None
+            result['%g' % value] = entry
+        return result
+
+    def strength_time(self, router=LOCAL, hours=24, end=None):
+        """ Seconds spent at each signal strength (0 - 5, see records.Signal.strength) """
+        data = self._range(router, hours, end)
+        rsrp = np.asarray(data['rsrp'])
+        seen = ~np.isnan(rsrp)
+        seconds = np.bincount(signal_strength(rsrp[seen]), weights=self.durations(data['ts'])[seen], minlength=6)
+        return dict((str(strength), float(seconds[strength])) for strength in range(6))
+
+    def correlation(self, router=LOCAL, hours=24, end=None, rate='dl_rate', step=5):
+        """
+        Pearson correlation of a throughput column with rsrp, rsrq and sinr, and the
+        mean throughput per `step` dB of rsrp
+        """
+        data = self._range(router, hours, end)
+        result = {'rate': rate, 'correlation': {}, 'by_rsrp': {}}
+        throughput = np.asarray(data[rate])
+        for col in ('rsrp', 'rsrq', 'sinr'):
+            values = np.asarray(data[col])
+            both = ~(np.isnan(values) | np.isnan(throughput))
+            if both.sum() > 2 and values[both].std() > 0 and throughput[both].std() > 0:
+                result['correlation'][col] = float(np.corrcoef(values[both], throughput[both])[0, 1])
+            else:
+                result['correlation'][col] = None
+
+        rsrp = np.asarray(data['rsrp'])
+        both = ~(np.isnan(rsrp) | np.isnan(throughput))
+        if both.any():
+            bins = (np.floor(rsrp[both] / step) * step).astype(int)
+            low = bins.min()
+            counts = np.bincount(bins - low)
+            sums = np.bincount(bins - low, weights=throughput[both])
+            for i in np.nonzero(counts)[0]:
+                result['by_rsrp'][str(int(low + i))] = {'samples': int(counts[i]), 'mean': float(sums[i] / counts[i])}
+        return result
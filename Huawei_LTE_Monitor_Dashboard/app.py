@@ -1,15 +1,32 @@
-from flask import Flask, render_template, jsonify, request
+import os
+from flask import Flask, render_template, jsonify, request, Response
 import router_api as router_api
+from collector import Collector
+from fleet import Fleet
 
 app = Flask(__name__)
 
+# One background sampler shared by every open page, it also records the 1 Hz history (history.py)
+collector = Collector({
+    'speed': (router_api.get_router_speeds, 1),
+    'signal': (router_api.get_router_signal, 1),
+    'strength': (router_api.get_signal_strength, 1),
+    'notifications': (router_api.get_notifications, 5),
+})
+
+# Optional multi-router monitor, enabled when fleet.json next to this file (or $FLEET_CONFIG) exists
+FLEET_CONFIG = os.environ.get('FLEET_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fleet.json'))
+fleet = Fleet.from_config(FLEET_CONFIG) if os.path.exists(FLEET_CONFIG) else None
+# Skip the debug reloader's watcher process, only the serving process polls
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    collector.start()
+    if fleet is not None:
+        fleet.start()
+
 @app.route('/')
 def dashboard():
-    data = router_api.get_router_signal()
-    sig = router_api.get_signal_strength()
-    not_count = router_api.get_notifications()
-    info = router_api.get_device_info()
-    return render_template('dashboard.html', data=data, signal_strength=sig, not_count=not_count, info=info)
+    page = router_api.get_dashboard()
+    return render_template('dashboard.html', **page)
 
 @app.route('/data')
 def data():
@@ -32,10 +49,63 @@ def get_net_info():
     net_info = router_api.get_network_info()
     return jsonify(net_info)
 
+@app.route('/system/history')
+def system_history():
+    hours = request.args.get('hours', 24, type=float)
+    points = min(request.args.get('points', 600, type=int), 5000)
+    return jsonify(router_api.get_history(hours, points))
+
+def unknown_router(name):
+    """ 404 response unless the history has samples of the router """
+    if router_api.has_history(name):
+        return None
+    return jsonify({'message': f'Unknown router {name}'}), 404
+
+@app.route('/analytics/bands')
+def analytics_bands():
+    hours = request.args.get('hours', 24, type=float)
+    name = request.args.get('router', 'local')
+    return unknown_router(name) or jsonify(router_api.get_band_stats(hours, name))
+
+@app.route('/analytics/strength')
+def analytics_strength():
+    hours = request.args.get('hours', 24, type=float)
+    name = request.args.get('router', 'local')
+    return unknown_router(name) or jsonify(router_api.get_strength_time(hours, name))
+
+@app.route('/analytics/correlation')
+def analytics_correlation():
+    hours = request.args.get('hours', 24, type=float)
+    rate = request.args.get('rate', 'dl_rate')
+    if rate not in ('dl_rate', 'ul_rate'):
+        return jsonify({'message': f'Unknown rate {rate}'}), 400
+    name = request.args.get('router', 'local')
+    return unknown_router(name) or jsonify(router_api.get_signal_correlation(hours, name, rate))
+
+@app.route('/system/optimize', methods=['GET'])
+def optimizer_status():
+    return jsonify(router_api.get_optimizer_status())
+
+@app.route('/system/optimize', methods=['POST'])
+def optimizer_start():
+    data = request.get_json(silent=True) or {}
+    try:
+        started = router_api.start_optimizer(bands=data.get('bands') or None, antennas=data.get('antennas'),
+                                             budget=int(data.get('budget', 8)), window=float(data.get('window', 30)))
+    except Exception as e:
+        return jsonify({'message': f'Error: {str(e)}'}), 500
+    if not started:
+        return jsonify({'message': 'Optimizer already running'}), 409
+    return jsonify({'message': 'Optimizer started'})
+
+@app.route('/system/optimize/stop', methods=['POST'])
+def optimizer_stop():
+    router_api.stop_optimizer()
+    return jsonify({'message': 'Optimizer stopping, the baseline settings will be restored'})
+
 @app.route('/system/<command>', methods=['POST'])
 def system_command(command):
     router = router_api.get_router()
-    router.login(username='', password='')
 
     try:
         if command == 'reboot':
@@ -48,8 +118,6 @@ def system_command(command):
             msg = 'Unknown command'
     except Exception as e:
         msg = f'Error: {str(e)}'
-    finally:
-        router.logout()
 
     return jsonify({'message': msg})
 
@@ -61,7 +129,6 @@ def apply_network_settings():
     antenna = int(data.get('antenna', 3))  # default AUTO
 
     router = router_api.get_router()
-    router.login(username='', password='')
 
     try:
         router.net.set_network_mode({'mode': mode})
@@ -70,8 +137,6 @@ def apply_network_settings():
         msg = f"Settings applied: Mode={mode}, Bands={', '.join(bands)}, Antenna={antenna}"
     except Exception as e:
         msg = f"Error applying settings: {str(e)}"
-    finally:
-        router.logout()
 
     return jsonify({'message': msg})
 
@@ -93,9 +158,7 @@ def delete_sms(index):
     
 @app.route('/delete-all-sms', methods=['POST'])
 def delete_all_sms():
-    messages = router_api.get_sms_inbox()
-    for sms in messages:
-        router_api.delete_sms(sms['index'])
+    router_api.delete_all_sms()
     return jsonify({'message': 'All messages deleted'})
 
 @app.route('/send_sms', methods=['POST'])
@@ -105,7 +168,6 @@ def send_sms():
     message = data.get('message')
 
     router = router_api.get_router()
-    router.login(username='', password='')
 
     xml_payload = f"""<?xml version="1.0" encoding="UTF-8"?>
     <request>
@@ -126,8 +188,6 @@ def send_sms():
         msg = 'Message sent!' if resp else 'Failed to send message.'
     except Exception as e:
         msg = f'Error: {str(e)}'
-    finally:
-        router.logout()
 
     return jsonify({'message': msg})
 
@@ -148,5 +208,27 @@ def api_signal_strength():
     strength = router_api.get_signal_strength()
     return jsonify({'strength': strength})
 
+@app.route('/stream')
+def stream():
+    return Response(collector.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/fleet')
+def fleet_status():
+    if fleet is None:
+        return jsonify({'message': 'No fleet configured'}), 404
+    return jsonify(fleet.snapshot())
+
+@app.route('/fleet/<name>')
+def fleet_router(name):
+    state = fleet.router(name) if fleet is not None else None
+    if state is None:
+        return jsonify({'message': f'Unknown router {name}'}), 404
+    return jsonify(state)
+
+@app.route('/api/cache-stats')
+def api_cache_stats():
+    return jsonify(router_api.get_cache_stats())
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
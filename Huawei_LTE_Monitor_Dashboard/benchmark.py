@@ -0,0 +1,112 @@
+"""
+Benchmark the router_api functions against the local fake router.
+
+Reports operations/s, p50/p99 latency and router round trips per logical operation,
+with the huawei_lte response cache turned off and on, then the connection reuse
+of the shared router's pooled transport. The write operation is timed on the
+shared logged-in router and the old way (new router, login, write, logout).
+
+    python benchmark.py --iterations 200 --latency 0.005 --threads 1
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import threading
+import time
+
+from fake_router import FakeRouter
+
+USERNAME = 'admin'
+PASSWORD = 'benchmark'
+
+def write_with_login(router_api):
+    from huawei_lte.router import B525Router
+    router = B525Router(router_api.IP)
+    router.login(USERNAME, PASSWORD)
+    try:
+        router.device.set_antenna_type(0)
+    finally:
+        router.logout()
+
+def operations(router_api):
+    return [
+        ('login', lambda: router_api.router.login(USERNAME, PASSWORD)),
+        ('get_router_signal', router_api.get_router_signal),
+        ('get_signal_strength', router_api.get_signal_strength),
+        ('get_router_speeds', router_api.get_router_speeds),
+        ('get_notifications', router_api.get_notifications),
+        ('get_device_info', router_api.get_device_info),
+        ('get_network_info', router_api.get_network_info),
+        ('get_sms_inbox', router_api.get_sms_inbox),
+        ('get_dashboard', router_api.get_dashboard),
+        ('set_antenna_type', lambda: router_api.set_antenna_type(0)),
+        ('set_antenna (login)', lambda: write_with_login(router_api)),
+    ]
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+def measure(fake, func, iterations, threads=1):
+    """ Returns (ops/s, p50 ms, p99 ms, round trips per op) """
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        local = []
+        for _ in range(count):
+            start = time.perf_counter()
+            func()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    fake.reset_counts()
+    per_thread = max(1, iterations // threads)
+    pool = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(threads)]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+    elapsed = time.perf_counter() - started
+    ops = per_thread * threads
+    return ops / elapsed, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000, fake.total / float(ops)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark router_api against the fake router')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added per router request')
+    parser.add_argument('--cache', choices=['off', 'on', 'both'], default='both')
+    args = parser.parse_args()
+
+    fake = FakeRouter(username=USERNAME, password=PASSWORD, latency=args.latency)
+    os.environ['ROUTER_IP'] = fake.start()
+    os.environ['ROUTER_USERNAME'] = USERNAME
+    os.environ['ROUTER_PASSWORD'] = PASSWORD
+    import router_api
+    from huawei_lte.cache import ResponseCache
+
+    modes = ['off', 'on'] if args.cache == 'both' else [args.cache]
+    print('latency %.1f ms, %i iterations, %i thread(s)' % (args.latency * 1000, args.iterations, args.threads))
+    print('%-22s %6s %10s %10s %10s %12s' % ('operation', 'cache', 'ops/s', 'p50 ms', 'p99 ms', 'round trips'))
+    for mode in modes:
+        router_api.router.cache = ResponseCache() if mode == 'on' else None
+        for name, func in operations(router_api):
+            # Logins are slow on a real router, keep their count down
+            iterations = min(args.iterations, 20) if 'login' in name else args.iterations
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            rate, p50, p99, trips = measure(fake, func, iterations, args.threads)
+            print('%-22s %6s %10.1f %10.2f %10.2f %12.2f' % (name, mode, rate, p50, p99, trips))
+    print()
+    print('shared router transport: %s' % router_api.router.transport_stats)
+    fake.stop()
+
+if __name__ == '__main__':
+    main()
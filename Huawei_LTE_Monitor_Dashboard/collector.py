@@ -0,0 +1,113 @@
+import json
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Collector:
+    """
+    Samples the router from one background thread on a fixed cadence and pushes
+    the values that changed to every subscriber, so router load does not grow
+    with the number of open dashboards.
+
+    sources: {'name': (function, period_seconds)}
+    """
+    def __init__(self, sources, tick=0.25, backlog=10):
+        self.sources = sources
+        self.tick = tick
+        self.backlog = backlog
+        self.state = {}
+        self.samples = 0
+        self._due = {name: 0 for name in sources}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def subscribe(self):
+        """ Returns a queue of update dicts, the first one is the full current state """
+        q = queue.Queue(maxsize=self.backlog)
+        with self._lock:
+            if self.state:
+                q.put(dict(self.state))
+            self._subscribers.add(q)
+        self.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    @property
+    def clients(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def sample(self):
+        """ Sample every source that is due, returns the values that changed """
+        now = time.monotonic()
+        delta = {}
+        for name, (func, period) in self.sources.items():
+            if now < self._due[name]:
+                continue
+            self._due[name] = now + period
+            try:
+                value = func()
+            except Exception:
+                logger.exception('Sampling %s failed', name)
+                continue
+            self.samples += 1
+            if self.state.get(name) != value:
+                delta[name] = value
+        if delta:
+            self.publish(delta)
+        return delta
+
+    def publish(self, delta):
+        with self._lock:
+            self.state.update(delta)
+            snapshot = dict(self.state)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(delta)
+            except queue.Full:
+                # Slow client: replace its backlog with the full state rather than block the
+                # collector, a dropped delta of a rarely changing value would never be resent
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait(snapshot)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.sample()
+            self._stopped.wait(self.tick)
+
+    def stream(self, keepalive=15):
+        """ Server-sent events generator for a single client """
+        q = self.subscribe()
+        try:
+            while True:
+                try:
+                    delta = q.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield 'data: %s\n\n' % json.dumps(delta)
+        finally:
+            self.unsubscribe(q)
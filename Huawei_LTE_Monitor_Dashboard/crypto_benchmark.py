@@ -0,0 +1,76 @@
+"""
+Microbenchmarks for huawei_lte.crypto.
+
+SCRAM client proof per login, with the PBKDF2 key derivation run every time
+versus reused from crypto.KEY_CACHE.
+
+RSA request encryption (enc_api) throughput over payload sizes, with the
+cipher built on every call versus cached per router key.
+
+    python crypto_benchmark.py --iterations 100 1000 10000 --sizes 100 1000 10000
+"""
+import argparse
+import timeit
+
+from Crypto.PublicKey import RSA
+
+import huawei_lte.crypto as crypto
+
+PASSWORD = 'benchmark'
+SALT = 'a3f1c2e4b5d6978812345678abcdef90a3f1c2e4b5d6978812345678abcdef90'
+
+def bench(func, number):
+    """ Returns microseconds per call, best of 5 """
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+def client_proof(iterations, number):
+    servernonce = crypto.generate_nonce() + crypto.generate_nonce()
+
+    def uncached():
+        crypto.get_client_proof(crypto.generate_nonce(), servernonce, PASSWORD, SALT, iterations)
+
+    def cached():
+        crypto.get_client_proof(crypto.generate_nonce(), servernonce, PASSWORD, SALT, iterations,
+                                cache_key=('192.168.8.1', 'admin'))
+
+    crypto.KEY_CACHE.clear()
+    return bench(uncached, number), bench(cached, number)
+
+def rsa_throughput(key, size, number):
+    """ Returns (uncached, cached) payload KB/s """
+    rsae, rsan = '%x' % key.e, '%x' % key.n
+    payload = '<?xml version="1.0" encoding="UTF-8"?><request>%s</request>' % ('x' * size)
+
+    def uncached():
+        crypto.rsa_cipher.cache_clear()
+        crypto.rsa_encrypt(rsae, rsan, payload)
+
+    def cached():
+        crypto.rsa_encrypt(rsae, rsan, payload)
+
+    kb = len(payload) / 1024.0
+    return kb / (bench(uncached, number) / 1e6), kb / (bench(cached, number) / 1e6)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark huawei_lte.crypto')
+    parser.add_argument('--iterations', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='PBKDF2 iteration counts sent by the router')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='encrypted payload sizes in bytes')
+    parser.add_argument('--number', type=int, default=50, help='calls per timing run')
+    args = parser.parse_args()
+
+    print('%-28s %12s %12s %10s' % ('client proof', 'uncached us', 'cached us', 'speedup'))
+    for iterations in args.iterations:
+        uncached, cached = client_proof(iterations, args.number)
+        print('%-28s %12.1f %12.1f %9.1fx' % ('%i iterations' % iterations, uncached, cached, uncached / cached))
+
+    key = RSA.generate(2048)
+    print()
+    print('%-28s %12s %12s %10s' % ('rsa_encrypt (2048 bit)', 'uncached KB/s', 'cached KB/s', 'speedup'))
+    for size in args.sizes:
+        uncached, cached = rsa_throughput(key, size, args.number)
+        print('%-28s %12.1f %12.1f %9.1fx' % ('%i bytes' % size, uncached, cached, cached / uncached))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,422 @@
+"""
+Local stand-in for a Huawei B525 router, for testing and benchmarking without hardware.
+
+Serves the captured responses in xml/*.xml, implements the webserver/token,
+user/challenge_login and user/authentication_login SCRAM flow used by
+B525Router, rotates the verification token on every POST and can add
+latency and inject errors.
+
+    python fake_router.py --port 8081 --password admin --latency 0.02 --error-rate 0.05
+"""
+import argparse
+import base64
+import os
+import random
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import huawei_lte.crypto as crypto
+
+XML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xml')
+
+TOKEN_HEADER = '__RequestVerificationToken'
+
+# api -> captured response file
+FIXTURES = {
+    'device/information': 'device_info.xml',
+    'device/signal': 'device_signal.xml',
+    'monitoring/status': 'device_status.xml',
+    'monitoring/traffic-statistics': 'device_current_traffic.xml',
+    'monitoring/check-notifications': 'device_notifications.xml',
+    'led/circle-switch': 'device_circleled.xml',
+    'dhcp/settings': 'device_settings.xml',
+}
+
+# inbox served by sms/sms-list, sms/sms-count, sms/set-read and sms/delete-sms
+SMS_FIXTURE = 'device_sms.xml'
+
+# apis without a captured response
+EXTRA = {
+    'net/net-mode': '<?xml version="1.0" encoding="UTF-8"?><response><NetworkMode>03</NetworkMode>'
+                    '<NetworkBand>3FFFFFFF</NetworkBand><LTEBand>800C5</LTEBand></response>',
+}
+
+# api -> FakeRadio method answering it
+RADIO_APIS = {
+    'device/signal': 'signal',
+    'monitoring/status': 'status',
+    'monitoring/traffic-statistics': 'traffic',
+    'net/net-mode': 'net_mode',
+    'device/antenna_set_type': 'antenna_type',
+}
+
+# --radio: cells for trying the band optimizer by hand
+DEMO_BANDS = {'B1': (-100, 13, 2500000), 'B3': (-95, 8, 4000000), 'B7': (-110, 4, 1500000),
+              'B20': (-88, 10, 1800000)}
+DEMO_ANTENNA_GAIN = {1: 3, 2: -2, 3: 1}
+
+SMS_APIS = ['sms/sms-list', 'sms/sms-count', 'sms/set-read', 'sms/delete-sms']
+
+PUBLIC = ['webserver/token', 'user/challenge_login', 'user/authentication_login']
+
+OK = '<?xml version="1.0" encoding="UTF-8"?><response>OK</response>'
+
+_rsa_key = None
+_rsa_lock = threading.Lock()
+
+def rsa_key():
+    """ One RSA key per process, generating it is slow """
+    global _rsa_key
+    with _rsa_lock:
+        if _rsa_key is None:
+            from Crypto.PublicKey import RSA
+            _rsa_key = RSA.generate(2048)
+        return _rsa_key
+
+def error_xml(code):
+    return '<?xml version="1.0" encoding="UTF-8"?><error><code>%s</code><message></message></error>' % code
+
+def new_token():
+    return uuid.uuid4().hex + uuid.uuid4().hex
+
+class FakeRadio:
+    """
+    Link quality that depends on the LTE band lock and antenna, for FakeRouter(radio=...).
+
+    bands:   {'B3': (rsrp dBm, sinr dB, download bytes/s)} cells in range
+    antenna_gain: {antenna type: dB added to rsrp and sinr}
+    reattach: seconds the modem is disconnected after a band or antenna change
+    noise:   standard deviation (dB) added to every signal reading
+
+    The modem camps on the enabled band with the best sinr, with no usable band
+    enabled it stays disconnected.
+    """
+    def __init__(self, bands, antenna_gain=None, reattach=1.0, noise=0.5, lte_mask=None):
+        self.bands = bands
+        self.antenna_gain = antenna_gain or {}
+        self.reattach = reattach
+        self.noise = noise
+        self.lte_mask = lte_mask if lte_mask is not None else sum(2 ** (int(b[1:]) - 1) for b in bands)
+        self.antenna = 0
+        self.changed = 0.0
+        self.downloaded = 0.0
+        self.uploaded = 0.0
+        self._counted = time.monotonic()
+
+    def configure(self, lte_mask=None, antenna=None):
+        if lte_mask is not None:
+            self.lte_mask = lte_mask
+        if antenna is not None:
+            self.antenna = antenna
+        self.changed = time.monotonic()
+
+    def cell(self):
+        """ (band name, rsrp, sinr, rate) of the serving cell, None while disconnected """
+        if time.monotonic() - self.changed < self.reattach:
+            return None
+        enabled = [b for b in self.bands if self.lte_mask & 2 ** (int(b[1:]) - 1)]
+        if not enabled:
+            return None
+        band = max(enabled, key=lambda b: self.bands[b][1])
+        rsrp, sinr, rate = self.bands[band]
+        gain = self.antenna_gain.get(self.antenna, 0)
+        return band, rsrp + gain, sinr + gain, rate * 10 ** (gain / 20.0)
+
+    def _count(self, cell):
+        now = time.monotonic()
+        if cell is not None:
+            self.downloaded += cell[3] * (now - self._counted)
+            self.uploaded += cell[3] / 10 * (now - self._counted)
+        self._counted = now
+
+    def signal(self):
+        cell = self.cell()
+        if cell is None:
+            return '<?xml version="1.0" encoding="UTF-8"?><response><rsrp></rsrp><sinr></sinr><band></band></response>'
+        band, rsrp, sinr, _ = cell
+        return ('<?xml version="1.0" encoding="UTF-8"?><response><rsrq>%.1fdB</rsrq><rsrp>%.0fdBm</rsrp>'
+                '<sinr>%.0fdB</sinr><band>%s</band><dlbandwidth>20MHz</dlbandwidth><ulbandwidth>20MHz</ulbandwidth>'
+                '</response>' % (-3 - max(0, 20 - sinr) / 2, rsrp + random.gauss(0, self.noise),
+                                 sinr + random.gauss(0, self.noise), band[1:]))
+
+    def status(self):
+        return ('<?xml version="1.0" encoding="UTF-8"?><response><ConnectionStatus>%i</ConnectionStatus>'
+                '<SignalIcon>4</SignalIcon><CurrentNetworkType>19</CurrentNetworkType></response>'
+                % (900 if self.cell() is None else 901))
+
+    def traffic(self):
+        cell = self.cell()
+        self._count(cell)
+        rate = cell[3] if cell is not None else 0
+        return ('<?xml version="1.0" encoding="UTF-8"?><response><CurrentDownloadRate>%i</CurrentDownloadRate>'
+                '<CurrentUploadRate>%i</CurrentUploadRate><CurrentDownload>%i</CurrentDownload>'
+                '<CurrentUpload>%i</CurrentUpload></response>' % (rate, rate / 10, self.downloaded, self.uploaded))
+
+    def antenna_type(self):
+        return ('<?xml version="1.0" encoding="UTF-8"?><response><antennasettype>%i</antennasettype></response>'
+                % self.antenna)
+
+    def net_mode(self):
+        return ('<?xml version="1.0" encoding="UTF-8"?><response><NetworkMode>03</NetworkMode>'
+                '<NetworkBand>3FFFFFFF</NetworkBand><LTEBand>%X</LTEBand></response>' % self.lte_mask)
+
+class FakeRouter:
+    """
+    latency:      seconds added to every request (plus up to `jitter` random seconds)
+    error_rate:   fraction of api requests answered with `error_code`
+    errors:       {'api/url': code} apis that always fail
+    session_timeout: seconds after login before apis answer 125002
+    batch_sms:    accept several <Index> entries in one sms/set-read or sms/delete-sms request
+    radio:        FakeRadio answering device/signal, monitoring/status, traffic and net/net-mode
+                  from the band lock and antenna set through net/net-mode and device/antenna_set_type
+    """
+    def __init__(self, password='', username='admin', latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_code=100004, errors=None, session_timeout=None, iterations=100,
+                 batch_sms=True, radio=None):
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.errors = errors or {}
+        self.session_timeout = session_timeout
+        self.iterations = iterations
+        self.batch_sms = batch_sms
+        self.radio = radio
+        self.salt = uuid.uuid4().hex
+        self.token = new_token()
+        self.logged_in = None
+        self.requests = {}
+        self.posted = []
+        self.lock = threading.Lock()
+        self._nonces = {}
+        self.responses = dict(EXTRA)
+        for api, name in FIXTURES.items():
+            with open(os.path.join(XML_DIR, name), encoding='utf-8') as f:
+                self.responses[api] = f.read()
+        # index -> message fields, newest (highest index) first when listed
+        self.sms = {}
+        with open(os.path.join(XML_DIR, SMS_FIXTURE), encoding='utf-8') as f:
+            for msg in ET.fromstring(f.read()).iter('Message'):
+                self.sms[int(msg.findtext('Index'))] = dict((child.tag, child.text or '') for child in msg)
+        self.server = None
+
+    def add_sms(self, phone, content, date=None):
+        """ Deliver a new unread message, returns its index """
+        with self.lock:
+            index = max(self.sms or [39999]) + 1
+            self.sms[index] = {'Smstat': '0', 'Index': str(index), 'Phone': phone, 'Content': content,
+                               'Date': date or time.strftime('%Y-%m-%d %H:%M:%S'), 'Sca': '',
+                               'SaveType': '0', 'Priority': '0', 'SmsType': '1'}
+            return index
+
+    @property
+    def total(self):
+        """ Number of HTTP requests served """
+        with self.lock:
+            return sum(self.requests.values())
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests = {}
+
+    def decrypt(self, data):
+        """ Decrypts a request body sent with B525Router.enc_api """
+        from Crypto.Cipher import PKCS1_v1_5
+        key = rsa_key()
+        size = key.size_in_bytes()
+        cipher = PKCS1_v1_5.new(key)
+        raw = bytes.fromhex(data)
+        b64data = b''.join(cipher.decrypt(raw[i:i + size], None) for i in range(0, len(raw), size))
+        return base64.b64decode(b64data).decode('utf-8')
+
+    def _rotate(self):
+        self.token = new_token()
+        return {TOKEN_HEADER: self.token[32:]}
+
+    def handle(self, method, path, headers, body):
+        """ Returns (status, headers, body) for one request """
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+        delay = self.latency + (random.random() * self.jitter if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        if path == '/':
+            return 200, {'Set-Cookie': 'SessionID=%s; path=/; HttpOnly' % uuid.uuid4().hex}, '<html></html>'
+        if not path.startswith('/api/'):
+            return 404, {}, ''
+        api = path[len('/api/'):]
+
+        with self.lock:
+            if api == 'webserver/token':
+                return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><response><token>%s</token></response>' % self.token
+            if method == 'POST' and headers.get(TOKEN_HEADER) not in (self.token, self.token[32:]):
+                return 200, {}, error_xml(125002)
+            if api in self.errors:
+                return 200, {}, error_xml(self.errors[api])
+            if self.error_rate and random.random() < self.error_rate:
+                return 200, {}, error_xml(self.error_code)
+            if api not in PUBLIC:
+                if self.logged_in is None:
+                    return 200, {}, error_xml(100003)
+                if self.session_timeout is not None and time.monotonic() - self.logged_in > self.session_timeout:
+                    self.logged_in = None
+                    return 200, {}, error_xml(125002)
+
+            out = self._rotate() if method == 'POST' else {}
+            if api == 'user/challenge_login':
+                return 200, out, self._challenge(body)
+            if api == 'user/authentication_login':
+                return self._authenticate(body, out)
+            if api == 'user/logout':
+                self.logged_in = None
+                return 200, out, OK
+            if method == 'POST' and (headers.get('Content-type') or '').endswith(';enc'):
+                body = self.decrypt(body)
+            if api in SMS_APIS:
+                return self._sms(api, body, out)
+            if self.radio is not None and api in RADIO_APIS:
+                return self._radio(method, api, body, out)
+            if method == 'POST':
+                self.posted.append((api, body))
+                return 200, out, OK
+            if api in self.responses:
+                return 200, out, self.responses[api]
+            return 200, out, error_xml(100002)
+
+    def _radio(self, method, api, body, out):
+        if method == 'POST':
+            self.posted.append((api, body))
+            xml = ET.fromstring(body)
+            if api == 'net/net-mode':
+                self.radio.configure(lte_mask=int(xml.findtext('LTEBand') or '0', 16))
+            else:
+                self.radio.configure(antenna=int(xml.findtext('antennasettype') or 0))
+            return 200, out, OK
+        return 200, out, getattr(self.radio, RADIO_APIS[api])()
+
+    def _sms(self, api, body, out):
+        if api == 'sms/sms-count':
+            unread = sum(1 for msg in self.sms.values() if msg['Smstat'] == '0')
+            return 200, out, ('<?xml version="1.0" encoding="UTF-8"?><response><LocalUnread>%i</LocalUnread>'
+                              '<LocalInbox>%i</LocalInbox><LocalOutbox>0</LocalOutbox><LocalDraft>0</LocalDraft>'
+                              '<LocalMax>500</LocalMax></response>' % (unread, len(self.sms)))
+        xml = ET.fromstring(body)
+        if api == 'sms/sms-list':
+            page = int(xml.findtext('PageIndex') or 1)
+            count = min(int(xml.findtext('ReadCount') or 20), 50)
+            if xml.findtext('BoxType') not in (None, '1'):
+                selected = []
+            else:
+                selected = [self.sms[i] for i in sorted(self.sms, reverse=True)][(page - 1) * count:page * count]
+            messages = ''.join('<Message>%s</Message>' % ''.join(
+                '<%s>%s</%s>' % (key, escape(value), key) for key, value in msg.items()) for msg in selected)
+            return 200, out, ('<?xml version="1.0" encoding="UTF-8"?><response><Count>%i</Count>'
+                              '<Messages>%s</Messages></response>' % (len(selected), messages))
+        indices = [int(elm.text) for elm in xml.iter('Index')]
+        if len(indices) > 1 and not self.batch_sms:
+            return 200, out, error_xml(100005)
+        self.posted.append((api, body))
+        for index in indices:
+            if index not in self.sms:
+                continue
+            if api == 'sms/delete-sms':
+                del self.sms[index]
+            else:
+                self.sms[index]['Smstat'] = '1'
+        return 200, out, OK
+
+    def _challenge(self, body):
+        xml = ET.fromstring(body)
+        clientnonce = xml.findtext('firstnonce')
+        servernonce = clientnonce + uuid.uuid4().hex
+        self._nonces[servernonce] = (xml.findtext('username'), clientnonce)
+        return ('<?xml version="1.0" encoding="UTF-8"?><response><salt>%s</salt><iterations>%i</iterations>'
+                '<servernonce>%s</servernonce><modeselected>1</modeselected></response>'
+                % (self.salt, self.iterations, servernonce))
+
+    def _authenticate(self, body, out):
+        xml = ET.fromstring(body)
+        servernonce = xml.findtext('finalnonce')
+        username, clientnonce = self._nonces.pop(servernonce, (None, None))
+        if clientnonce is None or username != self.username:
+            return 200, {}, error_xml(108006)
+        proof = crypto.get_client_proof(clientnonce, servernonce, self.password, self.salt, self.iterations)
+        if xml.findtext('clientproof') != proof.decode('UTF-8'):
+            return 200, {}, error_xml(108006)
+        self.logged_in = time.monotonic()
+        key = rsa_key()
+        return 200, out, ('<?xml version="1.0" encoding="UTF-8"?><response><serversignature></serversignature>'
+                          '<rsapubkeysignature></rsapubkeysignature><rsae>%x</rsae><rsan>%x</rsan></response>'
+                          % (key.e, key.n))
+
+    def start(self, host='127.0.0.1', port=0):
+        """ Serve in a background thread, returns 'host:port' for B525Router """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes, don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                status, headers, text = fake.handle(method, self.path, self.headers, body)
+                data = text.encode('utf-8')
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Type', 'text/xml; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply('GET')
+
+            def do_POST(self):
+                self._reply('POST')
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return '%s:%i' % (host, self.server.server_address[1])
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake Huawei B525 router')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-code', type=int, default=100004)
+    parser.add_argument('--radio', action='store_true', help='signal and throughput follow the band lock and antenna')
+    args = parser.parse_args()
+
+    radio = FakeRadio(DEMO_BANDS, DEMO_ANTENNA_GAIN, reattach=5) if args.radio else None
+    fake = FakeRouter(password=args.password, username=args.username, latency=args.latency,
+                      jitter=args.jitter, error_rate=args.error_rate, error_code=args.error_code, radio=radio)
+    address = fake.start(args.host, args.port)
+    print(f'Fake router listening on http://{address}/ (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,195 @@
+"""
+Fleet monitor: one logged-in AsyncB525Router per device, polled on a staggered
+schedule from a single asyncio loop so hundreds of routers fit on one core.
+
+fleet.json (keepalive: seconds between logins of each router, default 300):
+{
+  "interval": 5,
+  "keepalive": 300,
+  "routers": [
+    {"name": "office", "host": "192.168.8.1", "username": "admin", "password": "xxx"}
+  ]
+}
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import aiohttp
+
+from huawei_lte.aiorouter import AsyncB525Router
+from huawei_lte.errors import RouterError
+from huawei_lte.records import Signal, Traffic, Notifications
+
+logger = logging.getLogger(__name__)
+
+FLEET_APIS = ['device/signal', 'monitoring/traffic-statistics', 'monitoring/check-notifications']
+
+def parse_signal(raw):
+    signal = Signal.from_xml(raw)
+    return {
+        'rsrq': signal.rsrq,
+        'rsrp': signal.rsrp,
+        'sinr': signal.sinr,
+        'band': signal.band,
+        'strength': signal.strength
+    }
+
+def parse_traffic(raw):
+    traffic = Traffic.from_xml(raw)
+    return {
+        'download_rate': traffic.download_rate or 0,
+        'upload_rate': traffic.upload_rate or 0
+    }
+
+def parse_notifications(raw):
+    return Notifications.from_xml(raw).unread_message or 0
+
+def is_offline(err):
+    """ Errors that mean the router can't be reached or the session is gone, others are api errors """
+    if isinstance(err, RouterError):
+        return int(err.code) in RouterError.SESSION | RouterError.AUTH
+    return isinstance(err, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+class RouterState:
+    """ Latest known values for one router """
+    def __init__(self, name, host):
+        self.name = name
+        self.host = host
+        self.online = False
+        self.error = None
+        self.signal = {}
+        self.traffic = {}
+        self.notifications = 0
+        self.updated = None
+        self.polls = 0
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'host': self.host,
+            'online': self.online,
+            'error': self.error,
+            'signal': self.signal,
+            'traffic': self.traffic,
+            'notifications': self.notifications,
+            'updated': self.updated,
+            'polls': self.polls
+        }
+
+class Fleet:
+    """
+    devices: [{'name': ..., 'host': ..., 'username': ..., 'password': ...}]
+    Each router is polled every `interval` seconds, start times are spread evenly
+    over the interval so requests don't burst. At most `concurrency` connections are open.
+    """
+    def __init__(self, devices, interval=5.0, concurrency=50, keepalive=300):
+        self.devices = devices
+        self.interval = interval
+        self.concurrency = concurrency
+        self.keepalive = keepalive
+        self.states = dict((d['name'], RouterState(d['name'], d['host'])) for d in devices)
+        self._loop = None
+        self._thread = None
+        self._stopped = None
+
+    @classmethod
+    def from_config(cls, path):
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return cls(config['routers'],
+                   interval=config.get('interval', 5.0),
+                   concurrency=config.get('concurrency', 50),
+                   keepalive=config.get('keepalive', 300))
+
+    async def _poll(self, device, state, connector, offset):
+        await asyncio.sleep(offset)
+        backoff = 1
+        router = AsyncB525Router(device['host'], connector=connector)
+        logged_in = False
+        try:
+            while not self._stopped.is_set():
+                started = time.monotonic()
+                try:
+                    if not logged_in:
+                        await router.login(device.get('username', ''), device.get('password', ''), self.keepalive)
+                        logged_in = True
+                    raw = await router.read_many(FLEET_APIS)
+                    for api in FLEET_APIS:
+                        if RouterError.hasError(raw[api]):
+                            raise RouterError(raw[api])
+                    state.signal = parse_signal(raw['device/signal'])
+                    state.traffic = parse_traffic(raw['monitoring/traffic-statistics'])
+                    state.notifications = parse_notifications(raw['monitoring/check-notifications'])
+                    state.updated = time.time()
+                    state.polls += 1
+                    state.online = True
+                    state.error = None
+                    backoff = 1
+                    delay = self.interval - (time.monotonic() - started)
+                except Exception as err:
+                    logger.warning('Polling %s failed: %s', device['name'], err)
+                    state.error = str(err)
+                    if is_offline(err):
+                        # unreachable or logged out: log in again, backing off
+                        state.online = False
+                        logged_in = False
+                        delay = min(backoff * self.interval, 60)
+                        backoff *= 2
+                    else:
+                        # the router answered, keep the session and poll on schedule
+                        state.online = logged_in
+                        delay = self.interval - (time.monotonic() - started)
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), max(delay, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await router.close()
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        try:
+            count = len(self.devices)
+            await asyncio.gather(*[
+                self._poll(device, self.states[device['name']], connector, self.interval * i / count)
+                for i, device in enumerate(self.devices)])
+        finally:
+            await connector.close()
+
+    def start(self):
+        """ Run the fleet loop in a background thread """
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self.run(),), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join()
+
+    def router(self, name):
+        state = self.states.get(name)
+        return state.to_dict() if state is not None else None
+
+    def snapshot(self):
+        """ Aggregated JSON-ready view of every router """
+        routers = [state.to_dict() for state in self.states.values()]
+        online = [r for r in routers if r['online']]
+        rsrp = [r['signal']['rsrp'] for r in online if r['signal'].get('rsrp') is not None]
+        return {
+            'summary': {
+                'routers': len(routers),
+                'online': len(online),
+                'download_rate': sum(r['traffic'].get('download_rate', 0) for r in online),
+                'upload_rate': sum(r['traffic'].get('upload_rate', 0) for r in online),
+                'notifications': sum(r['notifications'] for r in online),
+                'avg_rsrp': round(sum(rsrp) / len(rsrp), 1) if rsrp else None
+            },
+            'routers': routers
+        }
@@ -0,0 +1,250 @@
+"""
+Signal and traffic history for the dashboard charts.
+
+Samples are kept in SQLite (WAL mode, so charts read while the collector writes)
+at three resolutions:
+
+    samples_1s  one row per second as sampled
+    samples_1m  per minute rollup (avg/min/max of every column)
+    samples_1h  per hour rollup, built from samples_1m
+
+append() only buffers the values, a background thread writes them in one
+transaction per flush and refreshes the rollup rows of the minutes and hours
+it touched. query() reads from the coarsest table that still has enough
+points for the range and aggregates down to `points` rows inside SQLite, so a
+week of 1 Hz data is charted without loading it into memory.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Numeric sample columns, band is kept as text (last value of a rollup bucket)
+COLUMNS = ['rsrp', 'rsrq', 'sinr', 'dl_rate', 'ul_rate']
+
+# resolution seconds -> table
+TABLES = {1: 'samples_1s', 60: 'samples_1m', 3600: 'samples_1h'}
+
+# resolution seconds -> seconds kept (None: forever)
+RETENTION = {1: 30 * 86400, 60: 400 * 86400, 3600: None}
+
+LOCAL = 'local'
+
+def _schema():
+    statements = [
+        'CREATE TABLE IF NOT EXISTS samples_1s (router TEXT NOT NULL, ts INTEGER NOT NULL, %s, band TEXT,'
+        ' PRIMARY KEY (router, ts)) WITHOUT ROWID' % ', '.join('%s REAL' % col for col in COLUMNS)
+    ]
+    rollup = ', '.join('%s REAL, %s_min REAL, %s_max REAL' % (col, col, col) for col in COLUMNS)
+    for resolution in (60, 3600):
+        statements.append('CREATE TABLE IF NOT EXISTS %s (router TEXT NOT NULL, ts INTEGER NOT NULL, n INTEGER NOT NULL,'
+                          ' %s, band TEXT, PRIMARY KEY (router, ts)) WITHOUT ROWID' % (TABLES[resolution], rollup))
+    return statements
+
+def _merge_sql():
+    """ Upsert of one 1s sample, values missing from a partial sample keep what is already stored """
+    cols = COLUMNS + ['band']
+    return ('INSERT INTO samples_1s (router, ts, %s) VALUES (?, ?, %s) ON CONFLICT (router, ts) DO UPDATE SET %s'
+            % (', '.join(cols), ', '.join('?' * len(cols)),
+               ', '.join('%s = coalesce(excluded.%s, %s)' % (col, col, col) for col in cols)))
+
+def _rollup_sql(resolution, source):
+    """ Rebuilds the rollup rows of one router between two timestamps from the next finer table """
+    target = TABLES[resolution]
+    if source == 1:
+        values = ', '.join('avg(%s), min(%s), max(%s)' % (col, col, col) for col in COLUMNS)
+        count = 'count(*)'
+    else:
+        # weighted by the samples behind each minute
+        values = ', '.join('sum(%s * n) / sum(CASE WHEN %s IS NULL THEN 0 ELSE n END), min(%s_min), max(%s_max)'
+                           % (col, col, col, col) for col in COLUMNS)
+        count = 'sum(n)'
+    return ('INSERT OR REPLACE INTO %s (router, ts, n, %s, band) '
+            'SELECT router, ts / %i * %i AS bucket, %s, %s, '
+            '(SELECT band FROM %s b WHERE b.router = s.router AND b.ts >= s.ts / %i * %i AND b.ts < s.ts / %i * %i + %i'
+            ' AND band IS NOT NULL ORDER BY b.ts DESC LIMIT 1) '
+            'FROM %s s WHERE router = ? AND ts >= ? AND ts < ? GROUP BY router, bucket'
+            % (target, ', '.join('%s, %s_min, %s_max' % (col, col, col) for col in COLUMNS),
+               resolution, resolution, count, values,
+               TABLES[source], resolution, resolution, resolution, resolution, resolution,
+               TABLES[source]))
+
+def _query_sql(resolution, step, columns):
+    table = TABLES[resolution]
+    if resolution == 1:
+        values = ', '.join('avg(%s), min(%s), max(%s)' % (col, col, col) for col in columns)
+    else:
+        values = ', '.join('sum(%s * n) / sum(CASE WHEN %s IS NULL THEN 0 ELSE n END), min(%s_min), max(%s_max)'
+                           % (col, col, col, col) for col in columns)
+    # band is the last one reported in each bucket
+    return ('SELECT q.*, (SELECT band FROM %s b WHERE b.router = ? AND b.ts >= q.bucket AND b.ts < q.bucket + %i'
+            ' AND band IS NOT NULL ORDER BY b.ts DESC LIMIT 1) FROM '
+            '(SELECT ts / %i * %i AS bucket, %s FROM %s WHERE router = ? AND ts >= ? AND ts < ? GROUP BY bucket) q '
+            'ORDER BY q.bucket' % (table, step, step, step, values, table))
+
+class History:
+    """
+    path: SQLite database file, created on first use
+    retention: {resolution seconds: seconds kept} overrides RETENTION
+    flush_interval: seconds between background writes
+    batch_size: buffered samples that trigger a write before the interval
+    """
+    def __init__(self, path, retention=None, flush_interval=1.0, batch_size=500, prune_interval=3600):
+        self.path = path
+        self.retention = dict(RETENTION)
+        if retention is not None:
+            self.retention.update(retention)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.prune_interval = prune_interval
+        self.appended = 0
+        self.written = 0
+        self.batches = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._local = threading.local()
+        self._pruned = 0
+        self._writer = self._connect()
+        with self._writer:
+            for statement in _schema():
+                self._writer.execute(statement)
+
+    def _connect(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _reader(self):
+        """ One read connection per thread, WAL readers don't block the writer """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def append(self, values, ts=None, router=LOCAL):
+        """
+        Buffer one sample {'rsrp': -95.0, 'dl_rate': 1200, 'band': '3', ...}.
+        Partial samples taken in the same second are merged into one row.
+        """
+        second = int(time.time() if ts is None else ts)
+        with self._lock:
+            row = self._pending.setdefault((router, second), {})
+            for key, value in values.items():
+                if value is not None:
+                    row[key] = value
+            self.appended += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+        self.start()
+
+    def flush(self):
+        """ Write the buffered samples and refresh the rollups they fall in, returns the rows written """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        merge = _merge_sql()
+        rows = [(router, ts) + tuple(values.get(col) for col in COLUMNS + ['band'])
+                for (router, ts), values in pending.items()]
+        # first and last second touched per router
+        spans = {}
+        for router, ts in pending:
+            low, high = spans.get(router, (ts, ts))
+            spans[router] = (min(low, ts), max(high, ts))
+        with self._write_lock, self._writer:
+            self._writer.executemany(merge, rows)
+            for router, (low, high) in spans.items():
+                for resolution, source in ((60, 1), (3600, 60)):
+                    start = low // resolution * resolution
+                    end = high // resolution * resolution + resolution
+                    self._writer.execute(_rollup_sql(resolution, source), (router, start, end))
+            self.written += len(rows)
+            self.batches += 1
+        return len(rows)
+
+    def prune(self, now=None):
+        """ Delete rows older than the retention of their table """
+        now = time.time() if now is None else now
+        with self._write_lock, self._writer:
+            for resolution, keep in self.retention.items():
+                if keep is not None:
+                    self._writer.execute('DELETE FROM %s WHERE ts < ?' % TABLES[resolution], (int(now - keep),))
+        self._pruned = now
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.time() - self._pruned >= self.prune_interval:
+                    self.prune()
+            except sqlite3.Error:
+                logger.exception('Writing history to %s failed', self.path)
+
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+
+    def routers(self):
+        return [row[0] for row in self._reader().execute('SELECT DISTINCT router FROM samples_1h')]
+
+    def samples(self, router=LOCAL, after=None, before=None):
+        """ Cursor over the 1 s rows (ts, rsrp, rsrq, sinr, dl_rate, ul_rate, band) with after < ts < before """
+        return self._reader().execute(
+            'SELECT ts, %s, band FROM samples_1s WHERE router = ? AND ts > ? AND ts < ? ORDER BY ts' % ', '.join(COLUMNS),
+            (router, -1 if after is None else int(after), 2 ** 62 if before is None else int(before)))
+
+    def query(self, start=None, end=None, router=LOCAL, points=600, columns=None):
+        """
+        Samples between two unix times (default: the last hour) reduced to at most
+        `points` buckets. Returns {'resolution': seconds per point, 'ts': [...],
+        'band': [...], col: [...], col + '_min': [...], col + '_max': [...]}
+        """
+        end = time.time() if end is None else end
+        start = end - 3600 if start is None else start
+        columns = [col for col in (columns or COLUMNS) if col in COLUMNS]
+        step = max(1, int(math.ceil((end - start) / float(max(points, 1)))))
+        # coarsest table whose rows are still finer than one point
+        resolution = max(r for r in TABLES if r <= step)
+        step = int(math.ceil(step / float(resolution))) * resolution
+
+        result = {'resolution': step, 'ts': [], 'band': []}
+        for col in columns:
+            result[col], result[col + '_min'], result[col + '_max'] = [], [], []
+        rows = self._reader().execute(_query_sql(resolution, step, columns),
+                                      (router, router, int(start) // step * step, int(math.ceil(end))))
+        for row in rows:
+            result['ts'].append(row[0])
+            for i, col in enumerate(columns):
+                result[col].append(row[1 + i * 3])
+                result[col + '_min'].append(row[2 + i * 3])
+                result[col + '_max'].append(row[3 + i * 3])
+            result['band'].append(row[-1])
+        return result
+
+    @property
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {'appended': self.appended, 'written': self.written, 'batches': self.batches, 'pending': pending}
@@ -0,0 +1,507 @@
+""" Asyncio Huawei router client """
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+import aiohttp
+
+import huawei_lte.xmlobjects as xmlobjects
+import huawei_lte.crypto as crypto
+import huawei_lte.records as records
+from huawei_lte.errors import RouterError
+from huawei_lte.cache import AsyncResponseCache
+from huawei_lte.router import (GET_APIS, B525Router, TokenManager,
+    Device, Lan, User, Monitoring, Wan, Security, Network, Ethernet, Voip, Sms)
+
+logger = logging.getLogger(__name__)
+
+class _SyncBridge(object):
+    '''
+    Stands in for the router when the blocking RouterObject logic (read-modify-write settings,
+    custom XML responses) runs in an executor thread, forwarding each api call to the event loop
+    '''
+    def __init__(self, router, loop):
+        self.__router = router
+        self.__loop = loop
+        self.typed = router.typed
+        self.parse = router.parse
+
+    def __call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.__loop).result()
+
+    def api(self, url, data=None, encrypted=False):
+        return self.__call(self.__router.api(url, data, encrypted))
+
+    def enc_api(self, url, data):
+        return self.__call(self.__router.enc_api(url, data))
+
+    def read(self, url):
+        return self.__call(self.__router.read(url))
+
+class AsyncModule(object):
+    '''
+    Async view of a router module (Device, Lan, ...)
+    GET apis are awaited directly: await router.device.signal
+    Everything else keeps the RouterObject behaviour: await router.lan.set_dns({...})
+    '''
+    def __init__(self, router, cls):
+        self.__router = router
+        self.__cls = cls
+        self.__apis = dict((val[1], val[2]) for val in GET_APIS if val[0] == cls.__name__)
+
+    def __getattr__(self, name):
+        attr = getattr(self.__cls, name)
+        if name in self.__apis:
+            api = self.__apis[name]
+            if isinstance(attr, property):
+                return self.__router.fetch(api)
+            return lambda: self.__router.fetch(api)
+        if isinstance(attr, property):
+            return self.__router.run_sync(self.__cls, lambda obj: getattr(obj, name))
+        if callable(attr):
+            async def method(*args, **kwargs):
+                return await self.__router.run_sync(self.__cls, lambda obj: getattr(obj, name)(*args, **kwargs))
+            return method
+        return attr
+
+class AsyncSms(object):
+    '''
+    Async SMS module, the paging and batching of huawei_lte.router.Sms on awaited requests
+        async for message in router.sms.messages():
+            ...
+        await router.sms.set_read([40001, 40002])
+    '''
+    PAGE_SIZE = Sms.PAGE_SIZE
+    BATCH_REJECTED = Sms.BATCH_REJECTED
+
+    def __init__(self, router):
+        self.__router = router
+        #api -> False once the firmware rejected several <Index> entries in one request
+        self.__batching = {}
+
+    @property
+    def count(self):
+        return self.__router.fetch('sms/sms-count')
+
+    async def sms_list(self, page=1, count=20, box=xmlobjects.SmsListRequest.BOX_INBOX, unread_preferred=0):
+        '''One page of a box (1: inbox, 2: outbox), newest first'''
+        return await self.__router.api('sms/sms-list', xmlobjects.SmsListRequest(page, count, box, unread_preferred))
+
+    async def pages(self, box=xmlobjects.SmsListRequest.BOX_INBOX, page_size=PAGE_SIZE):
+        '''
+        Async generator of records.SmsList pages through the whole box, newest first.
+        Stops after the first short page, raises RouterError on an error response
+        '''
+        page = 1
+        while True:
+            result = records.SmsList.from_xml(await self.sms_list(page, page_size, box))
+            yield result
+            if len(result.messages) < page_size:
+                return
+            page += 1
+
+    async def messages(self, box=xmlobjects.SmsListRequest.BOX_INBOX, page_size=PAGE_SIZE):
+        '''Async generator of every records.SmsMessage in a box, fetched a page at a time'''
+        async for page in self.pages(box, page_size):
+            for message in page.messages:
+                yield message
+
+    async def set_read(self, indices):
+        '''Mark messages as read, in one request where the firmware allows'''
+        return await self.__bulk('sms/set-read', indices)
+
+    async def delete(self, indices):
+        '''Delete messages, in one request where the firmware allows'''
+        return await self.__bulk('sms/delete-sms', indices)
+
+    async def __bulk(self, api, indices):
+        try:
+            indices = [int(i) for i in indices]
+        except ValueError as err:
+            return xmlobjects.Error.xml_error(api, escape(str(err)))
+        if not indices:
+            return '<?xml version="1.0" encoding="UTF-8"?><response>OK</response>'
+        if len(indices) > 1 and self.__batching.get(api, True):
+            response = await self.__router.api(api, xmlobjects.SmsIndexList(indices))
+            error = RouterError.parse(response)
+            if error is None or int(error.code) not in self.BATCH_REJECTED:
+                return response
+            logger.debug('%s rejected %i indices in one request - sending them one at a time', api, len(indices))
+            self.__batching[api] = False
+        failed = None
+        for index in indices:
+            response = await self.__router.api(api, xmlobjects.SmsIndexList([index]))
+            if RouterError.hasError(response) and failed is None:
+                failed = response
+        return failed or response
+
+class AsyncB525Router(object):
+    '''
+    B525 implementation on asyncio/aiohttp, many routers can be monitored from one event loop
+    e.g.
+        async with AsyncB525Router('192.168.8.1') as router:
+            await router.login('admin', 'xxx')
+            signal = await router.device.signal
+    '''
+    REQUEST_TOKEN = B525Router.REQUEST_TOKEN
+    RETRY_ATTEMPTS = B525Router.RETRY_ATTEMPTS
+    RETRY_BACKOFF = B525Router.RETRY_BACKOFF
+    POOL_SIZE = B525Router.POOL_SIZE
+    SETUP_RETRIES = B525Router.SETUP_RETRIES
+    SETUP_BACKOFF = B525Router.SETUP_BACKOFF
+    REFRESH_BEFORE = B525Router.REFRESH_BEFORE
+    TIMEOUT = 10
+
+    def __init__(self, host, cache=False, cache_ttls=None, connector=None, typed=False):
+        '''
+        A shared aiohttp connector can be passed in to pool connections across many routers
+        cache=True and typed=True work as in B525Router
+        '''
+        self.router = host
+        self.client = None
+        self.__connector = connector
+        self.username = None
+        self.__password = None
+        self.__rsae = None
+        self.__rsan = None
+        self.__is_logged_in = False
+        self.__timeout = 0
+        self.__last_login = datetime.now()
+        self.__refresh = False
+        self.__refresh_task = None
+        #Login generation and the generation whose session was reported gone, see B525Router
+        self.__generation = 0
+        self.__lost = None
+        self.__lock = asyncio.Lock()
+        self.__tokens = TokenManager()
+        #One api/webserver/token request at a time, the tasks waiting on it reuse its token
+        self.__token_lock = asyncio.Lock()
+        self.cache = AsyncResponseCache(cache_ttls) if cache else None
+        self.typed = typed
+        self.__records = {}
+
+        self.device = AsyncModule(self, Device)
+        self.lan = AsyncModule(self, Lan)
+        self.user = AsyncModule(self, User)
+        self.monitoring = AsyncModule(self, Monitoring)
+        self.wan = AsyncModule(self, Wan)
+        self.security = AsyncModule(self, Security)
+        self.net = AsyncModule(self, Network)
+        self.ethernet = AsyncModule(self, Ethernet)
+        self.voip = AsyncModule(self, Voip)
+        self.sms = AsyncSms(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        self.__cancel_refresh()
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def login(self, username, password, keepalive=300, refresh=True):
+        '''Logs in, with refresh the session is renewed by a background task (see B525Router.login)'''
+        async with self.__lock:
+            self.__last_login = datetime.now() - timedelta(seconds=keepalive)
+            self.username = username
+            self.__password = password
+            self.__timeout = keepalive
+            self.__refresh = refresh
+            return await self.__login()
+
+    async def __setup_session(self):
+        """
+        gets the url from the server ignoring the response, just to get session cookie set up,
+        then waits for the router to hand out a verification token which is returned
+        """
+        url = "http://%s/" % self.router
+        delay = self.SETUP_BACKOFF
+        for attempt in range(1, self.SETUP_RETRIES + 1):
+            try:
+                status, _, _ = await self.__get(url)
+                if status >= 400:
+                    raise ValueError('Router session setup failed with HTTP %i' % status)
+                return await self.__get_server_token()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, RouterError, IndexError) as err:
+                if attempt == self.SETUP_RETRIES:
+                    raise
+                logger.debug('Router not ready (%s), retrying in %.2fs', err, delay)
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def __get_server_token(self):
+        """ retrieves server token """
+        url = "http://%s/api/webserver/token" % self.router
+        _, _, token_response = await self.__get(url)
+        if RouterError.hasError(token_response):
+            raise RouterError(token_response)
+        root = ET.fromstring(token_response)
+        return root.findall('./token')[0].text
+
+    async def __login(self):
+        """ logs in to the router using SCRAM method of authentication """
+        logger.info('LOGIN for user [%s]' % self.username)
+        token = await self.__setup_session()
+        url = "http://%s/api/user/challenge_login" % self.router
+        clientnonce = crypto.generate_nonce()
+        xml = xmlobjects.CustomXml({
+            'username': self.username,
+            'firstnonce': clientnonce,
+            'mode': 1
+            }).buildXML()
+        headers = {'Content-type': 'text/html', self.REQUEST_TOKEN: token[32:]}
+        _, response_headers, response = await self.__post(url, xml, headers)
+        if RouterError.hasError(response):
+            raise RouterError(response)
+        verification_token = response_headers[self.REQUEST_TOKEN]
+        scram_data = ET.fromstring(response)
+        servernonce = scram_data.findall('./servernonce')[0].text
+        salt = scram_data.findall('./salt')[0].text
+        iterations = int(scram_data.findall('./iterations')[0].text)
+        client_proof = crypto.get_client_proof(clientnonce, servernonce, self.__password, salt, iterations,
+            cache_key=(self.router, self.username)).decode('UTF-8')
+        login_request = xmlobjects.CustomXml({
+            'clientproof': client_proof,
+            'finalnonce': servernonce}).buildXML()
+        headers = {'Content-type': 'application/x-www-form-urlencoded; charset=UTF-8',
+                   self.REQUEST_TOKEN: verification_token}
+        url = "http://%s/api/user/authentication_login" % self.router
+        _, response_headers, result = await self.__post(url, login_request, headers)
+        if RouterError.hasError(result):
+            raise RouterError(result)
+        self.__tokens.invalidate()
+        self.__tokens.update(response_headers)
+        self.__last_login = datetime.now()
+        xml = ET.fromstring(result)
+        self.__rsae = xml.find('.//rsae').text
+        self.__rsan = xml.find('.//rsan').text
+        self.__is_logged_in = True
+        self.__generation += 1
+        self.__schedule_refresh()
+
+    def __session_expired(self):
+        return self.__is_logged_in and (datetime.now() - self.__last_login).total_seconds() >= self.__timeout
+
+    def __schedule_refresh(self):
+        """ starts the background task that logs in again before keepalive expires """
+        self.__cancel_refresh()
+        if not self.__refresh or self.__timeout <= 0:
+            return
+        delay = max(self.__timeout - self.REFRESH_BEFORE, self.__timeout / 2.0)
+        self.__refresh_task = asyncio.get_running_loop().create_task(self.__refresh_session(delay))
+
+    def __cancel_refresh(self):
+        if self.__refresh_task is not None:
+            self.__refresh_task.cancel()
+            self.__refresh_task = None
+
+    async def __refresh_session(self, delay):
+        await asyncio.sleep(delay)
+        async with self.__lock:
+            if not self.__is_logged_in:
+                return
+            #Detach first, __login schedules the next refresh and must not cancel this one
+            self.__refresh_task = None
+            try:
+                logger.debug('Refreshing session before keepalive expires...')
+                await self.__login()
+            except Exception as err:
+                logger.warning('Background session refresh failed: %s', err)
+
+    def __session(self):
+        '''The aiohttp session, created on the first request (it needs a running event loop)'''
+        if self.client is None:
+            #Router cookies are set for an IP address host, which aiohttp ignores unless unsafe
+            self.client = aiohttp.ClientSession(
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                connector=self.__connector or aiohttp.TCPConnector(limit=self.POOL_SIZE),
+                connector_owner=self.__connector is None,
+                timeout=aiohttp.ClientTimeout(total=self.TIMEOUT))
+        return self.client
+
+    async def __get(self, url, headers=None):
+        async with self.__session().get(url, headers=headers) as result:
+            text = await result.text()
+            logger.info('GET %s %i' % (url, result.status))
+            logger.debug('%s', text)
+            return result.status, result.headers, text
+
+    async def __post(self, url, data, headers):
+        async with self.__session().post(url, data=data, headers=headers) as result:
+            text = await result.text()
+            logger.info('POST %s %i' % (url, result.status))
+            logger.debug('%s', text)
+            return result.status, result.headers, text
+
+    async def __request(self, url, data, encrypted):
+        token = self.__tokens.cached()
+        if token is None:
+            async with self.__token_lock:
+                token = self.__tokens.cached()
+                if token is None:
+                    token = (await self.__get_server_token())[32:]
+                    self.__tokens.set(token)
+        headers = {self.REQUEST_TOKEN: token}
+        if (encrypted):
+            headers['Content-type'] = 'application/x-www-form-urlencoded; charset=UTF-8;enc'
+        else:
+            headers['Content-type'] = 'application/x-www-form-urlencoded; charset=UTF-8'
+        if data is None or data == '':
+            _, response_headers, response = await self.__get(url, headers)
+        else:
+            _, response_headers, response = await self.__post(url, data, headers)
+        self.__tokens.update(response_headers)
+        return response
+
+    async def api(self, url, data=None, encrypted=False):
+        """ Handles all api calls to the router, errors are returned as XML like B525Router.api """
+        try:
+            return await self.__api(url, data, encrypted)
+        except ValueError as err:
+            return xmlobjects.Error.xml_error('api', escape(str(err)))
+        except Exception as err:
+            logger.exception('message')
+            msg = 'Unexpected error: %s' % type(err)
+            return xmlobjects.Error.xml_error('api', escape(msg))
+
+    async def __api(self, url, data, encrypted, relogin=True):
+        #Check if the session has timed out, and login again if it has
+        if relogin and self.__session_expired():
+            async with self.__lock:
+                if self.__session_expired():
+                    logger.debug('Session timeout - establishing new login...')
+                    await self.__login()
+
+        if isinstance(data, dict):
+            data = xmlobjects.CustomXml(data).buildXML()
+        elif isinstance(data, xmlobjects.XmlObject):
+            data = data.buildXML()
+
+        #Any write can change what other apis return (net-mode, dhcp, ...)
+        write = self.cache is not None and data is not None and data != ''
+
+        url = "http://%s/api/%s" % (self.router, url)
+        delay = self.RETRY_BACKOFF
+        refreshed = False
+        for attempt in range(1, self.RETRY_ATTEMPTS + 1):
+            generation = self.__generation
+            response = await self.__request(url, self.__encrypt(data) if encrypted else data, encrypted)
+            error = RouterError.parse(response)
+            if error is None:
+                if write:
+                    self.cache.invalidate()
+                return response
+            code = int(error.code)
+            if code in RouterError.SESSION:
+                self.__lost = generation
+            #No rights after a rejected token, or with a session found gone or renewed by another task
+            relogged = generation != self.__generation
+            session = code in RouterError.SESSION or (code == RouterError.NO_RIGHTS and
+                                                      (refreshed or relogged or self.__lost == generation))
+            if not relogin or attempt == self.RETRY_ATTEMPTS or not (session or RouterError.isRetryable(code)):
+                break
+            if session and relogged:
+                logger.debug('Session renewed by another request - retrying...')
+                continue
+            if session and not refreshed:
+                logger.debug('Verification token rejected - fetching new token...')
+                self.__tokens.invalidate()
+                refreshed = True
+                continue
+            logger.debug('Router error %s (%s), retrying in %.2fs', code, error.message, delay)
+            await asyncio.sleep(delay)
+            delay *= 2
+            if session:
+                await self.__relogin(generation)
+
+        #Add error message if known and missing
+        return error.buildXmlError()
+
+    async def __relogin(self, generation):
+        '''Logs in again unless the session was already renewed since `generation`'''
+        async with self.__lock:
+            if not self.__is_logged_in or generation != self.__generation:
+                return
+            logger.debug('Session rejected - establishing new login...')
+            await self.__login()
+
+    def __encrypt(self, data):
+        if data is None or data == '':
+            return data
+        return crypto.rsa_encrypt(self.__rsae, self.__rsan, data)
+
+    async def enc_api(self, url, data):
+        return await self.api(url=url, data=data, encrypted=True)
+
+    async def read(self, url):
+        '''GET api call served through the response cache'''
+        if self.cache is None:
+            return await self.api(url)
+        return await self.cache.get(url, self.api)
+
+    async def fetch(self, api):
+        '''GET api as the module properties return it, a record in typed mode'''
+        response = await self.read(api)
+        if self.typed:
+            return self.parse(api, response)
+        return response
+
+    def parse(self, api, response):
+        '''Typed record for a GET api response, see B525Router.parse'''
+        last = self.__records.get(api)
+        if last is not None and last[0] is response:
+            return last[1]
+        record = records.parse(api, response)
+        if record is not response:
+            self.__records[api] = (response, record)
+        return record
+
+    async def read_many(self, endpoints):
+        '''Concurrent GET api reads, returns a dict of endpoint -> XML response (see B525Router.read_many)'''
+        apis = {}
+        for endpoint in endpoints:
+            apis.setdefault(B525Router.resolve_api(endpoint), []).append(endpoint)
+        responses = await asyncio.gather(*[self.read(api) for api in apis])
+        result = {}
+        for (api, names), response in zip(apis.items(), responses):
+            for name in names:
+                result[name] = response
+        return result
+
+    async def run_sync(self, cls, func):
+        '''Run func(module) for a blocking RouterObject module in an executor thread'''
+        loop = asyncio.get_running_loop()
+        module = cls(_SyncBridge(self, loop))
+        return await loop.run_in_executor(None, func, module)
+
+    @property
+    def token_stats(self):
+        return self.__tokens.stats
+
+    @property
+    def cache_stats(self):
+        if self.cache is None:
+            return {}
+        return self.cache.stats
+
+    async def logout(self):
+        '''Logout user'''
+        logger.info('LOGOUT for user [%s]', self.username)
+        self.__cancel_refresh()
+        try:
+            #Without logging in again when the session is already gone
+            response = await self.__api('user/logout', {'Logout': 1}, False, relogin=False)
+        finally:
+            self.__is_logged_in = False
+            self.__tokens.invalidate()
+            if self.cache is not None:
+                self.cache.invalidate()
+        error = RouterError.parse(response)
+        if error is not None and int(error.code) not in RouterError.SESSION | {RouterError.NO_RIGHTS}:
+            raise RouterError(response)
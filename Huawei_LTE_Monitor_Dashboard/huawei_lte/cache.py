@@ -0,0 +1,140 @@
+""" Response cache for the router GET apis """
+import threading
+from time import monotonic
+
+from huawei_lte.errors import RouterError
+
+#Seconds a GET api response is reused for, apis not listed use the cache default_ttl
+DEFAULT_TTLS = {
+    'device/information': 300,
+    'device/signal': 1,
+    'monitoring/status': 1,
+    'monitoring/traffic-statistics': 1,
+    'monitoring/check-notifications': 2,
+    'monitoring/month_statistics': 60,
+    'net/net-mode': 10,
+    'net/net-mode-list': 300,
+    'dhcp/settings': 30,
+    'wlan/host-list': 5,
+    'lan/HostInfo': 5
+}
+
+class _InFlight(object):
+    def __init__(self, event, generation):
+        self.done = event
+        self.generation = generation
+        self.response = None
+        self.error = None
+
+class ResponseCache(object):
+    '''
+    Per api TTL cache with single-flight coalescing:
+    while a request for an api is in progress, other callers for that api wait for its response
+    instead of sending their own. Error responses are never cached.
+    A response fetched before an invalidate() is handed to its waiters but not stored,
+    a failed fetch raises its exception in every waiter.
+    '''
+    def __init__(self, ttls=None, default_ttl=0):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self._entries = {}
+        self._inflight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def ttl(self, api):
+        return self.ttls.get(api, self.default_ttl)
+
+    def _begin(self, api, event_type):
+        '''Returns (response, None) on a hit, otherwise (flight, is_owner)'''
+        with self._lock:
+            entry = self._entries.get(api)
+            if entry is not None and entry[0] > monotonic():
+                self.hits += 1
+                return entry[1], None
+            flight = self._inflight.get(api)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            self.misses += 1
+            flight = self._inflight[api] = _InFlight(event_type(), self._generation)
+            return flight, True
+
+    def _finish(self, api, flight):
+        with self._lock:
+            if self._inflight.get(api) is flight:
+                del self._inflight[api]
+            #An invalidate() since the request went out means the response may predate a write
+            ttl = self.ttl(api)
+            if ttl > 0 and flight.generation == self._generation and flight.response is not None and not RouterError.hasError(flight.response):
+                self._entries[api] = (monotonic() + ttl, flight.response)
+        flight.done.set()
+
+    def get(self, api, fetch):
+        '''Returns the cached response for api, or calls fetch(api) once for all concurrent callers'''
+        flight, owner = self._begin(api, threading.Event)
+        if owner is None:
+            return flight
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+        try:
+            flight.response = fetch(api)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish(api, flight)
+        return flight.response
+
+    def invalidate(self, api=None):
+        '''
+        Drop the cached response for api, or everything when no api is given.
+        Requests already in flight aren't stored when they finish and later callers don't join them
+        '''
+        with self._lock:
+            self._generation += 1
+            if api is None:
+                self._entries.clear()
+                self._inflight.clear()
+            else:
+                self._entries.pop(api, None)
+                self._inflight.pop(api, None)
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries)
+            }
+
+class AsyncResponseCache(ResponseCache):
+    '''ResponseCache for coroutine fetch functions, waiters await the in-flight request'''
+    async def get(self, api, fetch):
+        import asyncio
+        flight, owner = self._begin(api, asyncio.Event)
+        if owner is None:
+            return flight
+        if not owner:
+            await flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+        try:
+            flight.response = await fetch(api)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish(api, flight)
+        return flight.response
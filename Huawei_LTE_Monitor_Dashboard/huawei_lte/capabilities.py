@@ -0,0 +1,62 @@
+""" Capability map of router firmware built by B525Router.features """
+import json
+import os
+import threading
+
+class CapabilityCache(object):
+    '''
+    Error code of every GET api probed (None when it answered) per firmware SoftwareVersion,
+    kept in memory and optionally in a JSON file. Routers running the same firmware support the
+    same apis, so later probes skip the apis recorded as not supported (100002)
+    e.g.
+        B525Router.capabilities = CapabilityCache('capabilities.json')
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self.__versions = {}
+        self.__lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.__versions = json.load(f)
+
+    def __contains__(self, version):
+        return version in self.__versions
+
+    def versions(self):
+        with self.__lock:
+            return list(self.__versions.keys())
+
+    def get(self, version):
+        '''{api: error code or None} recorded for a firmware version'''
+        with self.__lock:
+            return dict(self.__versions.get(version, {}))
+
+    def unsupported(self, version, codes=(100002,)):
+        '''Apis a firmware version answered with one of codes'''
+        with self.__lock:
+            return set(api for api, code in self.__versions.get(version, {}).items() if code in codes)
+
+    def update(self, version, results):
+        '''Merge {api: error code or None} probed on a router running version'''
+        if not version:
+            return
+        with self.__lock:
+            self.__versions.setdefault(version, {}).update(results)
+
+    def clear(self, version=None):
+        with self.__lock:
+            if version is None:
+                self.__versions.clear()
+            else:
+                self.__versions.pop(version, None)
+
+    def save(self):
+        '''Write the cache file (if any), replacing the previous one atomically'''
+        if self.path is None:
+            return
+        with self.__lock:
+            data = json.dumps(self.__versions, indent=2, sort_keys=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
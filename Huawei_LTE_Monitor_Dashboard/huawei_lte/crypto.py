@@ -4,48 +4,102 @@ import hmac
 from binascii import hexlify
 import math
 import base64
-from Crypto.Cipher import PKCS1_v1_5
-from Crypto.PublicKey.RSA import construct
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+class ScramKeyCache(object):
+    """
+    Bounded in-memory cache of the SCRAM client and stored keys.
+    The salt and iteration count are stable per router user, so the PBKDF2 derivation
+    only has to run again when they (or the password) change. Least recently used keys
+    are dropped once maxsize is reached, nothing is written to disk.
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.__keys = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, password, salt, iterations):
+        """ returns (client_key, stored_key) for key = (router, user, salt, iterations) """
+        check = hashlib.sha256(password.encode('utf_8')).digest()
+        with self.__lock:
+            entry = self.__keys.get(key)
+            if entry is not None and hmac.compare_digest(entry[0], check):
+                self.__keys.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        keys = derive_keys(password, salt, iterations)
+        with self.__lock:
+            self.__keys[key] = (check, keys)
+            self.__keys.move_to_end(key)
+            while len(self.__keys) > self.maxsize:
+                self.__keys.popitem(last=False)
+        return keys
+
+    def clear(self):
+        with self.__lock:
+            self.__keys.clear()
+
+    @property
+    def stats(self):
+        with self.__lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.__keys)}
+
+KEY_CACHE = ScramKeyCache()
 
 def generate_nonce():
     """ generate random clientside nonce """
     return uuid.uuid4().hex + uuid.uuid4().hex
 
-def get_client_proof(clientnonce, servernonce, password, salt, iterations):
-    """ calculates server client proof (part of the SCRAM algorithm) """
-    msg = "%s,%s,%s" % (clientnonce, servernonce, servernonce)
+def derive_keys(password, salt, iterations):
+    """ returns the SCRAM (client_key, stored_key) digests, this is the expensive PBKDF2 part """
     salted_pass = hashlib.pbkdf2_hmac(
         'sha256', password.encode('utf_8'), bytearray.fromhex(salt), iterations)
     client_key = hmac.new(b'Client Key', msg=salted_pass,
-                        digestmod=hashlib.sha256)
-    stored_key = hashlib.sha256()
-    stored_key.update(client_key.digest())
+                        digestmod=hashlib.sha256).digest()
+    return client_key, hashlib.sha256(client_key).digest()
+
+def get_client_proof(clientnonce, servernonce, password, salt, iterations, cache_key=None):
+    """
+    calculates server client proof (part of the SCRAM algorithm)
+    cache_key: (router, user) to reuse the derived keys from KEY_CACHE while salt and iterations don't change
+    """
+    msg = "%s,%s,%s" % (clientnonce, servernonce, servernonce)
+    if cache_key is None:
+        client_key, stored_key = derive_keys(password, salt, iterations)
+    else:
+        client_key, stored_key = KEY_CACHE.get(tuple(cache_key) + (salt, iterations), password, salt, iterations)
     signature = hmac.new(msg.encode('utf_8'),
-                        msg=stored_key.digest(), digestmod=hashlib.sha256)
-    client_key_digest = client_key.digest()
-    signature_digest = signature.digest()
-    client_proof = bytearray()
-    i = 0
-    while i < client_key.digest_size:
-        client_proof.append(client_key_digest[i] ^ signature_digest[i])
-        i = i + 1
+                        msg=stored_key, digestmod=hashlib.sha256).digest()
+    client_proof = bytearray(a ^ b for a, b in zip(client_key, signature))
     return hexlify(client_proof)
 
+@lru_cache(maxsize=16)
+def rsa_cipher(rsae, rsan):
+    """ PKCS#1 v1.5 cipher for the router public key (hex exponent and modulus), cached per key """
+    #PyCryptodome is only loaded once a request is encrypted
+    from Crypto.Cipher import PKCS1_v1_5
+    from Crypto.PublicKey.RSA import construct
+    pubkey = construct((int(rsan, 16), int(rsae, 16)))
+    return PKCS1_v1_5.new(pubkey), pubkey.size_in_bytes()
+
 def rsa_encrypt(rsae, rsan, data):
+    """
+    encrypts a request the way the router web UI does: the base64 of the data is split into
+    blocks of key size - 11 bytes, each block is encrypted and the ciphertexts are hex joined
+    """
     if (data is None or data == ''): return ''
-    N = int(rsan,16)
-    E = int(rsae,16)
+    if not isinstance(data, bytes):
+        data = data.encode('utf_8')
+    cipher, size = rsa_cipher(rsae, rsan)
     b64data = base64.b64encode(data)
-    pubkey = construct((N, E))
-    cipher = PKCS1_v1_5.new(pubkey)
-    blocks = int(math.ceil(len(b64data) / 245.0))
-    result = []
+    chunk = size - 11
+    blocks = int(math.ceil(len(b64data) / float(chunk)))
+    result = bytearray(blocks * size)
     for i in range(blocks):
-        block = b64data[i*245:(i+1)*245]
-        d = cipher.encrypt(block)
-        result.append(d)
-    result = hexlify(''.join(result))
-    if ((len(result) & 1) == 0):
-        return result
-    else:
-        return '0'+result
+        result[i*size:(i+1)*size] = cipher.encrypt(b64data[i*chunk:(i+1)*chunk])
+    return hexlify(result).decode('ascii')
@@ -1,5 +1,3 @@
-import huawei_lte.xmlobjects as xmlobjects
-
 class RouterError(Exception):
 
     __ERRORS = [
@@ -46,13 +44,51 @@ class RouterError(Exception):
         #TODO: Add 9003 occurring when setting static ip addresses
     ]
 
+    #code -> message, built once at import
+    __INDEX = dict(__ERRORS)
+
+    #Transient errors, the same request may succeed when sent again
+    RETRYABLE = frozenset([100004, 120001, 125002, 125003])
+    #Session and verification token errors, retried after fetching a new token or logging in again
+    SESSION = frozenset([125002, 125003])
+    #The router doesn't implement the api
+    NOT_SUPPORTED = 100002
+    #Not logged in, or the login has no access to the api
+    NO_RIGHTS = 100003
+    #Credentials or rights, retrying won't help until the login changes
+    AUTH = frozenset([100003, 108001, 108002, 108003, 108004, 108005, 108006, 108007, 108010, 125001])
+
     @classmethod
     def hasError(cls, xml): return '<error>' in xml
 
     @classmethod
     def getErrorMessage(cls, code):
+        return cls.__INDEX.get(int(code), 'An unknown error occurred')
+
+    @classmethod
+    def classify(cls, code):
+        '''Returns 'retryable', 'auth' or 'permanent' for an error code'''
         code = int(code)
-        return next((err[1] for err in cls.__ERRORS if err[0] == code), 'An unknown error occurred')
+        if code in cls.RETRYABLE:
+            return 'retryable'
+        if code in cls.AUTH:
+            return 'auth'
+        return 'permanent'
+
+    @classmethod
+    def isRetryable(cls, code): return int(code) in cls.RETRYABLE
+
+    @classmethod
+    def parse(cls, xml):
+        '''
+        Parses an error response once, returns the xmlobjects.Error (message filled in when
+        the router left it out) or None if the response isn't an error
+        '''
+        if not cls.hasError(xml):
+            return None
+        error = xmlobjects.Error()
+        error.parseXML(xml)
+        return error
 
     def __init__(self, response):
         error = xmlobjects.Error()
@@ -60,3 +96,6 @@ class RouterError(Exception):
         self.code = error.code
         self.message = error.message
         super(RouterError, self).__init__(self.code +": "+self.message)
+
+#Imported last as xmlobjects imports RouterError from this module
+import huawei_lte.xmlobjects as xmlobjects
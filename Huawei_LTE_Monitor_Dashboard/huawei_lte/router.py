@@ -12,7 +12,11 @@ import threading
 import huawei_lte.xmlobjects as xmlobjects
 import huawei_lte.utils as utils
 from huawei_lte.errors import RouterError
+from huawei_lte.cache import ResponseCache
+from huawei_lte.transport import Transport
+from huawei_lte.capabilities import CapabilityCache
 import huawei_lte.crypto as crypto
+import huawei_lte.records as records
 
 logger = logging.getLogger(__name__)
 
@@ -25,17 +29,20 @@ def get_api(cls, api):
     def api_decorator(f):
         GET_APIS.append([cls, f.__name__, api])
         def decorated_function(*args):
+            inst = args[0]
+            router = inst.router if issubclass(type(inst), RouterObject) else inst
             try:
-                inst = args[0]
-                if issubclass(type(inst), RouterObject):
-                    return inst.router.api(api)
-                return inst.api(api)
+                response = router.read(api)
             except ValueError as err:
                 return xmlobjects.Error.xml_error(f.__name__, escape(str(err)))
             except:
                 logger.exception('message')
                 msg = 'Unexpected error: %s' % sys.exc_info()[0]
                 return xmlobjects.Error.xml_error(f.__name__, escape(msg))
+            #Typed mode returns records (raising RouterError on an error response)
+            if getattr(router, 'typed', False):
+                return router.parse(api, response)
+            return response
         return decorated_function
     return api_decorator
 
@@ -53,6 +60,24 @@ def post_api(f):
     return decorated_function
 
 
+class LazyModule(object):
+    '''
+    B525Router attribute creating its RouterObject module on first access,
+    the instance is then stored on the router so later lookups are plain attribute reads
+    '''
+    def __init__(self, cls):
+        self.cls = cls
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, router, owner=None):
+        if router is None:
+            return self
+        #setdefault keeps the first module if two threads create one at the same time
+        return router.__dict__.setdefault(self.name, self.cls(router))
+
 class RouterObject(object):
     '''Parent for all router modules'''
     def __init__(self, router):
@@ -393,11 +418,22 @@ class Device(RouterObject):
     @property
     @post_api
     def signal_strength(self):
-        '''Returns a signal strength from 0 to 5 (where 5 is the best), based on the rsrp value'''
-        response = self.signal
+        '''
+        Returns a signal strength from 0 to 5 (where 5 is the best), based on the rsrp value
+        In typed mode this is the int rating
+        '''
+        signal = self.signal
+        if isinstance(signal, records.Signal):
+            return signal.strength
+        return self.signal_strength_from(signal)
+
+    @classmethod
+    @post_api
+    def signal_strength_from(cls, response):
+        '''Signal strength from an already fetched device/signal response'''
         root = ET.fromstring(response)
         rsrp = int(root.findall('./rsrp')[0].text[:-3])
-        rsrp_q=utils.getRange([-90, -105, -112, -125, -136], rsrp)
+        rsrp_q=utils.getRange(records.RSRP_RANGE, rsrp)
         result = xmlobjects.CustomXml({'SignalStrength': 5-rsrp_q})
         return result.buildXmlResponse()
 
@@ -415,6 +451,12 @@ class Device(RouterObject):
         data = control.buildXML()
         return self.api('device/control', data)
 
+    @post_api
+    def set_antenna_type(self, antenna):
+        '''Antenna used by the modem: 0/AUTO, 1/EXTERNAL, 2/INTERNAL or 3/MIXED'''
+        settings = xmlobjects.AntennaSettings(antenna)
+        return self.api('device/antenna_set_type', settings)
+
 class Network(RouterObject):
     '''Network module'''
     @property
@@ -641,49 +683,231 @@ class Wan(RouterObject):
         settings.ddnss.append(xmlobjects.CustomXml({'index': index}, 'ddns'))
         return self.enc_api('ddns/ddns-list', settings)
 
+class Sms(RouterObject):
+    '''SMS module'''
+    #Largest ReadCount the firmware accepts for sms/sms-list
+    PAGE_SIZE = 50
+    #Errors of firmware that doesn't accept several <Index> entries in one request (format, parameter)
+    BATCH_REJECTED = frozenset([100005, 100006])
+
+    def __init__(self, router):
+        super(Sms, self).__init__(router)
+        #api -> False once the firmware rejected several <Index> entries in one request
+        self.__batching = {}
+
+    @property
+    @get_api(cls='Sms', api='sms/sms-count')
+    def count(self): pass
+
+    @post_api
+    def sms_list(self, page=1, count=20, box=xmlobjects.SmsListRequest.BOX_INBOX, unread_preferred=0):
+        '''One page of a box (1: inbox, 2: outbox), newest first'''
+        return self.api('sms/sms-list', xmlobjects.SmsListRequest(page, count, box, unread_preferred))
+
+    def pages(self, box=xmlobjects.SmsListRequest.BOX_INBOX, page_size=PAGE_SIZE):
+        '''
+        Generator of records.SmsList pages through the whole box, newest first.
+        Stops after the first short page, raises RouterError on an error response
+        '''
+        page = 1
+        while True:
+            result = records.SmsList.from_xml(self.sms_list(page, page_size, box))
+            yield result
+            if len(result.messages) < page_size:
+                return
+            page += 1
+
+    def messages(self, box=xmlobjects.SmsListRequest.BOX_INBOX, page_size=PAGE_SIZE):
+        '''Generator of every records.SmsMessage in a box, fetched a page at a time'''
+        for page in self.pages(box, page_size):
+            for message in page.messages:
+                yield message
+
+    @post_api
+    def set_read(self, indices):
+        '''Mark messages as read, in one request where the firmware allows'''
+        return self.__bulk('sms/set-read', indices)
+
+    @post_api
+    def delete(self, indices):
+        '''Delete messages, in one request where the firmware allows'''
+        return self.__bulk('sms/delete-sms', indices)
+
+    def __bulk(self, api, indices):
+        indices = [int(i) for i in indices]
+        if not indices:
+            return '<?xml version="1.0" encoding="UTF-8"?><response>OK</response>'
+        if len(indices) > 1 and self.__batching.get(api, True):
+            response = self.api(api, xmlobjects.SmsIndexList(indices))
+            error = RouterError.parse(response)
+            #Other errors (busy, already retried by api, or a bad index) leave batching on
+            if error is None or int(error.code) not in self.BATCH_REJECTED:
+                return response
+            logger.debug('%s rejected %i indices in one request - sending them one at a time', api, len(indices))
+            self.__batching[api] = False
+        failed = None
+        for index in indices:
+            response = self.api(api, xmlobjects.SmsIndexList([index]))
+            if RouterError.hasError(response) and failed is None:
+                failed = response
+        return failed or response
+
+class TokenManager(object):
+    '''
+    Caches the CSRF verification token between api calls.
+    The router hands back the next token in the __RequestVerificationToken response header,
+    so api/webserver/token only needs to be fetched when there is no token or it was rejected.
+    '''
+    def __init__(self, fetch=None):
+        self.__fetch = fetch
+        self.__token = None
+        self.__lock = threading.Lock()
+        self.fetches = 0
+        self.reused = 0
+        self.rotations = 0
+
+    def get(self):
+        '''Returns the current token, fetching one from the router only when none is held'''
+        with self.__lock:
+            if self.__token is None:
+                self.__token = self.__fetch()
+                self.fetches += 1
+            else:
+                self.reused += 1
+            return self.__token
+
+    def cached(self):
+        '''Returns the held token (counted as reused), or None when a new one has to be fetched'''
+        with self.__lock:
+            if self.__token is not None:
+                self.reused += 1
+            return self.__token
+
+    def set(self, token):
+        '''Store a token fetched from api/webserver/token'''
+        with self.__lock:
+            self.__token = token
+            self.fetches += 1
+
+    def update(self, headers):
+        '''Rotate to the token sent back in the response headers (if any)'''
+        token = headers.get(B525Router.REQUEST_TOKEN) if headers is not None else None
+        if not token:
+            return
+        #After login the router can return several tokens separated by #
+        token = token.split('#')[0]
+        with self.__lock:
+            if token != self.__token:
+                self.__token = token
+                self.rotations += 1
+
+    def invalidate(self):
+        with self.__lock:
+            self.__token = None
+
+    @property
+    def stats(self):
+        '''Token usage counters, each reuse is a saved round trip to api/webserver/token'''
+        return {
+            'fetches': self.fetches,
+            'reused': self.reused,
+            'rotations': self.rotations,
+            'saved_round_trips': self.reused
+        }
+
 class B525Router(object):
     '''B525 implementation'''
     REQUEST_TOKEN = '__RequestVerificationToken'
-
-    def __init__(self, host):
-        self.client = None
+    #Attempts for an api call answered with a retryable error (RouterError.RETRYABLE),
+    #and the first retry delay in seconds (doubled on each retry)
+    RETRY_ATTEMPTS = 4
+    RETRY_BACKOFF = 0.1
+    #Maximum concurrent requests (and pooled connections) used by read_many
+    POOL_SIZE = 4
+    #Session setup attempts, and the first retry delay in seconds (doubled on each retry)
+    SETUP_RETRIES = 5
+    SETUP_BACKOFF = 0.05
+    #Seconds before keepalive expires that the background refresh logs in again (at most halfway)
+    REFRESH_BEFORE = 30
+
+    #Probe results shared by routers running the same firmware, see features
+    capabilities = CapabilityCache()
+
+    #Modules are created on first use
+    device = LazyModule(Device)
+    lan = LazyModule(Lan)
+    user = LazyModule(User)
+    monitoring = LazyModule(Monitoring)
+    wan = LazyModule(Wan)
+    security = LazyModule(Security)
+    net = LazyModule(Network)
+    ethernet = LazyModule(Ethernet)
+    voip = LazyModule(Voip)
+    sms = LazyModule(Sms)
+
+    def __init__(self, host, cache=False, cache_ttls=None, typed=False, transport=None):
+        '''
+        cache=True caches GET api responses for a few seconds per api (see cache.DEFAULT_TTLS),
+        override them with cache_ttls={'device/signal': 5}. Every successful write clears the cache
+        typed=True returns records (records.Signal, Traffic, ...) from the GET apis that have one
+        transport=Transport(pool_size=8, read_timeout=30) overrides the connection pool and timeouts
+        '''
+        self.transport = transport if transport is not None else Transport(pool_size=self.POOL_SIZE)
         self.router = host
+        self.cache = ResponseCache(cache_ttls) if cache else None
+        self.typed = typed
+        self.__records = {}
 
         self.username = None
         self.__password = None
         self.__rsae = None
         self.__rsan = None
         self.__is_logged_in = False
+        self.__timeout = 0
+        self.__last_login = datetime.now()
+        self.__refresh = False
+        self.__refresh_timer = None
+        #Incremented by each login, tells requests whether another thread logged in meanwhile
+        self.__generation = 0
+        #Generation whose session the router reported as gone
+        self.__lost = None
         self.__lock = threading.Lock()
+        self.__tokens = TokenManager(lambda: self.__get_server_token()[32:])
 
-        self.device = Device(self)
-        self.lan = Lan(self)
-        self.user = User(self)
-        self.monitoring = Monitoring(self)
-        self.wan = Wan(self)
-        self.security = Security(self)
-        self.net = Network(self)
-        self.ethernet = Ethernet(self)
-        self.voip = Voip(self)
-
-    def login(self, username, password, keepalive=300):
+    def login(self, username, password, keepalive=300, refresh=True):
+        '''
+        Logs in, the session is renewed every keepalive seconds.
+        With refresh the renewal runs on a background timer shortly before keepalive expires,
+        otherwise the first api call after it expires logs in again
+        '''
         with self.__lock:
             self.__last_login=datetime.now()-timedelta(seconds=keepalive)
             self.username = username
             self.__password = password
             self.__timeout = keepalive
+            self.__refresh = refresh
             return self.__login()
 
     def __setup_session(self):
-        """ gets the url from the server ignoring the response, just to get session cookie set up """
-        if self.client is None:
-            self.client = requests.Session()
+        """
+        gets the url from the server ignoring the response, just to get session cookie set up,
+        then waits for the router to hand out a verification token which is returned
+        """
         url = "http://%s/" % self.router
-        response = self.__get(url)
-        response.raise_for_status()
-        # will have to debug this one as without delay here it was throwing
-        # a buffering exception on one of the machines
-        sleep(1)
+        #Some routers aren't ready straight after the session cookie is set,
+        #retry with a short backoff rather than always waiting
+        delay = self.SETUP_BACKOFF
+        for attempt in range(1, self.SETUP_RETRIES + 1):
+            try:
+                response = self.__get(url)
+                response.raise_for_status()
+                return self.__get_server_token()
+            except (requests.exceptions.RequestException, RouterError, ET.ParseError, IndexError) as err:
+                if attempt == self.SETUP_RETRIES:
+                    raise
+                logger.debug('Router not ready (%s), retrying in %.2fs', err, delay)
+                sleep(delay)
+                delay *= 2
 
     def __get_server_token(self):
         """ retrieves server token """
@@ -695,8 +919,7 @@ class B525Router(object):
         return root.findall('./token')[0].text
 
     def __api_challenge(self):
-        self.__setup_session()
-        token = self.__get_server_token()
+        token = self.__setup_session()
         url = "http://%s/api/user/challenge_login" % self.router
         self.clientnonce = crypto.generate_nonce()
         xml = xmlobjects.CustomXml({
@@ -719,7 +942,8 @@ class B525Router(object):
         servernonce = scram_data.findall('./servernonce')[0].text
         salt = scram_data.findall('./salt')[0].text
         iterations = int(scram_data.findall('./iterations')[0].text)
-        client_proof = crypto.get_client_proof(self.clientnonce, servernonce, self.__password, salt, iterations).decode('UTF-8')
+        client_proof = crypto.get_client_proof(self.clientnonce, servernonce, self.__password, salt, iterations,
+            cache_key=(self.router, self.username)).decode('UTF-8')
         login_request = xmlobjects.CustomXml({
             'clientproof': client_proof,
             'finalnonce': servernonce}).buildXML()
@@ -729,7 +953,8 @@ class B525Router(object):
         result = self.__post(url=url, data=login_request, headers=headers)
         if RouterError.hasError(result.text):
             raise RouterError(result.text)
-        verification_token = result.headers[self.REQUEST_TOKEN]
+        self.__tokens.invalidate()
+        self.__tokens.update(result.headers)
         self.__last_login = datetime.now()
         '''
         The SCRAM protocol would normally validate the server signatures
@@ -744,6 +969,38 @@ class B525Router(object):
         self.__rsae = xml.find('.//rsae').text
         self.__rsan = xml.find('.//rsan').text
         self.__is_logged_in = True
+        self.__generation += 1
+        self.__schedule_refresh()
+
+    def __session_expired(self):
+        return self.__is_logged_in and (datetime.now() - self.__last_login).total_seconds() >= self.__timeout
+
+    def __schedule_refresh(self):
+        """ starts the background timer that logs in again before keepalive expires """
+        self.__cancel_refresh()
+        if not self.__refresh or self.__timeout <= 0:
+            return
+        delay = max(self.__timeout - self.REFRESH_BEFORE, self.__timeout / 2.0)
+        self.__refresh_timer = threading.Timer(delay, self.__refresh_session)
+        self.__refresh_timer.daemon = True
+        self.__refresh_timer.start()
+
+    def __cancel_refresh(self):
+        if self.__refresh_timer is not None:
+            self.__refresh_timer.cancel()
+            self.__refresh_timer = None
+
+    def __refresh_session(self):
+        with self.__lock:
+            if not self.__is_logged_in:
+                return
+            self.__refresh_timer = None
+            try:
+                logger.debug('Refreshing session before keepalive expires...')
+                self.__login()
+            except Exception as err:
+                #api() falls back to logging in when the session expires
+                logger.warning('Background session refresh failed: %s', err)
 
     def enc_api(self, url, data):
         return self.api(url=url, data=data, encrypted=True)
@@ -756,7 +1013,7 @@ class B525Router(object):
         logger.debug('-- DATA --')
         logger.debug('%s', data)
         logger.debug('-------------')
-        result = self.client.post(url, data=data, headers=headers)
+        result = self.transport.post(url, data=data, headers=headers)
         logger.info('POST %s %i' % (url, result.status_code))
         logger.debug('------------ RESPONSE to %s -------------', url)
         logger.debug('-- HEADERS --')
@@ -772,7 +1029,7 @@ class B525Router(object):
         logger.debug('-- HEADERS --')
         logger.debug('%s', headers)
         logger.debug('-------------')
-        result = self.client.get(url, headers=headers)
+        result = self.transport.get(url, headers=headers)
         logger.info('GET %s %i' % (url, result.status_code))
         logger.debug('------------ RESPONSE to %s -------------', url)
         logger.debug('-- HEADERS --')
@@ -783,83 +1040,226 @@ class B525Router(object):
         logger.debug('-------------')
         return result
         
+    def __request(self, url, data, encrypted):
+        headers = {}
+        headers[self.REQUEST_TOKEN] = self.__tokens.get()
+        if (encrypted):
+            headers['Content-type'] = 'application/x-www-form-urlencoded; charset=UTF-8;enc'
+        else:
+            headers['Content-type'] = 'application/x-www-form-urlencoded; charset=UTF-8'
+        if data is None or data == '':
+            result = self.__get(url, headers)
+        else:
+            result = self.__post(url, data, headers)
+        self.__tokens.update(result.headers)
+        return result.text
+
+    @property
+    def token_stats(self):
+        '''Verification token counters, including round trips saved by reusing the token'''
+        return self.__tokens.stats
+
+    @property
+    def client(self):
+        '''The pooled requests.Session'''
+        return self.transport.session
+
+    @property
+    def transport_stats(self):
+        '''Connection pool counters: requests, connections opened, reused, errors, timeouts'''
+        return self.transport.stats
+
     @post_api
     def api(self, url, data=None, encrypted=False):
         """ Handles all api calls to the router """
+        return self.__api(url, data, encrypted)
+
+    def __api(self, url, data, encrypted, relogin=True):
+        '''relogin=False neither renews an expired session nor retries session errors'''
         #Check if the session has timed out, and login again if it has
-        timed_out = datetime.now() - self.__last_login
-        if (timed_out.total_seconds() >= self.__timeout and self.__is_logged_in):
+        if relogin and self.__session_expired():
             with self.__lock:
-                if (timed_out.total_seconds() >= self.__timeout and self.__is_logged_in):
+                if self.__session_expired():
                     logger.debug('Session timeout - establishing new login...')
                     self.__login()
-        verification_token = self.__get_server_token()[32:]
 
         if isinstance(data, dict):
             data = xmlobjects.CustomXml(data).buildXML()
         elif isinstance(data, xmlobjects.XmlObject):
             data = data.buildXML()
 
+        #Any write can change what other apis return (net-mode, dhcp, ...)
+        write = self.cache is not None and data is not None and data != ''
+
         url = "http://%s/api/%s" % (self.router, url)
-        headers = {}
-        headers[self.REQUEST_TOKEN] = verification_token
-        if (encrypted):
-            headers['Content-type'] = 'application/x-www-form-urlencoded; charset=UTF-8;enc'
-        else:
-            headers['Content-type'] = 'application/x-www-form-urlencoded; charset=UTF-8'
-        if data is None or data == '':
-            response = self.__get(url, headers).text
-        else:
-            if encrypted:
-                data = crypto.rsa_encrypt(self.__rsae, self.__rsan, data)
-            response = self.__post(url, data, headers).text    
+        delay = self.RETRY_BACKOFF
+        refreshed = False
+        for attempt in range(1, self.RETRY_ATTEMPTS + 1):
+            generation = self.__generation
+            response = self.__request(url, self.__encrypt(data) if encrypted else data, encrypted)
+            #Each response is parsed once, the error object is also what's returned
+            error = RouterError.parse(response)
+            if error is None:
+                if write:
+                    self.cache.invalidate()
+                return response
+            code = int(error.code)
+            if code in RouterError.SESSION:
+                self.__lost = generation
+            #No rights after a rejected token means the session is gone as well, the same goes for
+            #requests sent with a session another thread found gone or has logged in again since
+            relogged = generation != self.__generation
+            session = code in RouterError.SESSION or (code == RouterError.NO_RIGHTS and
+                                                      (refreshed or relogged or self.__lost == generation))
+            if not relogin or attempt == self.RETRY_ATTEMPTS or not (session or RouterError.isRetryable(code)):
+                break
+            if session and relogged:
+                logger.debug('Session renewed by another request - retrying...')
+                continue
+            if session and not refreshed:
+                #Cached token was rejected, fetch a fresh one and try straight away
+                logger.debug('Verification token rejected - fetching new token...')
+                self.__tokens.invalidate()
+                refreshed = True
+                continue
+            logger.debug('Router error %s (%s), retrying in %.2fs', code, error.message, delay)
+            sleep(delay)
+            delay *= 2
+            if session:
+                #A fresh token didn't help, the session itself was dropped
+                self.__relogin(generation)
 
         #Add error message if known and missing
-        if RouterError.hasError(response):
-            error = xmlobjects.Error()
-            error.parseXML(response)
-            response = error.buildXmlError()
-        return response
+        return error.buildXmlError()
+
+    def __encrypt(self, data):
+        #Encrypted per attempt, a new login may hand out a different public key
+        if data is None or data == '':
+            return data
+        return crypto.rsa_encrypt(self.__rsae, self.__rsan, data)
 
+    def __relogin(self, generation):
+        '''Logs in again unless the session was already renewed since `generation`'''
+        with self.__lock:
+            if not self.__is_logged_in or generation != self.__generation:
+                return
+            logger.debug('Session rejected - establishing new login...')
+            self.__login()
+
+
+    def read(self, url):
+        '''GET api call served through the response cache'''
+        if self.cache is None:
+            return self.api(url)
+        return self.cache.get(url, self.api)
+
+    def parse(self, api, response):
+        '''
+        Typed record for a GET api response (the XML when the api has no record).
+        Records are reused while the cache returns the same response, treat them as read-only
+        '''
+        last = self.__records.get(api)
+        if last is not None and last[0] is response:
+            return last[1]
+        record = records.parse(api, response)
+        if record is not response:
+            self.__records[api] = (response, record)
+        return record
+
+    @property
+    def cache_stats(self):
+        '''Response cache hits, misses, coalesced (waited on an in-flight request) and entries'''
+        if self.cache is None:
+            return {}
+        return self.cache.stats
+
+    @classmethod
+    def resolve_api(cls, endpoint):
+        '''Map a GET function name (e.g. device.signal) to its api url, urls are returned as is'''
+        for val in GET_APIS:
+            if endpoint == '%s.%s' % (val[0].lower(), val[1]):
+                return val[2]
+        return endpoint
+
+    def read_many(self, endpoints, max_workers=None):
+        '''
+        Read several GET apis concurrently, returns a dict of endpoint -> XML response
+        Endpoints can be api urls or GET function names, duplicates are only requested once
+        e.g. router.read_many(['device/signal', 'monitoring.traffic'])
+        '''
+        apis = {}
+        for endpoint in endpoints:
+            apis.setdefault(self.resolve_api(endpoint), []).append(endpoint)
+        workers = min(max_workers or self.POOL_SIZE, self.POOL_SIZE, len(apis)) or 1
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            responses = dict(zip(apis.keys(), pool.map(self.read, apis.keys())))
+        result = {}
+        for api, names in apis.items():
+            for name in names:
+                result[name] = responses[api]
+        return result
 
     @property
     def features(self):
         ''' Tests the routers available features'''
+        return self.probe_features()
+
+    def probe_features(self, max_workers=None, skip_unsupported=True):
+        '''
+        Tests the routers available features, the GET apis are read concurrently (at most
+        max_workers, default POOL_SIZE). The error codes are recorded in capabilities for the
+        router's SoftwareVersion, with skip_unsupported the apis that firmware answered with
+        100002 are reported without being requested again
+        '''
         result = xmlobjects.TestFunctions()
-        info = self.device.info
+        info = self.read('device/information')
         if (not RouterError.hasError(info)):
             result.parseXML(info)
+        version = result.SoftwareVersion
+
+        #GET functions of the router modules, looked up on the class as most are properties
+        modules = dict((attr.cls.__name__, getattr(self, attr.name))
+                       for attr in vars(type(self)).values() if isinstance(attr, LazyModule))
+        functions = [(modules[cls], f, api) for cls, f, api in GET_APIS
+                     if cls in modules and hasattr(type(modules[cls]), f)]
+
+        skipped = set()
+        if skip_unsupported and version:
+            skipped = self.capabilities.unsupported(version, (RouterError.NOT_SUPPORTED,))
+        unsupported = xmlobjects.Error(RouterError.NOT_SUPPORTED, RouterError.getErrorMessage(RouterError.NOT_SUPPORTED))
+        #Read the apis directly, features reports the XML responses in typed mode too
+        responses = {'device/information': info}
+        responses.update(self.read_many([api for _, _, api in functions
+                                         if api not in skipped and api not in responses], max_workers))
+
+        codes = {}
+        for ob, f, api in functions:
+            if api in skipped:
+                result.addFunction(ob, f, api, None, unsupported)
+                continue
+            error = RouterError.parse(responses[api])
+            codes[api] = None if error is None else int(error.code)
+            result.addFunction(ob, f, api, responses[api], error)
+        self.capabilities.update(version, codes)
 
-        objs = [self]
-
-        for value in vars(self).values():
-            if issubclass(type(value), RouterObject):
-                objs.append(value)
-
-        #Iterate through get_api calls
-        for val in GET_APIS:
-            cls = val[0]
-            f = val[1]
-            api = val[2]
-            func = None
-            #find function
-            for ob in objs:
-                if ob.__class__.__name__ == cls and hasattr(ob,f):
-                    if isinstance(getattr(type(ob), f, None), property):
-                        prop = getattr(type(ob), f, None)
-                        result.addFunction(ob, f, api, prop.__get__(ob, type(ob)))
-                    else:
-                        func = getattr(ob, f)
-                        result.addFunction(ob, f, api, func())
-            
         return result.buildXmlResponse()
 
     @post_api
     def logout(self):
         '''Logout user'''
+        logger.info('LOGOUT for user [%s]', self.username)
         with self.__lock:
-            logger.info('LOGOUT for user [%s]', self.username)
-            response = self.api('user/logout', {'Logout': 1})
-            if RouterError.hasError(response):
-                raise RouterError(response)
-            self.__is_logged_in = False
+            self.__cancel_refresh()
+        try:
+            #Sent without the lock, and without logging in again when the session is already gone
+            response = self.__api('user/logout', {'Logout': 1}, False, relogin=False)
+        finally:
+            with self.__lock:
+                self.__is_logged_in = False
+                self.__tokens.invalidate()
+            if self.cache is not None:
+                self.cache.invalidate()
+        error = RouterError.parse(response)
+        if error is not None and int(error.code) not in RouterError.SESSION | {RouterError.NO_RIGHTS}:
+            raise RouterError(response)
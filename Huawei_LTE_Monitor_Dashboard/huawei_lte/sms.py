@@ -0,0 +1,176 @@
+""" Incremental SMS inbox sync """
+import json
+import os
+import threading
+import logging
+
+from huawei_lte.errors import RouterError
+from huawei_lte.records import leaves
+from huawei_lte.xmlobjects import SmsListRequest
+
+logger = logging.getLogger(__name__)
+
+#Smstat value of an unread message
+UNREAD = 0
+
+class SmsIndex(object):
+    '''
+    Indices of the messages already seen, kept in memory and optionally in a JSON file
+    so a restart doesn't page through the whole box again
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self.__seen = set()
+        self.__lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.__seen = set(json.load(f))
+
+    def __contains__(self, index):
+        return index in self.__seen
+
+    def __len__(self):
+        return len(self.__seen)
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(list(self.__seen))
+
+    def add(self, indices):
+        with self.__lock:
+            self.__seen.update(indices)
+
+    def discard(self, indices):
+        with self.__lock:
+            self.__seen.difference_update(indices)
+
+    def clear(self):
+        with self.__lock:
+            self.__seen.clear()
+
+    def save(self):
+        '''Write the index file (if any), replacing the previous one atomically'''
+        if self.path is None:
+            return
+        with self.__lock:
+            seen = sorted(self.__seen)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(seen, f)
+        os.replace(tmp, self.path)
+
+class SmsSync(object):
+    '''
+    Local copy of one SMS box kept up to date with as few requests as possible.
+    The first sync pages through the whole box, later syncs read newest first and stop
+    at the first page holding a message already in the local copy. When the router's message count
+    no longer matches the local copy (messages deleted elsewhere) the box is read again.
+    e.g.
+        inbox = SmsSync(router, SmsIndex('sms_index.json'))
+        for message in inbox.sync():
+            print(message.phone, message.content)
+        inbox.mark_read()
+        inbox.delete([m.index for m in inbox.messages])
+    '''
+    #sms/sms-count element holding the message count of each box
+    COUNT_ELEMENTS = {SmsListRequest.BOX_INBOX: 'LocalInbox', SmsListRequest.BOX_OUTBOX: 'LocalOutbox'}
+
+    def __init__(self, router, index=None, box=SmsListRequest.BOX_INBOX, page_size=None):
+        self.router = router
+        self.index = index if index is not None else SmsIndex()
+        self.box = box
+        self.page_size = page_size or router.sms.PAGE_SIZE
+        self.__messages = {}
+        self.__synced = False
+        self.__lock = threading.RLock()
+
+    @property
+    def messages(self):
+        '''Messages of the local copy, newest first'''
+        with self.__lock:
+            return sorted(self.__messages.values(), key=lambda msg: (msg.date or '', msg.index), reverse=True)
+
+    @property
+    def unread(self):
+        return [msg for msg in self.messages if msg.status == UNREAD]
+
+    def __router_count(self):
+        response = self.router.sms.count
+        if not isinstance(response, str):
+            return None
+        if RouterError.hasError(response):
+            raise RouterError(response)
+        element = self.COUNT_ELEMENTS.get(self.box)
+        value = leaves(response).get(element) if element else None
+        return int(value) if value is not None else None
+
+    def sync(self):
+        '''
+        Returns the messages not seen before, newest first.
+        The local copy and the seen index are updated before it returns, the lock isn't held
+        while the caller goes through the list
+        '''
+        with self.__lock:
+            new = []
+            try:
+                new.extend(self.__read(full=not self.__synced))
+                if self.__synced:
+                    count = self.__router_count()
+                    if count is not None and count != len(self.__messages):
+                        logger.debug('SMS count is %i, %i held - reading the whole box', count, len(self.__messages))
+                        new.extend(self.__read(full=True))
+            finally:
+                self.index.add([message.index for message in new])
+                self.index.save()
+                self.__synced = True
+        return new
+
+    def __read(self, full):
+        '''Pages newest first, a partial read stops at the first page with a message already held'''
+        if full:
+            self.__messages = {}
+        for page in self.router.sms.pages(self.box, self.page_size):
+            known = False
+            for message in page.messages:
+                if message.index in self.__messages:
+                    known = True
+                    continue
+                self.__messages[message.index] = message
+                if message.index not in self.index:
+                    yield message
+            if known and not full:
+                return
+        if full:
+            #Forget messages deleted since they were seen
+            self.index.discard([index for index in self.index if index not in self.__messages])
+
+    def mark_read(self, indices=None):
+        '''Mark messages (default: every unread message of the local copy) as read'''
+        with self.__lock:
+            if indices is None:
+                indices = [msg.index for msg in self.__messages.values() if msg.status == UNREAD]
+            indices = list(indices)
+            if not indices:
+                return None
+            response = self.router.sms.set_read(indices)
+            if not RouterError.hasError(response):
+                for index in indices:
+                    if index in self.__messages:
+                        self.__messages[index] = self.__messages[index].replace(status=1)
+            return response
+
+    def delete(self, indices=None):
+        '''Delete messages (default: every message of the local copy)'''
+        with self.__lock:
+            if indices is None:
+                indices = list(self.__messages.keys())
+            indices = list(indices)
+            if not indices:
+                return None
+            response = self.router.sms.delete(indices)
+            if not RouterError.hasError(response):
+                for index in indices:
+                    self.__messages.pop(index, None)
+                self.index.discard(indices)
+                self.index.save()
+            return response
@@ -0,0 +1,96 @@
+""" Pooled HTTP transport for B525Router """
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+class Transport(object):
+    '''
+    One requests.Session with a keep-alive connection pool to a router.
+    pool_size connections are kept open; with block=True extra concurrent requests
+    wait for a free connection instead of opening one that is thrown away afterwards.
+    Every request has an explicit (connect, read) timeout.
+    stats counts the requests sent and the TCP connections opened for them
+    '''
+    POOL_SIZE = 4
+    CONNECT_TIMEOUT = 3.05
+    READ_TIMEOUT = 10
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, block=True):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.block = block
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.__session = None
+        self.__adapter = None
+        #Connections opened by sessions that were closed since
+        self.__closed_connections = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self.__lock:
+            if self.__session is None:
+                self.__session = requests.Session()
+                self.__adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=self.block)
+                self.__session.mount('http://', self.__adapter)
+                self.__session.mount('https://', self.__adapter)
+            return self.__session
+
+    def get(self, url, headers=None):
+        return self.__send('get', url, headers=headers)
+
+    def post(self, url, data, headers=None):
+        return self.__send('post', url, data=data, headers=headers)
+
+    def __send(self, method, url, **kwargs):
+        session = self.session
+        with self.__lock:
+            self.requests += 1
+        try:
+            return getattr(session, method)(url, timeout=self.timeout, **kwargs)
+        except requests.exceptions.Timeout:
+            with self.__lock:
+                self.timeouts += 1
+                self.errors += 1
+            raise
+        except requests.exceptions.RequestException:
+            with self.__lock:
+                self.errors += 1
+            raise
+
+    def __connections(self):
+        '''TCP connections opened by the current session's pools'''
+        if self.__adapter is None:
+            return 0
+        pools = self.__adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+
+    def close(self):
+        '''Closes the pooled connections and drops the session cookies'''
+        with self.__lock:
+            if self.__session is not None:
+                self.__closed_connections += self.__connections()
+                self.__session.close()
+            self.__session = None
+            self.__adapter = None
+
+    @property
+    def stats(self):
+        '''Connection reuse counters, reused is the requests that didn't need a new TCP connection'''
+        with self.__lock:
+            connections = self.__closed_connections + self.__connections()
+            return {
+                'requests': self.requests,
+                'connections': connections,
+                'reused': max(self.requests - connections, 0),
+                'reuse_ratio': round(1 - float(connections) / self.requests, 3) if self.requests else None,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'pool_size': self.pool_size
+            }
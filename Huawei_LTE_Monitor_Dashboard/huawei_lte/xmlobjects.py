@@ -1,9 +1,121 @@
 import xml.etree.ElementTree as ET
 import inspect
+from functools import lru_cache
+from operator import itemgetter
 
 import huawei_lte.utils as utils
 from huawei_lte.errors import RouterError
 
+#Values written with str() by the serialisers
+_SCALARS = frozenset([str, int, float, bool, type(None)])
+
+class _Codec(object):
+    '''
+    Serialiser/deserialiser compiled once per class and property list (see XmlObject.codec).
+    Objects holding only scalar values are built with a single string template.
+    '''
+    def __init__(self, names):
+        self.names = names
+        self.template = ''.join(['<%s>%%s</%s>' % (name, name) for name in names])
+        self.tags = [(name, '<%s>' % name, '</%s>' % name) for name in names]
+        if len(names) == 1:
+            getter = itemgetter(names[0])
+            self.values = lambda vals: (getter(vals),)
+        elif names:
+            self.values = itemgetter(*names)
+        else:
+            self.values = lambda vals: ()
+        self.names_set = frozenset(names)
+
+    def build(self, obj):
+        vals = obj._valueMap()
+        values = self.values(vals) if vals is not None else tuple(obj.getValue(name) for name in self.names)
+        if not obj._SKIP_BLANK and _SCALARS.issuperset(map(type, values)):
+            return self.template % values
+        result = []
+        for (name, start, end), value in zip(self.tags, values):
+            if obj._SKIP_BLANK and (value is None or value == ''):
+                continue
+            result.append(start)
+            if type(value) is list:
+                result.append(self.build_list(value, obj._SKIP_CLASS_ELEMENT))
+            elif isinstance(value, XmlObject):
+                element = value.getElementName()
+                result.extend(['<', element, '>', value.buildXML(False), '</', element, '>'])
+            else:
+                result.append(str(value))
+            result.append(end)
+        return ''.join(result)
+
+    @classmethod
+    def build_list(cls, items, skip_class_element):
+        '''
+        Items of one class with the same scalar properties (the usual collection)
+        are formatted together with one repeated template
+        '''
+        if items and isinstance(items[0], XmlObject):
+            first = items[0]
+            item_cls = type(first)
+            if not first._SKIP_BLANK and first._valueMap() is vars(first):
+                get = first.codec().values
+                size = len(vars(first))
+                values = []
+                try:
+                    for item in items:
+                        props = item.__dict__
+                        if type(item) is not item_cls or len(props) != size:
+                            break
+                        values.extend(get(props))
+                    else:
+                        if _SCALARS.issuperset(map(type, values)):
+                            template = first.codec().template
+                            if not skip_class_element:
+                                element = first.getElementName()
+                                template = '<%s>%s</%s>' % (element, template, element)
+                            return (template * len(items)) % tuple(values)
+                except KeyError:
+                    pass
+        result = []
+        for v in items:
+            if isinstance(v, XmlObject):
+                if skip_class_element:
+                    result.append(v.buildXML(False))
+                else:
+                    element = v.getElementName()
+                    result.extend(['<', element, '>', v.buildXML(False), '</', element, '>'])
+            else:
+                result.append(str(v))
+        return ''.join(result)
+
+    def parse(self, obj, xml):
+        seen = set()
+        for elm in xml:
+            prop = elm.tag
+            if prop not in self.names_set or prop in seen:
+                continue
+            seen.add(prop)
+            value = obj.getValue(prop)
+            if isinstance(value, list):
+                for item in elm:
+                    child = obj.child(prop, item)
+                    if child is not None:
+                        value.append(child)
+            elif isinstance(value, XmlObject):
+                value.parseElement(elm)
+            else:
+                val = elm.text
+                if (val is None):
+                    val = ''
+                obj.setValue(prop, val)
+
+#Codecs kept by _codec, CustomXml responses bring arbitrary property lists so the cache is bounded
+CODEC_CACHE_SIZE = 512
+
+@lru_cache(maxsize=CODEC_CACHE_SIZE)
+def _codec(attributes):
+    '''_Codec for the attribute names, those starting with _ are never serialised'''
+    return _Codec(tuple(name for name in attributes if name[:1] != '_'))
+
 class XmlObject(object):
     '''A simple object to handle XML object serialisation'''
 
@@ -26,6 +138,22 @@ class XmlObject(object):
     def getValue(self, prop):
         return getattr(self, prop)
 
+    def setValue(self, prop, value):
+        setattr(self, prop, value)
+
+    def _valueMap(self):
+        '''Mapping holding the property values, None when getValue has to be called per property'''
+        if type(self).getValue is XmlObject.getValue:
+            return vars(self)
+        return None
+
+    def codec(self):
+        '''The compiled serialiser for this class and its current property list'''
+        if type(self).getPropertyNames is XmlObject.getPropertyNames:
+            #Keyed on every attribute name, so properties added after __init__ get their own codec
+            return _codec(tuple(vars(self)))
+        return _codec(tuple(self.getPropertyNames()))
+
     def getElementName(self):
         return self.__class__.__name__
 
@@ -33,63 +161,22 @@ class XmlObject(object):
     def buildXmlResponse(self): return self.buildXML(root='response')
     def buildXmlError(self): return self.buildXML(root='error')
     def buildXML(self, header=True, root='request'):
-        result = []
-        if (header):
-            result.append('<?xml version="1.0" encoding="UTF-8"?>')
-            result.append('<'+root+'>')
-        for prop in self.getPropertyNames():
-            value = self.getValue(prop)
-            skip_blank = self._SKIP_BLANK and (value is None or value == '')
-            if skip_blank or prop[:1] == '_':
-                continue
-            result.extend(['<', prop, '>'])
-            if (type(value) is list):
-                for v in value:
-                    if (issubclass(type(v), XmlObject)):
-                        if not self._SKIP_CLASS_ELEMENT:
-                            result.extend(['<', v.getElementName(), '>'])
-                        result.append(v.buildXML(False))
-                        if not self._SKIP_CLASS_ELEMENT:
-                            result.extend(['</', v.getElementName(), '>'])
-                    else:
-                        result.append(v.buildXML(False))
-            elif (issubclass(type(value), XmlObject)):
-                result.extend(['<', v.getElementName(), '>'])
-                result.append(value.buildXML(False))
-                result.extend(['</', v.getElementName(), '>'])
-            else:
-                result.append(str(value))
-            result.extend(['</', prop, '>'])
+        body = self.codec().build(self)
         if (header):
-            result.append('</'+root+'>')
-        return ''.join(result)
+            return '<?xml version="1.0" encoding="UTF-8"?><%s>%s</%s>' % (root, body, root)
+        return body
 
     def child(self, name, xml):
+        '''Returns the XmlObject for an element (ElementTree Element) of the list property name'''
         return None
 
+    def parseElement(self, xml):
+        self.codec().parse(self, xml)
+
     def parseXML(self, xmlText):
-        xml = ET.fromstring(xmlText.encode('utf-8'))
-        for prop in self.getPropertyNames():
-            value = self.getValue(prop)
-            if isinstance(value, list):
-                parent = xml.find('./'+prop)
-                if (parent is not None):
-                    for elm in parent.getchildren():
-                        xml = ET.tostring(elm, encoding='utf8', method='xml')
-                        child = self.child(prop, xml)
-                        value.append(child)
-            elif (issubclass(type(value), XmlObject)):
-                elm = xml.find('./'+prop)
-                if (elm is not None):
-                    cls = type(value)
-                    setattr(self, prop, cls(xml))
-            else:
-                elm = xml.find('./'+prop)
-                if (elm is not None):
-                    val = elm.text
-                    if (val is None):
-                        val = ''
-                    setattr(self, prop, val)
+        if isinstance(xmlText, str):
+            xmlText = xmlText.encode('utf-8')
+        self.parseElement(ET.fromstring(xmlText))
 
 class Error(XmlObject):
     PYTHON_API_ERROR_CODE=2000
@@ -138,12 +225,14 @@ class TestFunctions(XmlObject):
     def getPropertyNames(self):
         return ['DeviceName','ProductFamily','HardwareVersion','SoftwareVersion','WebUIVersion','MacAddress1','MacAddress2','Failed','Passed']
 
-    def addFunction(self, obj, name, url, response):
+    def addFunction(self, obj, name, url, response, error=None):
+        '''error: the response already parsed by RouterError.parse'''
         func = Function(obj.__class__.__name__, name, url)
-        if (RouterError.hasError(response)):
+        if error is None and RouterError.hasError(response):
             error = Error()
             error.parseXML(response)
-            func.Error = error.code + ": " + error.message
+        if error is not None:
+            func.Error = "%s: %s" % (error.code, error.message)
             self.Failed.append(func)
         else:
             self.Passed.append(func)
@@ -202,8 +291,10 @@ class VirtualServer(XmlObject):
         self.VirtualServerIPAddress = ''
         self.VirtualServerProtocol = ''
 
-        if isinstance(config, basestring):
+        if isinstance(config, str):
             self.parseXML(config)
+        elif isinstance(config, ET.Element):
+            self.parseElement(config)
         else:
             name = self._get_param(config, 'name')
             startWanPort = self._get_param(config, 'startwanport')
@@ -488,8 +579,10 @@ class StaticHost(XmlObject):
         self.HostHw = ''
         self.HostIp = ''
         self.HostEnabled = 1
-        if isinstance(config, basestring):
+        if isinstance(config, str):
             self.parseXML(config)
+        elif isinstance(config, ET.Element):
+            self.parseElement(config)
         else:
             mac = self._get_param(config, self.P_MAC_ADDRESS)
             ip = self._get_param(config, self.P_IP_ADDRESS)
@@ -512,8 +605,40 @@ class CustomXml(XmlObject):
         return self.vals.keys()
     def getValue(self, property):
         return self.vals[property]
+    def setValue(self, property, value):
+        self.vals[property] = value
+    def _valueMap(self):
+        return self.vals
     def getElementName(self): return self.ele_name
 
+class SmsListRequest(XmlObject):
+    '''sms/sms-list request for one page of a box, newest messages first'''
+    BOX_INBOX = 1
+    BOX_OUTBOX = 2
+    def __init__(self, page=1, count=20, box=BOX_INBOX, unread_preferred=0):
+        super(SmsListRequest, self).__init__()
+        self.PageIndex = page
+        self.ReadCount = count
+        self.BoxType = box
+        self.SortType = 0
+        self.Ascending = 0
+        self.UnreadPreferred = unread_preferred
+
+class SmsIndexList(XmlObject):
+    '''
+    Message indices for sms/delete-sms and sms/set-read, one <Index> element each
+    e.g. <request><Index>40001</Index><Index>40002</Index></request>
+    '''
+    def __init__(self, indices):
+        super(SmsIndexList, self).__init__()
+        self.Index = [int(i) for i in indices]
+
+    def buildXML(self, header=True, root='request'):
+        body = ''.join(['<Index>%i</Index>' % i for i in self.Index])
+        if (header):
+            return '<?xml version="1.0" encoding="UTF-8"?><%s>%s</%s>' % (root, body, root)
+        return body
+
 class RouterControl(XmlObject):
     NONE = -1
     REBOOT = 1
@@ -528,6 +653,22 @@ class RouterControl(XmlObject):
     @classmethod
     def poweroff(cls): return RouterControl(cls.POWEROFF)
 
+class AntennaSettings(XmlObject):
+    AUTO = 0
+    EXTERNAL = 1
+    INTERNAL = 2
+    MIXED = 3
+    ANTENNA_TYPES = {'AUTO': AUTO, 'EXTERNAL': EXTERNAL, 'INTERNAL': INTERNAL, 'MIXED': MIXED}
+    def __init__(self, antenna):
+        super(AntennaSettings, self).__init__()
+        if isinstance(antenna, str) and not antenna.isdigit():
+            if antenna.upper() not in self.ANTENNA_TYPES:
+                raise ValueError('Antenna [%s] is not a known type. Expected one of: %s' % (antenna, list(self.ANTENNA_TYPES.keys())))
+            antenna = self.ANTENNA_TYPES[antenna.upper()]
+        if int(antenna) not in self.ANTENNA_TYPES.values():
+            raise ValueError('Antenna type [%s] is not valid, expected 0 - 3' % antenna)
+        self.antennasettype = int(antenna)
+
 class SipOptions(XmlObject):
     P_CALL_WAITING = 'callwaiting'
 
@@ -0,0 +1,78 @@
+"""
+Start-up cost of huawei_lte for short-lived pollers and cron jobs.
+
+Runs `python -X importtime` in fresh interpreters and reports the cumulative
+import time of each huawei_lte entry point (best of --runs), the slowest
+modules it pulls in, whether the optional heavy dependencies (PyCryptodome,
+IPy, asyncio) were loaded, and the time to construct a B525Router.
+
+    python import_benchmark.py --runs 10 --top 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = ['huawei_lte.router', 'huawei_lte.records', 'huawei_lte.xmlobjects']
+
+OPTIONAL = ['Crypto', 'IPy', 'asyncio', 'concurrent.futures']
+
+CONSTRUCT = """
+import sys, time
+start = time.perf_counter()
+from huawei_lte.router import B525Router
+imported = time.perf_counter()
+router = B525Router('127.0.0.1')
+built = time.perf_counter()
+print('%f %f %s' % (imported - start, built - imported,
+      ','.join(name for name in {optional!r} if name in sys.modules) or '-'))
+"""
+
+def importtime(module):
+    """ Returns ({module: (self us, cumulative us)}, cumulative us of `module`) for one fresh interpreter """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                          cwd=HERE, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times, times[module][1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark huawei_lte import time')
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per measurement')
+    parser.add_argument('--top', type=int, default=10, help='slowest modules listed')
+    args = parser.parse_args()
+
+    print('%-28s %14s' % ('import', 'best ms'))
+    best_router = None
+    for target in TARGETS:
+        runs = [importtime(target) for _ in range(args.runs)]
+        times, cumulative = min(runs, key=lambda run: run[1])
+        if target == TARGETS[0]:
+            best_router = times
+        print('%-28s %14.1f' % (target, cumulative / 1000.0))
+
+    print()
+    print('slowest modules under %s (self ms, cumulative ms)' % TARGETS[0])
+    for name, (own, cumulative) in sorted(best_router.items(), key=lambda item: -item[1][0])[:args.top]:
+        print('  %-40s %8.1f %8.1f' % (name, own / 1000.0, cumulative / 1000.0))
+
+    results = []
+    for _ in range(args.runs):
+        proc = subprocess.run([sys.executable, '-c', CONSTRUCT.format(optional=OPTIONAL)],
+                              cwd=HERE, capture_output=True, text=True, check=True)
+        imported, built, loaded = proc.stdout.split()
+        results.append((float(imported), float(built), loaded))
+    imported, built, loaded = min(results)
+    print()
+    print('import huawei_lte.router  %8.1f ms (in process)' % (imported * 1000))
+    print('B525Router(...)           %8.3f ms' % (built * 1000))
+    print('optional modules loaded   %s' % loaded)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Load test for /stream: N simulated dashboard clients on the Flask app's
+server-sent events endpoint. The app's collector samples the fake router
+through router_api at the periods set in app.py, so the router request rate
+should stay flat as the number of clients grows.
+
+    python loadtest_stream.py 1 10 50 100
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from fake_router import DEMO_ANTENNA_GAIN, DEMO_BANDS, FakeRadio, FakeRouter
+
+DURATION = 5
+USERNAME = 'admin'
+PASSWORD = 'loadtest'
+
+def start_app():
+    """ Fake router plus the dashboard app on a local port, returns (fake router, /stream url) """
+    fake = FakeRouter(username=USERNAME, password=PASSWORD, radio=FakeRadio(DEMO_BANDS, DEMO_ANTENNA_GAIN))
+    scratch = tempfile.mkdtemp(prefix='loadtest_stream_')
+    os.environ.update({
+        'ROUTER_IP': fake.start(),
+        'ROUTER_USERNAME': USERNAME,
+        'ROUTER_PASSWORD': PASSWORD,
+        'HISTORY_DB': os.path.join(scratch, 'history.db'),
+        'SMS_INDEX': os.path.join(scratch, 'sms_index.json'),
+        'ANALYTICS_DIR': os.path.join(scratch, 'analytics'),
+        'OPTIMIZER_RESULTS': os.path.join(scratch, 'optimizer.json'),
+        'FLEET_CONFIG': os.path.join(scratch, 'fleet.json'),
+    })
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return fake, 'http://127.0.0.1:%i/stream' % server.server_port
+
+def run(fake, url, clients, duration=DURATION):
+    """ Returns (router requests/s, events per client) while `clients` streams are open """
+    received = [0] * clients
+    responses = []
+    lock = threading.Lock()
+
+    def client(i):
+        try:
+            with requests.get(url, stream=True, timeout=30) as response:
+                with lock:
+                    responses.append(response)
+                for line in response.iter_lines():
+                    if line.startswith(b'data:'):
+                        received[i] += 1
+        except (requests.RequestException, AttributeError, ValueError):
+            # the connection is closed under the reader at the end of the run
+            pass
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for t in threads:
+        t.start()
+    # count from once every client is connected
+    while len(responses) < clients:
+        time.sleep(0.05)
+    fake.reset_counts()
+    start = time.perf_counter()
+    time.sleep(duration)
+    rate = fake.total / (time.perf_counter() - start)
+    with lock:
+        for response in responses:
+            response.close()
+    return rate, sum(received) / float(clients)
+
+if __name__ == '__main__':
+    counts = [int(n) for n in sys.argv[1:]] or [1, 10, 50, 100]
+    fake, url = start_app()
+    print('%8s %18s %18s' % ('clients', 'router req/s', 'events/client'))
+    for n in counts:
+        rate, events = run(fake, url, n)
+        print('%8i %18.2f %18.1f' % (n, rate, events))
+    fake.stop()
@@ -0,0 +1,314 @@
+"""
+LTE band lock and antenna optimizer.
+
+Tries band masks (NetworkMode.lte_to_hex) and antenna types on the router one
+at a time: each candidate is applied, the modem is given time to re-attach,
+then RSRP/SINR and the traffic-statistics byte counters are sampled for a
+window and the candidate is scored. The search is a bounded coordinate
+search:
+
+    1. the configuration as found (baseline)
+    2. single band locks on the baseline antenna, best scoring in earlier runs first
+    3. the two best single bands together, and every band
+    4. the other antenna types with the best band mask so far
+
+at most `budget` candidates per run. The best configuration is applied at the
+end (the baseline is restored when nothing beat it, the run was stopped or
+failed) and every run is appended to a JSON results file, which also orders
+the next run's search.
+
+    optimizer = BandOptimizer(router, 'optimizer.json', budget=8, window=30)
+    optimizer.start()
+    optimizer.status()
+"""
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import time
+
+import huawei_lte.xmlobjects as xmlobjects
+from huawei_lte.errors import RouterError
+from huawei_lte.records import Signal, Status, Traffic
+
+logger = logging.getLogger(__name__)
+
+ANTENNAS = [xmlobjects.AntennaSettings.AUTO, xmlobjects.AntennaSettings.EXTERNAL,
+            xmlobjects.AntennaSettings.INTERNAL, xmlobjects.AntennaSettings.MIXED]
+
+CONNECTED = 901
+
+# Runs kept in the results file
+KEEP_RUNS = 20
+
+def default_score(result):
+    """ Higher is better: SINR plus half the RSRP above -120 dBm, plus 10*log10 of 1 + MBit/s measured """
+    if not result['attached'] or result['rsrp'] is None:
+        return None
+    mbit = result['download_rate'] * 8 / 1e6
+    return (result['sinr'] or 0) + (result['rsrp'] + 120) / 2.0 + 10 * math.log10(1 + mbit)
+
+def mask(bands):
+    return xmlobjects.NetworkMode.lte_to_hex(bands)
+
+class OptimizerStopped(Exception):
+    pass
+
+class BandOptimizer:
+    """
+    router: logged in B525Router
+    results_path: JSON file the runs are appended to
+    bands: LTE bands to try ('B1', 'B3', ...), default: the bands enabled now
+    antennas: antenna types to try, default all four
+    budget: candidates measured per run, the baseline included
+    window: seconds each candidate is sampled for, every `interval` seconds
+    settle: seconds waited after re-attach before sampling
+    attach_timeout: seconds a candidate may take to re-attach before it is scored as failed
+    baseline_antenna: antenna type restored with the baseline, default: read from the router
+    """
+    def __init__(self, router, results_path, bands=None, antennas=None, budget=8, window=30, interval=1.0,
+                 settle=5, attach_timeout=60, baseline_antenna=None, score=default_score):
+        self.router = router
+        self.results_path = results_path
+        self.bands = bands
+        self.antennas = list(antennas) if antennas is not None else list(ANTENNAS)
+        self.budget = budget
+        self.window = window
+        self.interval = interval
+        self.settle = settle
+        self.attach_timeout = attach_timeout
+        self.baseline_antenna = baseline_antenna
+        self.score = score
+        self.run = None
+        self.current = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # Router access
+
+    def _check(self, response):
+        if isinstance(response, str) and RouterError.hasError(response):
+            raise RouterError(response)
+        return response
+
+    def current_bands(self):
+        net = xmlobjects.NetworkMode()
+        net.parseXML(self._check(self.router.read('net/net-mode')))
+        return xmlobjects.NetworkMode.lte_from_hex(net.LTEBand)
+
+    def current_antenna(self):
+        settings = xmlobjects.CustomXml({'antennasettype': None})
+        settings.parseXML(self._check(self.router.read('device/antenna_set_type')))
+        if settings.getValue('antennasettype') in (None, ''):
+            raise ValueError('The router did not report its antenna type')
+        return int(settings.getValue('antennasettype'))
+
+    def apply(self, bands, antenna):
+        logger.info('Optimizer: bands %s, antenna %s', ','.join(bands), antenna)
+        self._check(self.router.net.set_lte_band({'bands': list(bands)}))
+        self._check(self.router.device.set_antenna_type(antenna))
+        if self.router.cache is not None:
+            self.router.cache.invalidate()
+
+    def _wait(self, seconds):
+        if self._stopped.wait(seconds):
+            raise OptimizerStopped()
+
+    def _attached(self, bands):
+        status = Status.from_xml(self.router.read('monitoring/status'))
+        if status.connection_status != CONNECTED:
+            return False
+        signal = Signal.from_xml(self.router.read('device/signal'))
+        return signal.band is None or 'B' + signal.band in bands
+
+    def measure(self, bands, antenna, apply=True):
+        """ Applies one candidate and samples it for the window, returns the scored result """
+        result = {'bands': list(bands), 'mask': mask(bands), 'antenna': antenna, 'attached': False,
+                  'attach_seconds': None, 'rsrp': None, 'sinr': None, 'download_rate': 0, 'upload_rate': 0,
+                  'samples': 0, 'band': None, 'measured': time.time()}
+        self.current = result
+        if apply:
+            self.apply(bands, antenna)
+        started = time.monotonic()
+        while time.monotonic() - started < self.attach_timeout:
+            if self._attached(bands):
+                result['attached'] = True
+                result['attach_seconds'] = round(time.monotonic() - started, 1)
+                break
+            self._wait(self.interval)
+        if result['attached']:
+            self._wait(self.settle)
+            self._sample(result)
+        result['score'] = self.score(result)
+        return result
+
+    def _sample(self, result):
+        rsrp, sinr, bands = [], [], {}
+        first = Traffic.from_xml(self.router.read('monitoring/traffic-statistics'))
+        begin = time.monotonic()
+        rates = []
+        while True:
+            signal = Signal.from_xml(self.router.read('device/signal'))
+            if signal.rsrp is not None:
+                rsrp.append(signal.rsrp)
+            if signal.sinr is not None:
+                sinr.append(signal.sinr)
+            if signal.band:
+                bands[signal.band] = bands.get(signal.band, 0) + 1
+            traffic = Traffic.from_xml(self.router.read('monitoring/traffic-statistics'))
+            rates.append(traffic.download_rate or 0)
+            if time.monotonic() - begin >= self.window:
+                break
+            self._wait(self.interval)
+        elapsed = time.monotonic() - begin
+        result['samples'] = len(rates)
+        result['rsrp'] = statistics.median(rsrp) if rsrp else None
+        result['sinr'] = statistics.median(sinr) if sinr else None
+        result['band'] = max(bands, key=bands.get) if bands else None
+        # byte counters are exact over the window, the instantaneous rates are the fallback
+        if first.download is not None and traffic.download is not None and elapsed > 0 and traffic.download >= first.download:
+            result['download_rate'] = (traffic.download - first.download) / elapsed
+            result['upload_rate'] = ((traffic.upload or 0) - (first.upload or 0)) / elapsed
+        else:
+            result['download_rate'] = sum(rates) / float(len(rates))
+
+    # Search
+
+    def load(self):
+        if not os.path.exists(self.results_path):
+            return {'runs': []}
+        with open(self.results_path, 'r') as f:
+            return json.load(f)
+
+    def save(self):
+        with self._lock:
+            data = self.load()
+            runs = [run for run in data['runs'] if run['started'] != self.run['started']]
+            runs.append(self.run)
+            data['runs'] = runs[-KEEP_RUNS:]
+            tmp = self.results_path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.results_path)
+
+    def prior_scores(self):
+        """ Best earlier score per (mask, antenna) """
+        scores = {}
+        for run in self.load()['runs']:
+            for result in run['results']:
+                key = (result['mask'], result['antenna'])
+                if result.get('score') is not None and result['score'] > scores.get(key, float('-inf')):
+                    scores[key] = result['score']
+        return scores
+
+    def candidates(self, bands, baseline, results):
+        """ Generator of (bands, antenna), looking at the results measured so far """
+        prior = self.prior_scores()
+        seen = set([(mask(baseline['bands']), baseline['antenna'])])
+        # the band sweep keeps the baseline antenna, only the last step tries the others
+        antenna = baseline['antenna']
+
+        def scored():
+            return [r for r in results if r['score'] is not None]
+
+        def fresh(candidate_bands, candidate_antenna):
+            key = (mask(candidate_bands), candidate_antenna)
+            if key in seen:
+                return False
+            seen.add(key)
+            return True
+
+        # single bands, promising ones first, keeping budget for the later steps
+        singles = sorted(bands, key=lambda b: (-prior.get((mask([b]), antenna), float('-inf')),
+                                                b != 'B%s' % baseline['band'], int(b[1:])))
+        for band in singles[:max(2, self.budget // 2)]:
+            if fresh([band], antenna):
+                yield [band], antenna
+
+        best_singles = sorted([r for r in scored() if len(r['bands']) == 1], key=lambda r: -r['score'])
+        if len(best_singles) >= 2:
+            pair = sorted(best_singles[0]['bands'] + best_singles[1]['bands'], key=lambda b: int(b[1:]))
+            if fresh(pair, antenna):
+                yield pair, antenna
+        if len(bands) > 1 and fresh(bands, antenna):
+            yield list(bands), antenna
+
+        if scored():
+            best = max(scored(), key=lambda r: r['score'])
+            for other in self.antennas:
+                if fresh(best['bands'], other):
+                    yield best['bands'], other
+
+    def optimize(self):
+        """ Runs the search in this thread, returns the run record """
+        self._stopped.clear()
+        bands = sorted(self.bands or self.current_bands(), key=lambda b: int(b[1:]))
+        self.run = {'started': time.time(), 'finished': None, 'budget': self.budget, 'window': self.window,
+                    'bands': bands, 'antennas': self.antennas, 'results': [], 'best': None, 'applied': None,
+                    'error': None}
+        baseline = None
+        try:
+            # measured as found and restored unless something beats it, so read what the router uses
+            antenna = self.baseline_antenna if self.baseline_antenna is not None else self.current_antenna()
+            baseline = self.measure(self.current_bands(), antenna, apply=False)
+            baseline['baseline'] = True
+            self.run['results'].append(baseline)
+            self.save()
+            for candidate_bands, antenna in self.candidates(bands, baseline, self.run['results']):
+                if len(self.run['results']) >= self.budget:
+                    break
+                self.run['results'].append(self.measure(candidate_bands, antenna))
+                self.save()
+        except OptimizerStopped:
+            self.run['error'] = 'stopped'
+        except Exception as e:
+            logger.exception('Optimizer run failed')
+            self.run['error'] = str(e)
+
+        self.current = None
+        scored = [r for r in self.run['results'] if r['score'] is not None]
+        best = max(scored, key=lambda r: r['score']) if scored else None
+        if self.run['error'] is not None or best is None:
+            best = baseline
+        self.run['best'] = best
+        if best is not None:
+            try:
+                self.apply(best['bands'], best['antenna'])
+                self.run['applied'] = {'bands': best['bands'], 'antenna': best['antenna']}
+            except Exception as e:
+                logger.exception('Applying the optimizer result failed')
+                self.run['error'] = self.run['error'] or str(e)
+        self.run['finished'] = time.time()
+        self.save()
+        return self.run
+
+    # Background job
+
+    def start(self):
+        """ Starts a run in a background thread, False if one is already running """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self.optimize, daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        run = self.run
+        return {
+            'running': self.running,
+            'current': self.current,
+            'measured': len(run['results']) if run else 0,
+            'budget': self.budget,
+            'run': run
+        }
@@ -0,0 +1,82 @@
+"""
+Parse cost per dashboard poll: the XML string path (ElementTree per function,
+signal strength built as XML and parsed again) versus typed records parsed once.
+
+One poll reads device/signal, signal strength, traffic, notifications and device info
+from the captured responses in xml/.
+
+    python parse_benchmark.py --number 2000
+"""
+import argparse
+import os
+import timeit
+import xml.etree.ElementTree as ET
+
+from huawei_lte.records import Signal, Traffic, Notifications, DeviceInfo
+from huawei_lte.router import B525Router, Device
+
+XML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xml')
+
+def load(name):
+    with open(os.path.join(XML_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+SIGNAL = load('device_signal.xml')
+TRAFFIC = load('device_current_traffic.xml')
+NOTIFICATIONS = load('device_notifications.xml')
+INFO = load('device_info.xml')
+
+def clean_db(value):
+    if value is None:
+        return None
+    return float(value.lower().replace('dbm', '').replace('db', '').strip())
+
+def xml_poll():
+    root = ET.fromstring(SIGNAL)
+    signal = {
+        'rsrq': clean_db(root.findtext('rsrq')),
+        'rsrp': clean_db(root.findtext('rsrp')),
+        'current_band': root.findtext('band'),
+        'dl_bandwidth': root.findtext('dlbandwidth'),
+        'ul_bandwidth': root.findtext('ulbandwidth')
+    }
+    strength = int(ET.fromstring(Device.signal_strength_from(SIGNAL)).findtext('SignalStrength') or 0)
+    root = ET.fromstring(TRAFFIC)
+    rates = (int(root.findtext('CurrentDownloadRate') or 0), int(root.findtext('CurrentUploadRate') or 0))
+    unread = int(ET.fromstring(NOTIFICATIONS).findtext('UnreadMessage') or 0)
+    root = ET.fromstring(INFO)
+    info = dict((child.tag, child.text) for child in root)
+    return signal, strength, rates, unread, info
+
+def typed_poll():
+    signal = Signal.from_xml(SIGNAL)
+    traffic = Traffic.from_xml(TRAFFIC)
+    return (signal.rsrp, signal.strength, traffic.download_rate,
+            Notifications.from_xml(NOTIFICATIONS).unread_message, DeviceInfo.from_xml(INFO))
+
+ROUTER = B525Router('127.0.0.1', typed=True)
+
+def typed_cached_poll():
+    # Response cache hits return the same string, B525Router.parse reuses the record
+    signal = ROUTER.parse('device/signal', SIGNAL)
+    traffic = ROUTER.parse('monitoring/traffic-statistics', TRAFFIC)
+    return (signal.rsrp, signal.strength, traffic.download_rate,
+            ROUTER.parse('monitoring/check-notifications', NOTIFICATIONS).unread_message,
+            ROUTER.parse('device/information', INFO))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark response parsing per dashboard poll')
+    parser.add_argument('--number', type=int, default=2000, help='polls per timing run')
+    args = parser.parse_args()
+
+    baseline = None
+    print('%-30s %12s %10s' % ('path', 'us/poll', 'speedup'))
+    for name, func in [('xml strings (ElementTree)', xml_poll),
+                       ('typed records', typed_poll),
+                       ('typed records, cache hit', typed_cached_poll)]:
+        cost = min(timeit.repeat(func, number=args.number, repeat=5)) / args.number * 1e6
+        baseline = baseline or cost
+        print('%-30s %12.1f %9.1fx' % (name, cost, baseline / cost))
+
+if __name__ == '__main__':
+    main()
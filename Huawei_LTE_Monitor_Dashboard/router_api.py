@@ -1,41 +1,90 @@
+import logging
+import os
+import time
 import xml.etree.ElementTree as ET
+import requests
 from huawei_lte.router import B525Router
+from huawei_lte.errors import RouterError
+from huawei_lte import records
+from huawei_lte.transport import Transport
+from huawei_lte.sms import SmsSync, SmsIndex
+from history import History, LOCAL
+from analytics import Analytics
+from optimizer import BandOptimizer
 import atexit
 
-IP = "192.168.8.1"
-USERNAME = "admin"
-PASSWORD = "samsung945"
+logger = logging.getLogger(__name__)
 
-router = B525Router(IP)
+IP = os.environ.get("ROUTER_IP", "192.168.8.1")
+USERNAME = os.environ.get("ROUTER_USERNAME", "admin")
+PASSWORD = os.environ.get("ROUTER_PASSWORD", "samsung945")
+
+# One logged-in router shared by every page, poll and write action.
+# Typed mode: GET apis return records parsed once (huawei_lte.records)
+transport = Transport(pool_size=int(os.environ.get("ROUTER_POOL_SIZE", 4)),
+                      connect_timeout=float(os.environ.get("ROUTER_CONNECT_TIMEOUT", 3.05)),
+                      read_timeout=float(os.environ.get("ROUTER_READ_TIMEOUT", 10)))
+router = B525Router(IP, cache=True, typed=True, transport=transport)
 router.login(username=USERNAME, password=PASSWORD)
 
+# Inbox kept in sync incrementally, the seen index survives restarts
+SMS_INDEX = os.environ.get("SMS_INDEX", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sms_index.json"))
+inbox = SmsSync(router, SmsIndex(SMS_INDEX))
+
+# Signal and traffic samples for the /system history charts, written in batches by history.py
+HISTORY_DB = os.environ.get("HISTORY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.db"))
+history = History(HISTORY_DB)
+# NumPy aggregates over the history, columns mirrored into memory-mapped files
+ANALYTICS_DIR = os.environ.get("ANALYTICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "analytics"))
+analytics = Analytics(history, ANALYTICS_DIR)
+
+# Band lock / antenna optimizer runs, appended to this file
+OPTIMIZER_RESULTS = os.environ.get("OPTIMIZER_RESULTS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "optimizer.json"))
+optimizer = None
+
 def get_router():
-    router = B525Router(IP)
+    # Writes reuse the logged-in session and pooled connections instead of a login and logout each
     return router
 
+# Typed records raise these where the XML responses used to come back as an error document,
+# the pages then show the same empty values as before instead of failing
+READ_ERRORS = (RouterError, requests.exceptions.RequestException)
+
+def parse(api, response):
+    """ Record of a GET api response, one without values for an error response """
+    try:
+        return router.parse(api, response)
+    except READ_ERRORS as e:
+        logger.warning("Reading %s failed: %s", api, e)
+        return records.RECORDS[api].from_values({})
+
+def read(api):
+    """ Record of a GET api, one without values when the router can't be read """
+    try:
+        response = router.read(api)
+    except READ_ERRORS as e:
+        logger.warning("Reading %s failed: %s", api, e)
+        return records.RECORDS[api].from_values({})
+    return parse(api, response)
+
 def clean_db(value):
     return float(value.lower().replace('dbm', '').replace('db', '').strip())
    
 def router_logout():
     router.logout()
 
-def get_router_signal():
-    import xml.etree.ElementTree as ET
-    raw = router.device.signal
-    root = ET.fromstring(raw)
-
-    def clean_db(value):
-        if value is None:
-            return None
-        return float(value.lower().replace('dbm', '').replace('db', '').strip())
+def get_router_signal(signal=None):
+    if signal is None:
+        signal = read('device/signal')
 
     data = {
-        'rsrq': clean_db(root.findtext('rsrq')),
-        'rsrp': clean_db(root.findtext('rsrp')),
-        'current_band': root.findtext('band'),
-        'dl_bandwidth': root.findtext('dlbandwidth'),
-        'ul_bandwidth': root.findtext('ulbandwidth')
+        'rsrq': signal.rsrq,
+        'rsrp': signal.rsrp,
+        'current_band': signal.band,
+        'dl_bandwidth': signal.dl_bandwidth,
+        'ul_bandwidth': signal.ul_bandwidth
     }
+    history.append({'rsrp': signal.rsrp, 'rsrq': signal.rsrq, 'sinr': signal.sinr, 'band': signal.band})
 
     return data
 
@@ -47,16 +96,12 @@ def format_speed(bps):
         return f"{round(kbps, 1)} KBit/s"
     
 def get_router_speeds():
-    import xml.etree.ElementTree as ET
-    raw = router.monitoring.traffic
-    root = ET.fromstring(raw)
-
-    download = int(root.findtext('CurrentDownloadRate') or 0)
-    upload = int(root.findtext('CurrentUploadRate') or 0)
+    traffic = read('monitoring/traffic-statistics')
+    history.append({'dl_rate': traffic.download_rate, 'ul_rate': traffic.upload_rate})
 
     return {
-        'dl_speed': format_speed(download),
-        'ul_speed': format_speed(upload)
+        'dl_speed': format_speed(traffic.download_rate or 0),
+        'ul_speed': format_speed(traffic.upload_rate or 0)
     }
     
 def get_network_info():
@@ -81,113 +126,137 @@ def to_int(val):
         return None
 
 def get_sms_inbox():
-    xml_data = {
-        'PageIndex': 1,
-        'ReadCount': 20,
-        'BoxType': 1,
-        'SortType': 0,
-        'Ascending': 0,
-        'UnreadPreferred': 0
-    }
-    resp = router.api('sms/sms-list', xml_data)
-    root = ET.fromstring(resp)
+    inbox.sync()
 
     messages = []
-    for msg in root.findall('.//Message'):
-        
-        index = msg.find('Index').text if msg.find('Index') is not None else ''
-        phone = msg.find('Phone').text if msg.find('Phone') is not None else ''
-        content = msg.find('Content').text if msg.find('Content') is not None else ''
-        date = msg.find('Date').text if msg.find('Date') is not None else ''
+    for msg in inbox.messages:
         messages.append({
-            'index': int(index) if index else None,
-            'phone': phone,
-            'content': content,
-            'date': date,
+            'index': msg.index,
+            'phone': msg.phone or '',
+            'content': msg.content or '',
+            'date': msg.date or '',
         })
     return messages
 
 
 def delete_sms(index):
-    payload = {'Index': index}
-    resp = router.api('sms/delete-sms', payload)
-    return resp
+    return inbox.delete([index])
+
+def delete_all_sms():
+    inbox.sync()
+    return inbox.delete()
 
 def get_sim_number():
-    import xml.etree.ElementTree as ET
-    raw = router.device.info
-    root = ET.fromstring(raw)
-    sim_number = root.findtext("Msisdn")
-    return sim_number
+    return read('device/information').msisdn
 
 def seconds_to_hours(seconds):
-    return int(seconds) / 3600
+    return int(seconds or 0) / 3600
 
-def get_device_info():
-    import xml.etree.ElementTree as ET
-    raw = router.device.info
-    root = ET.fromstring(raw)
+def get_device_info(info=None):
+    if info is None:
+        info = read('device/information')
 
     data = {
-        "device_name": root.findtext("DeviceName"),
-        "serial_number": root.findtext("SerialNumber"),
-        "imei": root.findtext("Imei"),
-        "imsi": root.findtext("Imsi"),
-        "iccid": root.findtext("Iccid"),
-        "msisdn": root.findtext("Msisdn"),
-        "hardver_version": root.findtext("HardwareVersion"),
-        "software_version": root.findtext("SoftwareVersion"),
-        "webui_version": root.findtext("WebUIVersion"),
-        "mac_adress": root.findtext("MacAddress1"),
-        "wan_ip_adress": root.findtext("WanIPAddress"),
-        "wan_dns_address": root.findtext("wan_dns_address"),
-        "product_family": root.findtext("ProductFamily"),
-        "classify": root.findtext("Classify"),
-        "supportmode": root.findtext("supportmode"),
-        "workmode": root.findtext("workmode"),
-        "submask": root.findtext("submask"),
-        "mccmnc": root.findtext("Mccmnc"),
-        "iniversion": root.findtext("iniversion"),
-        "uptime": seconds_to_hours(root.findtext("uptime")),
-        "imei_svn": root.findtext("ImeiSvn"),
-        "wifi_mac_addr_wl0": root.findtext("WifiMacAddrWl0"),
-        "wifi_mac_addr_wl1": root.findtext("WifiMacAddrWl1"),
-        "spreadname_en": root.findtext("spreadname_en"),
+        "device_name": info.device_name,
+        "serial_number": info.serial_number,
+        "imei": info.imei,
+        "imsi": info.imsi,
+        "iccid": info.iccid,
+        "msisdn": info.msisdn,
+        "hardver_version": info.hardware_version,
+        "software_version": info.software_version,
+        "webui_version": info.webui_version,
+        "mac_adress": info.mac_address,
+        "wan_ip_adress": info.wan_ip_address,
+        "wan_dns_address": info.wan_dns_address,
+        "product_family": info.product_family,
+        "classify": info.classify,
+        "supportmode": info.supportmode,
+        "workmode": info.workmode,
+        "submask": info.submask,
+        "mccmnc": info.mccmnc,
+        "iniversion": info.iniversion,
+        "uptime": seconds_to_hours(info.uptime),
+        "imei_svn": info.imei_svn,
+        "wifi_mac_addr_wl0": info.wifi_mac_addr_wl0,
+        "wifi_mac_addr_wl1": info.wifi_mac_addr_wl1,
+        "spreadname_en": info.spreadname_en,
     }
     print(data)
     return data
 
-def get_notifications():
-    raw = router.monitoring.notifications
-    root = ET.fromstring(raw)
-    unread_count = int(root.findtext('UnreadMessage') or 0)
-    return unread_count
+def get_notifications(notifications=None):
+    if notifications is None:
+        notifications = read('monitoring/check-notifications')
+    return notifications.unread_message or 0
 
 def clear_notifications():
-    payload = {
-            'PageIndex': 1,
-            'ReadCount': 50,
-            'BoxType': 1,
-            'SortType': 0,
-            'Ascending': 0,
-            'UnreadPreferred': 1
-        }
-    resp = router.api('sms/sms-list', payload)
-    root = ET.fromstring(resp)
-    for msg in root.findall('.//Message'):
-        idx = msg.findtext('Index')
-        if idx:
-            # mark as read
-            router.api('sms/set-read', {'Index': int(idx), 'IsRead': 1})
-            
-def get_signal_strength():
-    raw = router.device.signal_strength
-    root = ET.fromstring(raw)
-    return int(root.findtext('SignalStrength') or 0)
+    # one set-read request for every unread message (per message if the firmware refuses)
+    return inbox.mark_read()
+
+def get_signal_strength(signal=None):
+    if signal is None:
+        signal = read('device/signal')
+    return signal.strength
+
+def get_dashboard():
+    # One concurrent read of everything the dashboard page shows, device/signal is fetched and parsed once
+    raw = router.read_many(['device/signal', 'monitoring/check-notifications', 'device/information'])
+    signal = parse('device/signal', raw['device/signal'])
+    return {
+        'data': get_router_signal(signal),
+        'signal_strength': get_signal_strength(signal),
+        'not_count': get_notifications(parse('monitoring/check-notifications', raw['monitoring/check-notifications'])),
+        'info': get_device_info(parse('device/information', raw['device/information']))
+    }
+
+def get_cache_stats():
+    return {
+        'cache': router.cache_stats,
+        'token': router.token_stats,
+        'transport': router.transport_stats,
+        'history': history.stats
+    }
+
+def get_history(hours=24, points=600, end=None):
+    end = time.time() if end is None else end
+    return history.query(end - hours * 3600, end, points=points)
+
+def has_history(router_name):
+    """ True for the local router and routers with recorded samples """
+    return router_name == LOCAL or router_name in history.routers()
+
+def get_band_stats(hours=24, router_name=LOCAL):
+    return analytics.band_percentiles(router_name, hours)
+
+def get_strength_time(hours=24, router_name=LOCAL):
+    return analytics.strength_time(router_name, hours)
+
+def get_signal_correlation(hours=24, router_name=LOCAL, rate='dl_rate'):
+    return analytics.correlation(router_name, hours, rate=rate)
 
 def set_antenna_type(val:int):
-    request = f"<?xml version='1.0' encoding='UTF-8'?><request><antennasettype>{val}</antennasettype></request>"
-    router.api('device/antenna_set_type', request)
+    router.device.set_antenna_type(val)
+
+def start_optimizer(bands=None, antennas=None, budget=8, window=30):
+    """ Starts a band/antenna optimizer run, False while one is running """
+    global optimizer
+    if optimizer is not None and optimizer.running:
+        return False
+    optimizer = BandOptimizer(router, OPTIMIZER_RESULTS, bands=bands, antennas=antennas, budget=budget, window=window)
+    return optimizer.start()
+
+def stop_optimizer():
+    if optimizer is not None:
+        optimizer.stop()
+
+def get_optimizer_status():
+    if optimizer is not None:
+        return optimizer.status()
+    # last finished run, e.g. from before a restart
+    runs = BandOptimizer(router, OPTIMIZER_RESULTS).load()['runs']
+    return {'running': False, 'current': None, 'measured': 0, 'budget': None, 'run': runs[-1] if runs else None}
 
 
+atexit.register(history.close)
 atexit.register(lambda: router.logout())
@@ -1,31 +1,25 @@
-async function updateNotifications() {
-  try {
-    fetch('/api/notifications')
-    .then(res => res.json())
-    .then(data => {
-      const countEl = document.getElementById('notif-count');
-      if (countEl) countEl.textContent = data.count;
-    });
-  } 
-  catch (e) { 
-    console.error(e); }
+function updateNotifications(count) {
+  const countEl = document.getElementById('notif-count');
+  if (countEl) countEl.textContent = count;
 }
 
-async function updateSignalBars() {
-  try {
-    const res = await fetch('/api/signal-strength');
-    const { strength } = await res.json();
-    const bars = document.querySelectorAll('#signal-bars .bar');
-    bars.forEach((bar, i) => {
-      bar.classList.toggle('active', i < strength);
-    });
-  } catch(e) { console.error(e); }
+function updateSignalBars(strength) {
+  const bars = document.querySelectorAll('#signal-bars .bar');
+  bars.forEach((bar, i) => {
+    bar.classList.toggle('active', i < strength);
+  });
 }
 
-// initial call
-updateNotifications();
-updateSignalBars();
+// Server pushes only the values that changed, pages listen for 'router-update'
+const routerState = {};
+const routerStream = new EventSource('/stream');
 
-// intervals
-setInterval(updateNotifications, 5000);
-setInterval(updateSignalBars, 1000);
+routerStream.onmessage = (e) => {
+  const delta = JSON.parse(e.data);
+  Object.assign(routerState, delta);
+  if ('notifications' in delta) updateNotifications(delta.notifications);
+  if ('strength' in delta) updateSignalBars(delta.strength);
+  document.dispatchEvent(new CustomEvent('router-update', { detail: delta }));
+};
+
+routerStream.onerror = (e) => { console.error(e); };
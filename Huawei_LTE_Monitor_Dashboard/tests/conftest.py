@@ -0,0 +1,31 @@
+"""
+Tests run against fake_router.FakeRouter on a local port, no router needed:
+
+    cd Huawei_LTE_Monitor_Dashboard
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+# The dashboard modules (fake_router, fleet, optimizer) and its huawei_lte copy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_router import FakeRouter  # noqa: E402
+
+PASSWORD = 'test'
+
+@pytest.fixture
+def start_fake():
+    """ start_fake(**options) -> (FakeRouter, 'host:port'), every one started is stopped after the test """
+    started = []
+
+    def start(**options):
+        fake = FakeRouter(password=PASSWORD, **options)
+        started.append(fake)
+        return fake, fake.start()
+
+    yield start
+    for fake in started:
+        fake.stop()
@@ -0,0 +1,67 @@
+""" Fleet polling and the online / offline classification of its errors """
+import asyncio
+import socket
+import time
+
+import aiohttp
+
+from conftest import PASSWORD
+from fake_router import error_xml
+from fleet import Fleet, is_offline
+from huawei_lte.errors import RouterError
+
+def device(name, host):
+    return {'name': name, 'host': host, 'username': 'admin', 'password': PASSWORD}
+
+def free_address():
+    """ A local address nothing listens on """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return '127.0.0.1:%i' % s.getsockname()[1]
+
+def poll(devices, seconds=1.0):
+    fleet = Fleet(devices, interval=0.2)
+    fleet.start()
+    time.sleep(seconds)
+    fleet.stop()
+    return fleet
+
+def test_is_offline():
+    assert is_offline(RouterError(error_xml(125002)))
+    assert is_offline(RouterError(error_xml(108006)))
+    assert is_offline(aiohttp.ClientConnectionError())
+    assert is_offline(asyncio.TimeoutError())
+    assert not is_offline(RouterError(error_xml(100006)))
+    assert not is_offline(ValueError('bad response'))
+
+def test_polls_every_router(start_fake):
+    fakes = [start_fake() for _ in range(3)]
+
+    fleet = poll([device('r%i' % i, host) for i, (_, host) in enumerate(fakes)])
+
+    snapshot = fleet.snapshot()
+    assert snapshot['summary']['routers'] == 3
+    assert snapshot['summary']['online'] == 3
+    for state in snapshot['routers']:
+        assert state['polls'] > 0
+        assert state['error'] is None
+        assert state['signal']['rsrp'] is not None
+    for fake, _ in fakes:
+        assert fake.requests['/api/user/authentication_login'] == 1
+
+def test_api_error_keeps_the_router_online(start_fake):
+    fake, host = start_fake(errors={'device/signal': 100006})
+
+    state = poll([device('office', host)]).router('office')
+
+    assert state['online']
+    assert state['error'] is not None
+    # The session is kept, no login per poll
+    assert fake.requests['/api/user/authentication_login'] == 1
+
+def test_unreachable_router_is_offline():
+    state = poll([device('gone', free_address())], seconds=0.5).router('gone')
+
+    assert not state['online']
+    assert state['error'] is not None
+    assert state['polls'] == 0
@@ -0,0 +1,47 @@
+""" BandOptimizer runs against a FakeRouter whose signal follows the band lock and antenna """
+import time
+
+from conftest import PASSWORD
+from fake_router import FakeRadio, DEMO_BANDS, DEMO_ANTENNA_GAIN
+from huawei_lte.router import B525Router
+from optimizer import BandOptimizer, mask
+
+BASELINE_ANTENNA = 2
+
+def setup(start_fake, tmp_path, **options):
+    radio = FakeRadio(DEMO_BANDS, DEMO_ANTENNA_GAIN, reattach=0.05, noise=0)
+    fake, host = start_fake(radio=radio)
+    router = B525Router(host)
+    router.login('admin', PASSWORD)
+    router.device.set_antenna_type(BASELINE_ANTENNA)
+    optimizer = BandOptimizer(router, str(tmp_path / 'optimizer.json'), interval=0.05, settle=0,
+                              attach_timeout=5, **options)
+    return radio, optimizer
+
+def test_band_sweep_keeps_the_baseline_antenna(start_fake, tmp_path):
+    # Baseline (every band), two single bands and the best two together, the antenna step comes next
+    radio, optimizer = setup(start_fake, tmp_path, antennas=[1, 2, 3], budget=4, window=0.1)
+
+    run = optimizer.optimize()
+
+    assert run['error'] is None
+    assert [len(r['bands']) for r in run['results']] == [4, 1, 1, 2]
+    assert all(r['antenna'] == BASELINE_ANTENNA for r in run['results'])
+    assert (radio.lte_mask, radio.antenna) == (int(mask(run['applied']['bands']), 16), run['applied']['antenna'])
+
+def test_stop_restores_the_baseline(start_fake, tmp_path):
+    radio, optimizer = setup(start_fake, tmp_path, budget=8, window=0.3)
+    baseline_mask = radio.lte_mask
+
+    optimizer.start()
+    deadline = time.monotonic() + 10
+    while radio.lte_mask == baseline_mask and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert radio.lte_mask != baseline_mask
+    optimizer.stop()
+    optimizer._thread.join(10)
+
+    run = optimizer.run
+    assert run['error'] == 'stopped'
+    assert run['applied'] == {'bands': run['results'][0]['bands'], 'antenna': BASELINE_ANTENNA}
+    assert (radio.lte_mask, radio.antenna) == (baseline_mask, BASELINE_ANTENNA)
@@ -0,0 +1,75 @@
+""" Session and verification token handling of B525Router / AsyncB525Router """
+import asyncio
+import threading
+import time
+
+from conftest import PASSWORD
+from fake_router import new_token
+from huawei_lte.aiorouter import AsyncB525Router
+from huawei_lte.errors import RouterError
+from huawei_lte.router import B525Router
+
+APIS = ['device/signal', 'monitoring/status', 'monitoring/traffic-statistics', 'device/information']
+
+def read_concurrently(router, apis):
+    responses = {}
+    threads = [threading.Thread(target=lambda api=api: responses.__setitem__(api, router.api(api))) for api in apis]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+def test_dropped_session_logs_in_once(start_fake):
+    fake, host = start_fake(session_timeout=0.3)
+    router = B525Router(host)
+    router.login('admin', PASSWORD, refresh=False)
+    time.sleep(0.4)
+    fake.reset_counts()
+
+    responses = read_concurrently(router, APIS * 2)
+
+    assert not any(RouterError.hasError(response) for response in responses.values())
+    assert fake.requests['/api/user/authentication_login'] == 1
+
+def test_keepalive_expiry_logs_in_once(start_fake):
+    fake, host = start_fake()
+    router = B525Router(host)
+    router.login('admin', PASSWORD, keepalive=0.3, refresh=False)
+    time.sleep(0.4)
+    fake.reset_counts()
+
+    responses = read_concurrently(router, APIS)
+
+    assert not any(RouterError.hasError(response) for response in responses.values())
+    assert fake.requests['/api/user/authentication_login'] == 1
+
+def test_rejected_token_is_fetched_again(start_fake):
+    fake, host = start_fake()
+    router = B525Router(host)
+    router.login('admin', PASSWORD)
+    # The router moved on to another token, the cached one gets 125002
+    fake.token = new_token()
+    fake.reset_counts()
+
+    response = router.api('led/circle-switch', {'ledSwitch': 0})
+
+    assert not RouterError.hasError(response)
+    assert fake.requests['/api/webserver/token'] == 1
+    assert fake.requests['/api/led/circle-switch'] == 2
+    assert '/api/user/authentication_login' not in fake.requests
+
+def test_async_dropped_session_logs_in_once(start_fake):
+    fake, host = start_fake(session_timeout=0.3)
+
+    async def run():
+        async with AsyncB525Router(host) as router:
+            await router.login('admin', PASSWORD, refresh=False)
+            await asyncio.sleep(0.4)
+            fake.reset_counts()
+            return await asyncio.gather(*[router.api(api) for api in APIS * 2])
+
+    responses = asyncio.run(run())
+
+    assert not any(RouterError.hasError(response) for response in responses)
+    assert fake.requests['/api/user/authentication_login'] == 1
@@ -0,0 +1,51 @@
+""" Incremental inbox sync and batched mark-read / delete (huawei_lte.sms, B525Router.sms) """
+from conftest import PASSWORD
+from huawei_lte.errors import RouterError
+from huawei_lte.router import B525Router
+from huawei_lte.sms import SmsSync, SmsIndex
+
+def logged_in(host):
+    router = B525Router(host)
+    router.login('admin', PASSWORD)
+    return router
+
+def test_sync_returns_only_unseen_messages(start_fake, tmp_path):
+    fake, host = start_fake()
+    path = str(tmp_path / 'sms_index.json')
+    inbox = SmsSync(logged_in(host), SmsIndex(path), page_size=2)
+
+    first = inbox.sync()
+    assert sorted(message.index for message in first) == sorted(fake.sms)
+    assert inbox.sync() == []
+
+    index = fake.add_sms('+441234567890', 'hello')
+    assert [(message.index, message.content) for message in inbox.sync()] == [(index, 'hello')]
+
+    # The seen index survives a restart
+    restarted = SmsSync(logged_in(host), SmsIndex(path), page_size=2)
+    assert restarted.sync() == []
+    assert len(restarted.messages) == len(fake.sms)
+
+def test_bulk_requests_batch_indices(start_fake):
+    fake, host = start_fake()
+    router = logged_in(host)
+    indices = sorted(fake.sms)
+    fake.reset_counts()
+
+    assert not RouterError.hasError(router.sms.set_read(indices))
+    assert fake.requests['/api/sms/set-read'] == 1
+    assert all(fake.sms[index]['Smstat'] == '1' for index in indices)
+
+def test_bulk_requests_fall_back_to_one_index_each(start_fake):
+    fake, host = start_fake(batch_sms=False)
+    router = logged_in(host)
+    indices = sorted(fake.sms)
+    fake.reset_counts()
+
+    assert not RouterError.hasError(router.sms.delete(indices[:2]))
+    assert fake.requests['/api/sms/delete-sms'] == 3
+    fake.reset_counts()
+    assert not RouterError.hasError(router.sms.delete(indices[2:]))
+    # Batching stays off once the firmware rejected it
+    assert fake.requests['/api/sms/delete-sms'] == len(indices[2:])
+    assert fake.sms == {}
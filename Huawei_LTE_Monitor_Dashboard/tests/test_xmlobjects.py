@@ -0,0 +1,51 @@
+""" Serialise / parse round trips of the compiled XmlObject codecs (huawei_lte.xmlobjects) """
+import huawei_lte.xmlobjects as xmlobjects
+from huawei_lte.xmlobjects import CustomXml, SmsListRequest, VirtualServer, VirtualServerCollection
+
+SERVER = ('<Server><VirtualServerIPName>web</VirtualServerIPName><VirtualServerStatus>1</VirtualServerStatus>'
+          '<VirtualServerRemoteIP></VirtualServerRemoteIP><VirtualServerWanPort>80</VirtualServerWanPort>'
+          '<VirtualServerWanEndPort>80</VirtualServerWanEndPort><VirtualServerLanPort>8080</VirtualServerLanPort>'
+          '<VirtualServerLanEndPort>8080</VirtualServerLanEndPort><VirtualServerIPAddress>192.168.8.11'
+          '</VirtualServerIPAddress><VirtualServerProtocol>6</VirtualServerProtocol></Server>')
+
+def reparse(obj, empty):
+    empty.parseXML(obj.buildXML())
+    return empty
+
+def values(obj):
+    return dict((name, obj.getValue(name)) for name in obj.getPropertyNames())
+
+def test_scalar_object_round_trip():
+    request = SmsListRequest(page=3, count=50, box=SmsListRequest.BOX_OUTBOX)
+    parsed = reparse(request, SmsListRequest(page=0, count=0, box=0))
+    assert values(parsed) == dict((name, str(value)) for name, value in values(request).items())
+
+def test_collection_round_trip():
+    collection = VirtualServerCollection()
+    collection.parseXML('<response><Servers>%s%s</Servers></response>' % (SERVER, SERVER.replace('web', 'mail')))
+    # Items with different property lists take the per item path
+    collection.Servers[1].Extra = 'x'
+
+    parsed = reparse(collection, VirtualServerCollection())
+
+    assert [server.VirtualServerIPName for server in parsed.Servers] == ['web', 'mail']
+    assert [values(server) for server in parsed.Servers] == [values(VirtualServer(SERVER)),
+                                                             values(VirtualServer(SERVER.replace('web', 'mail')))]
+
+def test_custom_xml_round_trip():
+    custom = CustomXml({'ledSwitch': 1, 'name': 'front door'})
+    parsed = reparse(custom, CustomXml({'ledSwitch': None, 'name': None}))
+    assert parsed.vals == {'ledSwitch': '1', 'name': 'front door'}
+
+def test_private_and_late_properties():
+    request = SmsListRequest()
+    request._cursor = 5
+    request.Late = 'yes'
+    xml = request.buildXML(header=False)
+    assert '_cursor' not in xml
+    assert xml.endswith('<Late>yes</Late>')
+
+def test_codec_cache_is_bounded():
+    for i in range(xmlobjects.CODEC_CACHE_SIZE + 10):
+        CustomXml({'Key%i' % i: i}).buildXML()
+    assert xmlobjects._codec.cache_info().currsize <= xmlobjects.CODEC_CACHE_SIZE
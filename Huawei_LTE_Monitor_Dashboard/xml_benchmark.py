@@ -0,0 +1,110 @@
+"""
+XmlObject build/parse cost on large collections: the per-class compiled codecs
+in huawei_lte.xmlobjects versus the previous property walk (legacy_build) and
+per-child tostring/fromstring round trip (legacy_parse), reproduced below.
+
+    python xml_benchmark.py --size 32
+"""
+import argparse
+import timeit
+import xml.etree.ElementTree as ET
+
+import huawei_lte.xmlobjects as xmlobjects
+from huawei_lte.xmlobjects import XmlObject
+
+def legacy_build(obj, header=True, root='request'):
+    result = []
+    if (header):
+        result.append('<?xml version="1.0" encoding="UTF-8"?>')
+        result.append('<'+root+'>')
+    for prop in obj.getPropertyNames():
+        value = obj.getValue(prop)
+        skip_blank = obj._SKIP_BLANK and (value is None or value == '')
+        if skip_blank or prop[:1] == '_':
+            continue
+        result.extend(['<', prop, '>'])
+        if (type(value) is list):
+            for v in value:
+                if not obj._SKIP_CLASS_ELEMENT:
+                    result.extend(['<', v.getElementName(), '>'])
+                result.append(legacy_build(v, False))
+                if not obj._SKIP_CLASS_ELEMENT:
+                    result.extend(['</', v.getElementName(), '>'])
+        elif (issubclass(type(value), XmlObject)):
+            result.extend(['<', value.getElementName(), '>'])
+            result.append(legacy_build(value, False))
+            result.extend(['</', value.getElementName(), '>'])
+        else:
+            result.append(str(value))
+        result.extend(['</', prop, '>'])
+    if (header):
+        result.append('</'+root+'>')
+    return ''.join(result)
+
+def legacy_parse(obj, xmlText):
+    xml = ET.fromstring(xmlText if isinstance(xmlText, bytes) else xmlText.encode('utf-8'))
+    for prop in obj.getPropertyNames():
+        value = obj.getValue(prop)
+        if isinstance(value, list):
+            parent = xml.find('./'+prop)
+            if (parent is not None):
+                for elm in list(parent):
+                    child_xml = ET.tostring(elm, encoding='utf8', method='xml')
+                    #The child constructors parsed the serialised element again
+                    child = obj.child(prop, ET.Element(elm.tag))
+                    legacy_parse(child, child_xml)
+                    value.append(child)
+        else:
+            elm = xml.find('./'+prop)
+            if (elm is not None):
+                obj.setValue(prop, elm.text if elm.text is not None else '')
+
+def static_hosts(size):
+    hosts = xmlobjects.StaticHostCollection()
+    for i in range(size):
+        hosts.addHost({'macaddress': '00:11:22:33:%02x:%02x' % (i // 256, i % 256),
+                       'ipaddress': '192.168.8.%i' % (10 + i % 240)})
+    return hosts
+
+def virtual_servers(size):
+    servers = xmlobjects.VirtualServerCollection()
+    for i in range(size):
+        servers.add_tcp_service({'name': 'service%i' % i, 'startwanport': 1000 + i,
+                                 'startlanport': 1000 + i, 'localip': '192.168.8.%i' % (10 + i % 240)})
+    return servers
+
+def ddns(size):
+    collection = xmlobjects.DdnsCollection()
+    for i in range(size):
+        collection.addNoIpDdns({'username': 'user', 'password': 'secret', 'domain': 'host%i.ddns.net' % i})
+    return collection
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark XmlObject serialisation')
+    parser.add_argument('--size', type=int, default=32, help='entries per collection')
+    parser.add_argument('--number', type=int, default=200, help='calls per timing run')
+    args = parser.parse_args()
+
+    print('%-34s %12s %12s %10s' % ('%i entries' % args.size, 'legacy us', 'compiled us', 'speedup'))
+    for name, make in [('StaticHostCollection', static_hosts),
+                       ('VirtualServerCollection', virtual_servers),
+                       ('DdnsCollection', ddns)]:
+        obj = make(args.size)
+        assert legacy_build(obj) == obj.buildXML()
+        old = bench(lambda: legacy_build(obj), args.number)
+        new = bench(obj.buildXML, args.number)
+        print('%-34s %12.1f %12.1f %9.1fx' % (name + ' build', old, new, old / new))
+
+        if type(obj).child is XmlObject.child:
+            continue
+        xml = obj.buildXmlResponse()
+        cls = type(obj)
+        old = bench(lambda: legacy_parse(cls(), xml), args.number)
+        new = bench(lambda: cls().parseXML(xml), args.number)
+        print('%-34s %12.1f %12.1f %9.1fx' % (name + ' parse', old, new, old / new))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+""" Typed records for router responses, used by B525Router(typed=True) """
+import re
+from html import unescape
+
+import huawei_lte.utils as utils
+from huawei_lte.errors import RouterError
+
+#Leaf elements <tag>text</tag>, the GET api responses are flat so one scan reads them all
+LEAF = re.compile(r'<([\w-]+)>([^<]*)</\1>')
+MESSAGE = re.compile(r'<Message>(.*?)</Message>', re.S)
+
+def leaves(xml):
+    '''{tag: text} for the leaf elements of a response, empty elements are left out'''
+    values = dict(LEAF.findall(xml))
+    if '&' in xml:
+        for tag, text in values.items():
+            if '&' in text:
+                values[tag] = unescape(text)
+    return values
+
+#RSRP thresholds for the 0 - 5 signal strength rating (see Device.signal_strength)
+RSRP_RANGE = [-90, -105, -112, -125, -136]
+
+def to_str(value):
+    return value
+
+def to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+def to_db(value):
+    '''-100dBm, -12.0dB, 13dB => float'''
+    if not value:
+        return None
+    try:
+        return float(value.lower().replace('dbm', '').replace('db', '').strip())
+    except ValueError:
+        return None
+
+class Record(object):
+    '''
+    Lightweight read-only view of one api response, parsed once from the XML
+    with a single regex scan instead of building an ElementTree.
+    FIELDS lists (attribute, xml tag, converter), missing tags are None
+    '''
+    __slots__ = ()
+    FIELDS = ()
+
+    @classmethod
+    def from_values(cls, values):
+        obj = cls.__new__(cls)
+        setter = object.__setattr__
+        for attr, tag, convert in cls.FIELDS:
+            setter(obj, attr, convert(values.get(tag)))
+        return obj
+
+    @classmethod
+    def from_xml(cls, xml):
+        '''Raises RouterError for an error response'''
+        if RouterError.hasError(xml):
+            raise RouterError(xml)
+        return cls.from_values(leaves(xml))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is read-only' % type(self).__name__)
+
+    def replace(self, **values):
+        '''Copy of the record with some fields changed'''
+        obj = type(self).__new__(type(self))
+        for attr, _, _ in self.FIELDS:
+            object.__setattr__(obj, attr, values[attr] if attr in values else getattr(self, attr))
+        return obj
+
+    def to_dict(self):
+        return dict((attr, getattr(self, attr)) for attr, _, _ in self.FIELDS)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+            ', '.join('%s=%r' % (attr, getattr(self, attr)) for attr, _, _ in self.FIELDS))
+
+def _record(name, api, fields, doc, base=Record):
+    '''Builds a Record subclass with __slots__ from its field list'''
+    return type(name, (base,), {
+        '__doc__': doc,
+        '__slots__': tuple(attr for attr, _, _ in fields),
+        'FIELDS': tuple(fields),
+        'API': api
+    })
+
+_Signal = _record('_Signal', 'device/signal', [
+    ('pci', 'pci', to_int),
+    ('cell_id', 'cell_id', to_str),
+    ('rsrq', 'rsrq', to_db),
+    ('rsrp', 'rsrp', to_db),
+    ('rssi', 'rssi', to_db),
+    ('sinr', 'sinr', to_db),
+    ('mode', 'mode', to_str),
+    ('band', 'band', to_str),
+    ('ul_bandwidth', 'ulbandwidth', to_str),
+    ('dl_bandwidth', 'dlbandwidth', to_str),
+    ('earfcn', 'earfcn', to_str),
+    ('plmn', 'plmn', to_str),
+    ('tac', 'tac', to_str),
+    ('enodeb_id', 'enodeb_id', to_str)
+], 'device/signal')
+
+class Signal(_Signal):
+    '''device/signal, rsrq/rsrp/rssi/sinr are floats in dB(m)'''
+    __slots__ = ()
+
+    @property
+    def strength(self):
+        '''Signal strength from 0 to 5 (where 5 is the best), based on the rsrp value'''
+        if self.rsrp is None:
+            return 0
+        return 5 - utils.getRange(RSRP_RANGE, self.rsrp)
+
+Traffic = _record('Traffic', 'monitoring/traffic-statistics', [
+    ('connect_time', 'CurrentConnectTime', to_int),
+    ('upload', 'CurrentUpload', to_int),
+    ('download', 'CurrentDownload', to_int),
+    ('download_rate', 'CurrentDownloadRate', to_int),
+    ('upload_rate', 'CurrentUploadRate', to_int),
+    ('total_upload', 'TotalUpload', to_int),
+    ('total_download', 'TotalDownload', to_int),
+    ('total_connect_time', 'TotalConnectTime', to_int),
+    ('max_upload_rate', 'MaxUploadRate', to_int),
+    ('max_download_rate', 'MaxDownloadRate', to_int)
+], 'monitoring/traffic-statistics, rates are bytes/s')
+
+Notifications = _record('Notifications', 'monitoring/check-notifications', [
+    ('unread_message', 'UnreadMessage', to_int),
+    ('sms_storage_full', 'SmsStorageFull', to_int),
+    ('online_update_status', 'OnlineUpdateStatus', to_int),
+    ('sim_oper_event', 'SimOperEvent', to_int)
+], 'monitoring/check-notifications')
+
+Status = _record('Status', 'monitoring/status', [
+    ('connection_status', 'ConnectionStatus', to_int),
+    ('signal_icon', 'SignalIcon', to_int),
+    ('max_signal', 'maxsignal', to_int),
+    ('network_type', 'CurrentNetworkType', to_int),
+    ('network_type_ex', 'CurrentNetworkTypeEx', to_int),
+    ('service_domain', 'CurrentServiceDomain', to_int),
+    ('roaming_status', 'RoamingStatus', to_int),
+    ('primary_dns', 'PrimaryDns', to_str),
+    ('secondary_dns', 'SecondaryDns', to_str),
+    ('current_wifi_user', 'CurrentWifiUser', to_int),
+    ('service_status', 'ServiceStatus', to_int),
+    ('sim_status', 'SimStatus', to_int)
+], 'monitoring/status')
+
+DeviceInfo = _record('DeviceInfo', 'device/information', [
+    ('device_name', 'DeviceName', to_str),
+    ('serial_number', 'SerialNumber', to_str),
+    ('imei', 'Imei', to_str),
+    ('imsi', 'Imsi', to_str),
+    ('iccid', 'Iccid', to_str),
+    ('msisdn', 'Msisdn', to_str),
+    ('hardware_version', 'HardwareVersion', to_str),
+    ('software_version', 'SoftwareVersion', to_str),
+    ('webui_version', 'WebUIVersion', to_str),
+    ('mac_address', 'MacAddress1', to_str),
+    ('wan_ip_address', 'WanIPAddress', to_str),
+    ('wan_dns_address', 'wan_dns_address', to_str),
+    ('product_family', 'ProductFamily', to_str),
+    ('classify', 'Classify', to_str),
+    ('supportmode', 'supportmode', to_str),
+    ('workmode', 'workmode', to_str),
+    ('submask', 'submask', to_str),
+    ('mccmnc', 'Mccmnc', to_str),
+    ('iniversion', 'iniversion', to_str),
+    ('uptime', 'uptime', to_int),
+    ('imei_svn', 'ImeiSvn', to_str),
+    ('wifi_mac_addr_wl0', 'WifiMacAddrWl0', to_str),
+    ('wifi_mac_addr_wl1', 'WifiMacAddrWl1', to_str),
+    ('spreadname_en', 'spreadname_en', to_str)
+], 'device/information, uptime is in seconds')
+
+SmsMessage = _record('SmsMessage', None, [
+    ('index', 'Index', to_int),
+    ('status', 'Smstat', to_int),
+    ('phone', 'Phone', to_str),
+    ('content', 'Content', to_str),
+    ('date', 'Date', to_str),
+    ('sms_type', 'SmsType', to_int)
+], 'One message of an sms/sms-list response, status 0 is unread')
+
+class SmsList(Record):
+    '''sms/sms-list response: count and messages'''
+    __slots__ = ('count', 'messages')
+    API = 'sms/sms-list'
+
+    @classmethod
+    def from_xml(cls, xml):
+        if RouterError.hasError(xml):
+            raise RouterError(xml)
+        obj = cls.__new__(cls)
+        object.__setattr__(obj, 'count', to_int(leaves(xml.split('<Messages>', 1)[0]).get('Count')))
+        object.__setattr__(obj, 'messages', tuple(SmsMessage.from_values(leaves(msg)) for msg in MESSAGE.findall(xml)))
+        return obj
+
+    def to_dict(self):
+        return {'count': self.count, 'messages': [msg.to_dict() for msg in self.messages]}
+
+    def __repr__(self):
+        return 'SmsList(count=%r, messages=%r)' % (self.count, self.messages)
+
+#api url -> record class, for the GET apis returned typed
+RECORDS = dict((cls.API, cls) for cls in [Signal, Traffic, Notifications, Status, DeviceInfo])
+
+def parse(api, xml):
+    '''Typed record for an api response, or the XML unchanged when the api has no record'''
+    cls = RECORDS.get(api)
+    if cls is None:
+        return xml
+    return cls.from_xml(xml)
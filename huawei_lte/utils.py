@@ -1,8 +1,9 @@
-from IPy import IP
 import re
 
 def isMacValid(mac): return re.match("[0-9a-f]{2}([-:]?)[0-9a-f]{2}(\\1[0-9a-f]{2}){4}$", mac.lower())
 def isIpValid(ip):
+    #IPy is only loaded when an address is validated
+    from IPy import IP
     try:
         IP(ip)
         return True